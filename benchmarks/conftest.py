@@ -0,0 +1,173 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import json
+import random
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import pytest
+
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@dataclass
+class Project:
+    """
+    A synthetic project on disk along with its hook configuration.
+    """
+
+    root: Path
+    config: dict
+
+    @property
+    def pyproject(self) -> Path:
+        return self.root / "pyproject.toml"
+
+
+def make_project(  # noqa: PLR0913
+    root: Path,
+    *,
+    releases: int = 2_000,
+    docs: int = 20,
+    fragments: int = 120,
+    substitutions: int = 200,
+    slow_substitutions: int = 5,
+    seed: int = 42,
+) -> Project:
+    """
+    Write a synthetic project into *root*.
+
+    - A changelog with *releases* releases, each of which is ~1.5 KB.
+    - *docs* documentation files.
+    - *fragments* fragments that alternately cut releases out of the
+      changelog, include (parts of) documentation files, and add text.
+    - *substitutions* issue-link-style substitutions with distinct prefixes,
+      about half of which appear in the text.
+    - *slow_substitutions* substitutions that defeat all shortcuts:
+      back references, lookarounds, and patterns without required literals.
+    """
+    rnd = random.Random(seed)
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "elit"]
+    prefixes = [f"P{i}X" for i in range(substitutions)]
+    present = prefixes[::2]
+
+    def paragraph(n):
+        out = []
+        for _ in range(n):
+            out.append(rnd.choice(words))
+            if rnd.random() < 0.05:  # noqa: PLR2004
+                out.append(f"{rnd.choice(present)}-{rnd.randint(1, 9999)}")
+            if rnd.random() < 0.02:  # noqa: PLR2004
+                out.append("@" + rnd.choice(words))
+
+        return " ".join(out)
+
+    root.mkdir(parents=True, exist_ok=True)
+
+    changelog = ["# Changelog\n\n<!-- changelog follows -->\n\n"]
+    for i in range(releases, 0, -1):
+        changelog.append(f"## {i}.0.0\n\n")
+        changelog.extend(f"- {paragraph(25)}\n" for _ in range(8))
+        changelog.append("\n")
+    (root / "CHANGELOG.md").write_text("".join(changelog), encoding="utf-8")
+
+    (root / "docs").mkdir(exist_ok=True)
+    for i in range(docs):
+        (root / "docs" / f"{i}.md").write_text(
+            f"# Doc {i}\n\n<!-- start -->\n\n{paragraph(300)}\n\n"
+            f"<!-- end -->\n\n{paragraph(100)}\n",
+            encoding="utf-8",
+        )
+
+    frags: list[dict[str, str]] = []
+    for i in range(fragments):
+        kind = i % 3
+        if kind == 0:
+            release = releases - i // 3
+            frags.append(
+                {
+                    "path": "CHANGELOG.md",
+                    "start-at": f"## {release}.0.0\n",
+                    "end-before": f"## {release - 1}.0.0\n",
+                }
+            )
+        elif kind == 1:
+            frags.append(
+                {
+                    "path": f"docs/{i % docs}.md",
+                    "start-after": "<!-- start -->\n\n",
+                    "end-before": "<!-- end -->",
+                }
+            )
+        else:
+            frags.append({"text": f"\n{paragraph(50)} $HFPR_VERSION\n\n"})
+
+    subs = [
+        {
+            "pattern": rf"{p}-(\d+)",
+            "replacement": rf"[{p}-\1](https://example.com/{p}/\1)",
+        }
+        for p in prefixes
+    ]
+    slow = [
+        {"pattern": r"\b(\w+) \1\b", "replacement": r"\1"},
+        {"pattern": r"(?<=\s)@(\w+)", "replacement": r"[@\1](https://x/\1)"},
+        {"pattern": r"(?m)^- (\w)", "replacement": r"* \1"},
+        {"pattern": r"\b(\d+)\.0\.0\b", "replacement": r"v\1"},
+        {"pattern": r"(\w+)\s+(?=\1)", "replacement": r"\1 "},
+    ]
+    subs.extend(slow[i % len(slow)] for i in range(slow_substitutions))
+
+    config = {
+        "content-type": "text/markdown",
+        "fragments": frags,
+        "substitutions": subs,
+    }
+
+    project = Project(root, config)
+    _write_pyproject(project)
+
+    package = root / "src" / "synthetic"
+    package.mkdir(parents=True, exist_ok=True)
+    (package / "__init__.py").write_text("")
+
+    return project
+
+
+def _write_pyproject(project: Project) -> None:
+    # JSON strings are valid TOML strings.
+    toml = json.dumps
+
+    lines = [
+        "[build-system]",
+        'requires = ["hatchling", "hatch-fancy-pypi-readme"]',
+        'build-backend = "hatchling.build"',
+        "",
+        "[project]",
+        'name = "synthetic"',
+        'version = "1.0"',
+        'dynamic = ["readme"]',
+        "",
+        "[tool.hatch.metadata.hooks.fancy-pypi-readme]",
+        f"content-type = {toml(project.config['content-type'])}",
+    ]
+    for key in ("fragments", "substitutions"):
+        for table in project.config[key]:
+            lines.extend(
+                ["", f"[[tool.hatch.metadata.hooks.fancy-pypi-readme.{key}]]"]
+            )
+            lines.extend(f"{k} = {toml(v)}" for k, v in table.items())
+
+    project.pyproject.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@pytest.fixture(name="project", scope="session")
+def _project(tmp_path_factory):
+    return make_project(tmp_path_factory.mktemp("synthetic"))
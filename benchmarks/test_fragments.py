@@ -0,0 +1,46 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+import pytest
+
+from hatch_fancy_pypi_readme import _fragments
+from hatch_fancy_pypi_readme._fragments import FileFragment
+
+
+@pytest.fixture(name="changelog", scope="module")
+def _changelog(tmp_path_factory):
+    """
+    A 5 MB changelog of which we only want the latest release.
+    """
+    path = tmp_path_factory.mktemp("changelog") / "CHANGELOG.md"
+    releases = [
+        f"## {i}.0.0\n\n" + "- Fixed a bug.\n" * 40 + "\n"
+        for i in range(8000, 0, -1)
+    ]
+    path.write_text(
+        "# Changelog\n\n<!-- changelog follows -->\n\n" + "".join(releases)
+    )
+
+    return path
+
+
+CFG = {
+    "start-after": "<!-- changelog follows -->\n\n",
+    "end-before": "## 7999.0.0",
+}
+
+
+@pytest.mark.parametrize("threshold", [0, 2**62], ids=["mapped", "read"])
+def test_slice(benchmark, changelog, monkeypatch, threshold):
+    """
+    Extract the latest release from a large changelog.
+    """
+    monkeypatch.setattr(_fragments, "MMAP_THRESHOLD", threshold)
+
+    benchmark.group = "slice large file"
+    frag = benchmark(
+        lambda: FileFragment.from_config({"path": str(changelog), **CFG})
+    )
+
+    assert frag.render().startswith("## 8000.0.0")
@@ -0,0 +1,174 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+import subprocess
+import sys
+import zipfile
+
+from io import StringIO
+
+import pytest
+
+from hatch_fancy_pypi_readme._builder import build_text, compile_text
+from hatch_fancy_pypi_readme._cli import cli_run, load_toml
+from hatch_fancy_pypi_readme._config import load_and_validate_config
+from hatch_fancy_pypi_readme._precompiled import (
+    render_precompiled,
+    write_artifact,
+)
+
+
+@pytest.fixture(autouse=True)
+def _in_project(project, monkeypatch):
+    monkeypatch.chdir(project.root)
+
+
+def test_load(benchmark, project):
+    """
+    Load and validate the configuration, which reads all fragments.
+    """
+    benchmark.group = "synthetic project"
+    cfg = benchmark(load_and_validate_config, project.config)
+
+    assert len(project.config["fragments"]) == len(cfg.fragments)
+
+
+def test_build(benchmark, project):
+    """
+    Render the loaded fragments and apply all substitutions.
+    """
+    cfg = load_and_validate_config(project.config)
+
+    benchmark.group = "synthetic project"
+    text = benchmark(
+        build_text, cfg.fragments, cfg.substitutions, "synthetic", "1.0"
+    )
+
+    assert "](https://example.com/P0X/" in text
+
+
+VERSIONS = [f"1.{i}.0" for i in range(20)]
+
+
+def test_build_versions(benchmark, project):
+    """
+    Render the same readme for many versions using build_text.
+    """
+    cfg = load_and_validate_config(project.config)
+
+    def run():
+        return [
+            build_text(cfg.fragments, cfg.substitutions, "synthetic", v)
+            for v in VERSIONS
+        ]
+
+    benchmark.group = "many versions"
+    assert len(VERSIONS) == len(benchmark(run))
+
+
+def test_compile_versions(benchmark, project):
+    """
+    Render the same readme for many versions using a compiled template.
+    """
+    cfg = load_and_validate_config(project.config)
+
+    def run():
+        template = compile_text(cfg.fragments, cfg.substitutions)
+        return [template.render("synthetic", v) for v in VERSIONS]
+
+    benchmark.group = "many versions"
+    texts = benchmark(run)
+
+    assert texts == [
+        build_text(cfg.fragments, cfg.substitutions, "synthetic", v)
+        for v in VERSIONS
+    ]
+
+
+def test_precompiled(benchmark, project, tmp_path):
+    """
+    Render from a precompiled artifact, including checking that it's up to
+    date.
+    """
+    artifact = tmp_path / "readme.json"
+    write_artifact(
+        project.config, load_and_validate_config(project.config), artifact
+    )
+
+    benchmark.group = "synthetic project"
+    readme = benchmark(
+        render_precompiled, project.config, artifact, "synthetic", "1.0"
+    )
+
+    assert readme["text"].startswith("## v2000\n")
+
+
+def test_cli_in_process(benchmark, project):
+    """
+    The CLI from parsed TOML to output, without interpreter startup.
+    """
+    pyproject = load_toml(project.pyproject)
+
+    def run():
+        out = StringIO()
+        cli_run(pyproject, {}, out)
+        return out.getvalue()
+
+    benchmark.group = "synthetic project"
+    assert benchmark(run).startswith("## v2000\n")
+
+
+def test_cli(benchmark):
+    """
+    The CLI end to end, as run by a user.
+    """
+    benchmark.group = "synthetic project: processes"
+    out = benchmark.pedantic(
+        subprocess.run,
+        args=([sys.executable, "-m", "hatch_fancy_pypi_readme"],),
+        kwargs={"check": True, "capture_output": True},
+        rounds=5,
+    )
+
+    assert out.stdout.startswith(b"## v2000\n")
+
+
+def test_hatchling_build(benchmark, tmp_path):
+    """
+    A real wheel build with the installed hatchling and hook -- without build
+    isolation, so the numbers don't include installing dependencies.
+    """
+
+    def build():
+        subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "hatchling",
+                "build",
+                "-t",
+                "wheel",
+                "-d",
+                str(tmp_path),
+            ],
+            check=True,
+            capture_output=True,
+        )
+
+    benchmark.group = "synthetic project: processes"
+    benchmark.pedantic(build, setup=_clean(tmp_path), rounds=3)
+
+    (whl,) = tmp_path.glob("*.whl")
+    with zipfile.ZipFile(whl) as zf:
+        metadata = zf.read("synthetic-1.0.dist-info/METADATA").decode()
+
+    assert "## v2000\n" in metadata
+
+
+def _clean(directory):
+    def clean():
+        for path in directory.glob("*.whl"):
+            path.unlink()
+
+    return clean
@@ -0,0 +1,90 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+import random
+import re
+
+import pytest
+
+from hatch_fancy_pypi_readme._builder import build_text
+from hatch_fancy_pypi_readme._fragments import TextFragment
+from hatch_fancy_pypi_readme._substitutions import Substituter, prefilter
+
+
+def independent_substitutions(n):
+    """
+    Create *n* substitutions that don't interfere with each other, like issue
+    links, user mentions, and such.
+    """
+    markers = [chr(0x4E00 + i) for i in range(n)]
+
+    return [
+        Substituter.from_config(
+            {"pattern": rf"{m}(\d+)", "replacement": rf"<{m}\1>"}
+        )
+        for m in markers
+    ]
+
+
+def text_for(subs, size=1_000_000, density=0.05):
+    rnd = random.Random(42)
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "\n\n"]
+    markers = [s.pattern.pattern[0] for s in subs]
+
+    chunks = []
+    length = 0
+    while length < size:
+        chunk = rnd.choice(words) + " "
+        if rnd.random() < density:
+            chunk += f"{rnd.choice(markers)}{rnd.randint(1, 9999)} "
+        chunks.append(chunk)
+        length += len(chunk)
+
+    return [TextFragment("".join(chunks))]
+
+
+@pytest.mark.parametrize("n", [1, 4, 16, 64])
+def test_fused(benchmark, n):
+    """
+    build_text with independent substitutions that get fused into one pass.
+    """
+    subs = independent_substitutions(n)
+    frags = text_for(subs)
+
+    benchmark.group = f"{n} substitutions"
+    benchmark(build_text, frags, subs)
+
+
+@pytest.mark.parametrize("n", [1, 4, 16, 64])
+def test_sequential(benchmark, n):
+    """
+    Baseline: the same substitutions applied one after another.
+    """
+    subs = independent_substitutions(n)
+    frags = text_for(subs)
+
+    def sequential():
+        text = "".join(f.render() for f in frags)
+        for sub in subs:
+            text = sub.substitute(text)
+        return text
+
+    benchmark.group = f"{n} substitutions"
+    assert build_text(frags, subs) == benchmark(sequential)
+
+
+def test_prefilter_cold(benchmark):
+    """
+    prefilter with hundreds of literals and an empty regex cache, like a
+    fresh build process.
+    """
+    subs = independent_substitutions(300)
+    frags = text_for(subs[::2], size=100_000)
+    text = frags[0].render()
+    for sub in subs:
+        _ = sub.required_literal
+
+    benchmark.pedantic(
+        prefilter, (subs, text), setup=re.purge, rounds=20, iterations=1
+    )
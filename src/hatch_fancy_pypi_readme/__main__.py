@@ -7,31 +7,35 @@ from __future__ import annotations
 import argparse
 import sys
 
-from contextlib import closing
+from contextlib import closing, suppress
 from pathlib import Path
-from typing import TextIO
+from typing import TYPE_CHECKING
 
-from ._cli import cli_run
 
-
-if sys.version_info < (3, 11):
-    import tomli as tomllib
-else:
-    import tomllib
+if TYPE_CHECKING:
+    from typing import TextIO
 
 
 def main() -> None:
+    # A subparser would swallow the positional pyproject.toml path.
+    if sys.argv[1:2] == ["compile"]:
+        _compile(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
         description="Render a README from a pyproject.toml & hatch.toml."
         " If a hatch.toml is passed / detected, it's preferred."
     )
     parser.add_argument(
-        "pyproject_path",
-        nargs="?",
+        "pyproject_paths",
+        nargs="*",
         metavar="PATH-TO-PYPROJECT.TOML",
-        default="pyproject.toml",
+        default=["pyproject.toml"],
         help="Path to the pyproject.toml to use for rendering. "
-        "Default: pyproject.toml in current directory.",
+        "Default: pyproject.toml in current directory. "
+        "If more than one path, a project directory, or a glob pattern is "
+        "passed, all projects are rendered in parallel and a summary is "
+        "printed.",
     )
     parser.add_argument(
         "--hatch-toml",
@@ -43,32 +47,151 @@ def main() -> None:
     )
     parser.add_argument(
         "-o",
-        help="Target file for output. Default: standard out.",
+        help="Target file for output. Default: standard out. "
+        "When rendering multiple projects, it's relative to each project "
+        "and the readmes are only checked if it's not passed.",
         metavar="TARGET-FILE-PATH",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=_positive_int,
+        default=None,
+        help="Number of processes for rendering multiple projects. "
+        "Default: number of CPUs.",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the slowest fragments and substitutions to standard "
+        "error.",
+    )
+    parser.add_argument(
+        "--profile-output",
+        metavar="PSTATS-PATH",
+        default=None,
+        help="Also write a cProfile profile to this path. Implies --profile.",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Re-render whenever the configuration or one of the fragment "
+        "files changes. Stop using Ctrl-C.",
+    )
     args = parser.parse_args()
 
-    pyproject = tomllib.loads(Path(args.pyproject_path).read_text())
-    hatch_toml = _maybe_load_hatch_toml(args.hatch_toml)
+    if _is_batch(args.pyproject_paths):
+        if (
+            args.hatch_toml
+            or args.profile
+            or args.profile_output
+            or args.watch
+        ):
+            parser.error(
+                "--hatch-toml, --profile, and --watch work only with a "
+                "single project."
+            )
+        _batch(args)
+        return
+
+    args.pyproject_path = args.pyproject_paths[0]
+
+    if args.watch:
+        _watch(args)
+        return
+
+    # Only import what's needed for rendering once --help is out of the way.
+    from ._cli import cli_run, load_toml, maybe_load_hatch_toml, profile_run
+
+    pyproject = load_toml(Path(args.pyproject_path))
+    hatch_toml = maybe_load_hatch_toml(args.hatch_toml)
 
     out: TextIO
     out = Path(args.o).open("w") if args.o else sys.stdout  # noqa: SIM115
 
     with closing(out):
-        cli_run(pyproject, hatch_toml, out)
+        if args.profile or args.profile_output:
+            profile_run(pyproject, hatch_toml, out, args.profile_output)
+        else:
+            cli_run(pyproject, hatch_toml, out)
 
 
-def _maybe_load_hatch_toml(hatch_toml_arg: str | None) -> dict[str, object]:
-    """
-    If hatch.toml is passed or detected, load it.
-    """
-    if hatch_toml_arg:
-        return tomllib.loads(Path(hatch_toml_arg).read_text())
+def _compile(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="hatch-fancy-pypi-readme compile",
+        description="Render a README once and write it into a file that the "
+        "metadata hook uses instead of rendering, as long as neither the "
+        "configuration nor the fragment files change.",
+    )
+    parser.add_argument(
+        "pyproject_path",
+        nargs="?",
+        metavar="PATH-TO-PYPROJECT.TOML",
+        default="pyproject.toml",
+        help="Path to the pyproject.toml to use for rendering. "
+        "Default: pyproject.toml in current directory.",
+    )
+    parser.add_argument(
+        "--hatch-toml",
+        nargs="?",
+        metavar="PATH-TO-HATCH.TOML",
+        default=None,
+        help="Path to an additional hatch.toml to use for rendering. "
+        "Default: Auto-detect in the current directory.",
+    )
+    parser.add_argument(
+        "-o",
+        help="Target file. Default: the 'precompiled' option relative to the "
+        "pyproject.toml.",
+        metavar="TARGET-FILE-PATH",
+    )
+    args = parser.parse_args(argv)
+
+    from ._cli import compile_run, load_toml, maybe_load_hatch_toml
 
-    if Path("hatch.toml").exists():
-        return tomllib.loads(Path("hatch.toml").read_text())
+    pyproject_path = Path(args.pyproject_path)
+    compile_run(
+        load_toml(pyproject_path),
+        maybe_load_hatch_toml(args.hatch_toml),
+        Path(args.o) if args.o else None,
+        pyproject_path.parent,
+    )
+
+
+def _positive_int(value: str) -> int:
+    try:
+        n = int(value)
+    except ValueError:
+        n = 0
+    if n < 1:
+        msg = f"must be a positive integer, not {value!r}"
+        raise argparse.ArgumentTypeError(msg)
+
+    return n
+
+
+def _is_batch(paths: list[str]) -> bool:
+    import glob
+
+    return (
+        len(paths) > 1 or glob.has_magic(paths[0]) or Path(paths[0]).is_dir()
+    )
+
+
+def _batch(args: argparse.Namespace) -> None:
+    from ._batch import batch_cli_run
+
+    batch_cli_run(args.pyproject_paths, args.o, args.jobs)
 
-    return {}
+
+def _watch(args: argparse.Namespace) -> None:
+    from ._watch import Watcher, watch
+
+    watcher = Watcher(
+        Path(args.pyproject_path), Path(args.hatch_toml or "hatch.toml")
+    )
+    with suppress(KeyboardInterrupt):
+        watch(watcher, args.o)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import glob
+import os
+import sys
+import time
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, TextIO
+
+from ._builder import write_text
+from ._cli import CLIError, load_cli_config, load_toml
+from .exceptions import ConfigurationError
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """
+    The outcome of rendering the readme of one project.
+    """
+
+    pyproject_path: Path
+    duration: float
+    error: str | None = None
+
+
+def batch_cli_run(
+    args: list[str], out_name: str | None, jobs: int | None
+) -> None:
+    """
+    Render all projects in *args* and print a summary to standard error.
+
+    Exit with 1 if any of them failed.
+    """
+    start = time.perf_counter()
+    results = run_batch(expand_paths(args), out_name, jobs)
+
+    print(
+        format_summary(results, time.perf_counter() - start), file=sys.stderr
+    )
+
+    if any(r.error is not None for r in results):
+        sys.exit(1)
+
+
+def expand_paths(args: list[str]) -> list[Path]:
+    """
+    Turn command line arguments into pyproject.toml paths.
+
+    Arguments can be pyproject.toml files, project directories, or glob
+    patterns for either.  Patterns that match nothing are passed through,
+    such that they're reported as missing.
+    """
+    paths = []
+    for arg in args:
+        matches = (
+            sorted(glob.glob(arg, recursive=True))  # noqa: PTH207
+            if glob.has_magic(arg)
+            else []
+        ) or [arg]
+        for match in matches:
+            path = Path(match)
+            paths.append(path / "pyproject.toml" if path.is_dir() else path)
+
+    return list(dict.fromkeys(paths))
+
+
+def render_project(pyproject_path: Path, out_name: str | None) -> BatchResult:
+    """
+    Render the readme of the project that *pyproject_path* belongs to.
+
+    Fragment paths are relative to the project, so this changes the working
+    directory for the duration of the call.  If *out_name* is passed, the
+    readme is written into that file relative to the project.
+    """
+    start = time.perf_counter()
+    root = pyproject_path.parent
+    error: str | None
+    try:
+        pyproject = load_toml(pyproject_path)
+        hatch_toml = (
+            load_toml(root / "hatch.toml")
+            if (root / "hatch.toml").exists()
+            else {}
+        )
+    except OSError as e:
+        error = f"{e.strerror}: {e.filename}"
+    except ValueError as e:
+        error = f"Invalid TOML: {e}"
+    else:
+        error = _render(root, pyproject, hatch_toml, out_name)
+
+    return BatchResult(pyproject_path, time.perf_counter() - start, error)
+
+
+def _render(
+    root: Path,
+    pyproject: dict[str, Any],
+    hatch_toml: dict[str, Any],
+    out_name: str | None,
+) -> str | None:
+    """
+    Render the readme within *root* and return the error, if any.
+    """
+    cwd = Path.cwd()
+    os.chdir(root)
+    try:
+        config = load_cli_config(pyproject, hatch_toml)
+        with _open_out(out_name) as out:
+            write_text(
+                config.fragments,
+                config.substitutions,
+                out,
+                "your-package",
+                "42.0",
+            )
+            out.write("\n")
+    except CLIError as e:
+        return str(e)
+    except ConfigurationError as e:
+        return "\n".join(e.errors)
+    except OSError as e:
+        return f"{e.strerror}: {e.filename}"
+    except UnicodeDecodeError as e:
+        return f"Fragment file is not valid UTF-8: {e}"
+    finally:
+        os.chdir(cwd)
+
+    return None
+
+
+def _open_out(out_name: str | None) -> TextIO:
+    if out_name:
+        return Path(out_name).open("w")
+
+    return open(os.devnull, "w")  # noqa: PTH123
+
+
+def run_batch(
+    paths: list[Path], out_name: str | None, jobs: int | None = None
+) -> list[BatchResult]:
+    """
+    Render all projects in *paths* on a pool of *jobs* processes.
+
+    With *jobs* being 1, everything is rendered in the current process.
+    Results are returned in the order of *paths*.
+    """
+    if jobs == 1 or len(paths) == 1:
+        return [render_project(path, out_name) for path in paths]
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(render_project, paths, [out_name] * len(paths)))
+
+
+def format_summary(results: list[BatchResult], duration: float) -> str:
+    """
+    Render one line per project and the errors of the failed ones, followed
+    by totals.
+    """
+    lines = []
+    for r in results:
+        status = "ok" if r.error is None else "FAILED"
+        lines.append(
+            f"{status:<6}  {r.duration * 1000:>9.2f} ms  {r.pyproject_path}"
+        )
+        if r.error is not None:
+            lines.extend(f"        {line}" for line in r.error.splitlines())
+
+    failed = sum(r.error is not None for r in results)
+    lines.append("")
+    lines.append(
+        f"{len(results) - failed} rendered, {failed} failed "
+        f"in {duration * 1000:.2f} ms."
+    )
+
+    return "\n".join(lines)
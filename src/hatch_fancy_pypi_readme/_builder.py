@@ -4,12 +4,21 @@
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import itertools
+
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Iterable, Iterator, TextIO
+
+from . import _trace
+from ._rope import Rope
+from ._substitutions import Substituter, fuse, prefilter
 
 
 if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
     from ._fragments import Fragment
-    from ._substitutions import Substituter
 
 
 def build_text(
@@ -22,11 +31,274 @@ def build_text(
     Try avoiding breaking the API unnecessarily; it's used directly by
     scikit-build-core.
     """
-    text = "".join(f.render() for f in fragments)
+    with _trace.span("build") as attrs:
+        text = TextTemplate.from_rope(
+            _substitute(fragments, substitutions, attrs)
+        ).render(package_name, version)
+        attrs["chars_out"] = len(text)
+
+        return text
+
+
+def compile_text(
+    fragments: list[Fragment], substitutions: list[Substituter]
+) -> TextTemplate:
+    """
+    Do everything `build_text` does, except filling in the packaging
+    metadata.  Use it if you need the same readme for many versions.
+    """
+    with _trace.span("build") as attrs:
+        template = TextTemplate.from_rope(
+            _substitute(fragments, substitutions, attrs)
+        )
+        attrs["placeholders"] = sum(
+            not isinstance(c, str) for c in template.chunks
+        )
+
+        return template
+
+
+def _substitute(
+    fragments: list[Fragment],
+    substitutions: list[Substituter],
+    attrs: dict[str, object],
+) -> Rope:
+    """
+    The rendered fragments stay separate until the very end, such that
+    substitutions only copy the fragments they change.
+    """
+    rope = Rope([f.render() for f in fragments])
+    attrs["chars_in"] = len(rope)
+
+    return _apply_to_rope(substitutions, rope)
+
+
+def apply_substitutions(substitutions: list[Substituter], text: str) -> str:
+    """
+    Apply *substitutions* to *text* in order, skipping those that can't
+    match anything and fusing those that are independent.
+    """
+    return _apply_to_rope(substitutions, Rope([text])).join()
+
+
+def _apply_to_rope(substitutions: list[Substituter], rope: Rope) -> Rope:
+    """
+    Substitutions whose matches are known to stay close to a literal are
+    applied to the segments around its occurrences.  Fused ones and others
+    need the whole text, so the rope is joined for them.
+    """
+    with _trace.span("prefilter", substitutions=len(substitutions)) as pf:
+        kept = prefilter(substitutions, rope)
+        pf["kept"] = len(kept)
+
+    for sub in fuse(kept):
+        with _trace.span("substitution", patterns=sub.patterns) as sa:
+            if (
+                isinstance(sub, Substituter)
+                and sub.locality is not None
+                and len(rope.segments) > 1
+            ):
+                sa["matches"] = rope.substitute(sub)
+            elif _trace.enabled():
+                text, sa["matches"] = sub.subn(rope.join())
+                rope = Rope([text])
+            else:
+                rope = Rope([sub.substitute(rope.join())])
+
+    return rope
+
+
+_PACKAGE_NAME = "$HFPR_PACKAGE_NAME"
+_VERSION = "$HFPR_VERSION"
+_VERSION_CHARS = frozenset(_VERSION)
+
+
+@dataclass(frozen=True)
+class TextTemplate:
+    """
+    A rendered readme whose packaging metadata placeholders are yet to be
+    filled in.
+
+    *chunks* are the pieces of text between the placeholders, and the
+    placeholders themselves: 0 for the package name and 1 for the version.
+    """
+
+    chunks: tuple[str | int, ...]
+
+    @classmethod
+    def from_rope(cls, rope: Rope) -> TextTemplate:
+        """
+        Like `from_text` for the joined *rope*, but segments without
+        placeholders become chunks as they are.
+        """
+        rope.isolate(_PACKAGE_NAME)
+        rope.isolate(_VERSION)
+
+        return cls(
+            tuple(
+                itertools.chain.from_iterable(
+                    cls.from_text(seg).chunks for seg in rope.segments
+                )
+            )
+        )
+
+    @classmethod
+    def from_text(cls, text: str) -> TextTemplate:
+        chunks: list[str | int] = []
+        for i, piece in enumerate(text.split(_PACKAGE_NAME)):
+            if i:
+                chunks.append(0)
+            for j, sub_piece in enumerate(piece.split(_VERSION)):
+                if j:
+                    chunks.append(1)
+                if sub_piece:
+                    chunks.append(sub_piece)
+
+        return cls(tuple(chunks))
+
+    def render(self, package_name: str = "", version: str = "") -> str:
+        """
+        Return the same text as `build_text` with the same arguments.
+        """
+        if not _is_inert(package_name):
+            # The package name could form a version placeholder together
+            # with its surroundings, which the chained str.replace() calls
+            # of build_text would replace.
+            text = "".join(
+                c if isinstance(c, str) else (_PACKAGE_NAME, _VERSION)[c]
+                for c in self.chunks
+            )
+            return text.replace(_PACKAGE_NAME, package_name).replace(
+                _VERSION, version
+            )
+
+        values = (package_name, version)
+
+        return "".join(
+            [c if isinstance(c, str) else values[c] for c in self.chunks]
+        )
+
+
+def _is_inert(package_name: str) -> bool:
+    """
+    Can inserting *package_name* not create a new version placeholder?
 
-    for sub in substitutions:
-        text = sub.substitute(text)
+    Any occurrence that overlaps the name either contains it, or starts or
+    ends within it, or lies within it.
+    """
+    return (
+        bool(package_name)
+        and package_name[0] not in _VERSION_CHARS
+        and package_name[-1] not in _VERSION_CHARS
+        and _VERSION not in package_name
+    )
+
+
+async def build_text_async(
+    fragments: list[Fragment],
+    substitutions: list[Substituter],
+    package_name: str = "",
+    version: str = "",
+    executor: Executor | None = None,
+) -> str:
+    """
+    Like `build_text`, but run it in *executor* -- or the event loop's default
+    one -- so substitutions on large readmes don't block the event loop.
+    """
+    import asyncio
 
-    return text.replace("$HFPR_PACKAGE_NAME", package_name).replace(
-        "$HFPR_VERSION", version
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(
+        executor,
+        partial(build_text, fragments, substitutions, package_name, version),
     )
+
+
+def write_text(
+    fragments: list[Fragment],
+    substitutions: list[Substituter],
+    out: TextIO,
+    package_name: str = "",
+    version: str = "",
+) -> None:
+    """
+    Like `build_text`, but write the result into *out* as it's rendered.
+    """
+    out.writelines(iter_text(fragments, substitutions, package_name, version))
+
+
+def iter_text(
+    fragments: list[Fragment],
+    substitutions: list[Substituter],
+    package_name: str = "",
+    version: str = "",
+) -> Iterator[str]:
+    """
+    Yield the same text as `build_text` in chunks.
+
+    Fragments are rendered one by one, so only the largest fragment has to
+    be in memory at once.  Substitutions can match across fragment
+    boundaries, so the whole text is built first -- unless all of them
+    declare a maximum match length, in which case they're applied to
+    `STREAM_CHUNK_SIZE` pieces of the fragments as they pass by.
+    """
+    if not all(sub.streamable for sub in substitutions):
+        yield build_text(fragments, substitutions, package_name, version)
+        return
+
+    chunks: Iterable[str] = (f.render() for f in fragments)
+    if substitutions:
+        chunks = _split(chunks, STREAM_CHUNK_SIZE)
+        for sub in substitutions:
+            chunks = sub.substitute_stream(chunks)
+
+    chunks = _replace_stream(chunks, _PACKAGE_NAME, package_name)
+    chunks = _replace_stream(chunks, _VERSION, version)
+
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _split(chunks: Iterable[str], size: int) -> Iterator[str]:
+    for chunk in chunks:
+        for i in range(0, len(chunk), size):
+            yield chunk[i : i + size]
+
+
+def _replace_stream(
+    chunks: Iterable[str], old: str, new: str
+) -> Iterator[str]:
+    """
+    Apply ``str.replace(old, new)`` to the concatenation of *chunks* without
+    concatenating them.
+
+    The last ``len(old) - 1`` characters of each chunk are held back because
+    they could be the start of an occurrence that's completed by the next
+    one.
+    """
+    keep = len(old) - 1
+    carry = ""
+    for chunk in chunks:
+        buf = carry + chunk
+        cut = len(buf) - keep
+        parts = []
+        pos = 0
+        idx = buf.find(old)
+        while idx != -1 and idx < cut:
+            parts.append(buf[pos:idx])
+            parts.append(new)
+            pos = idx + len(old)
+            idx = buf.find(old, pos)
+
+        end = max(pos, cut)
+        parts.append(buf[pos:end])
+        carry = buf[end:]
+
+        yield "".join(parts)
+
+    yield carry
@@ -0,0 +1,288 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import sys
+import threading
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Tuple
+
+from . import _trace
+from ._builder import TextTemplate, compile_text
+from ._config import Config, load_and_validate_config
+from ._inputs import (
+    fragment_paths,
+    git_digest,
+    git_sources,
+    own_version,
+    stat_signature,
+)
+
+
+if sys.platform == "win32":  # pragma: no cover
+    import msvcrt
+
+    def _lock_file(fd: int) -> None:
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(fd: int) -> None:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+else:
+    import fcntl
+
+    def _lock_file(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock_file(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+MEMO_SIZE = 64
+
+
+def render_readme(
+    config: dict[str, Any],
+    package_name: str,
+    pkg_version: str,
+    cache: RenderCache | None = None,
+) -> dict[str, str]:
+    """
+    Render the readme metadata table for *config*, taking every shortcut
+    available: the in-process memo, the on-disk *cache*, and finally an
+    actual load & render.
+    """
+    key = memo_key(config)
+    text_key = (*key, package_name, pkg_version)
+
+    with _trace.span("render", source="memo") as attrs:
+        with _memo_lock:
+            readme = _readmes.get(text_key)
+        if readme is not None:
+            return readme.copy()
+
+        attrs["source"] = "cache"
+        if cache is not None:
+            fp = fingerprint(config, package_name, pkg_version)
+            readme = cache.get(fp)
+
+        if readme is None:
+            attrs["source"] = "rendered"
+            cfg = load_config_memoized(config, key)
+            readme = {
+                "content-type": cfg.content_type,
+                "text": _compile_memoized(cfg, key).render(
+                    package_name, pkg_version
+                ),
+            }
+            if cache is not None:
+                cache.set(fp, readme)
+
+        with _memo_lock:
+            _remember(_readmes, text_key, readme)
+
+        return readme.copy()
+
+
+MemoKey = Tuple[str, Tuple[Tuple[str, Any], ...]]
+
+_memo_lock = threading.Lock()
+_configs: dict[MemoKey, Config] = {}
+_templates: dict[MemoKey, TextTemplate] = {}
+_readmes: dict[tuple[Any, ...], dict[str, str]] = {}
+
+
+def load_config_memoized(
+    config: dict[str, Any], key: MemoKey | None = None
+) -> Config:
+    """
+    Like `load_and_validate_config`, but return the previously loaded
+    `Config` if neither *config* nor any of the files it references have
+    changed since.
+    """
+    if key is None:
+        key = memo_key(config)
+
+    with _memo_lock:
+        cfg = _configs.get(key)
+    if cfg is None:
+        cfg = load_and_validate_config(config)
+        with _memo_lock:
+            _remember(_configs, key, cfg)
+
+    return cfg
+
+
+def _compile_memoized(cfg: Config, key: MemoKey) -> TextTemplate:
+    """
+    Apply fragments and substitutions only once per configuration, no matter
+    for how many package names and versions it's rendered.
+    """
+    with _memo_lock:
+        template = _templates.get(key)
+    if template is None:
+        template = compile_text(cfg.fragments, cfg.substitutions)
+        with _memo_lock:
+            _remember(_templates, key, template)
+
+    return template
+
+
+def memo_key(config: dict[str, Any]) -> MemoKey:
+    """
+    Freeze *config* and the stat signatures of the files it references into
+    a hashable key.
+
+    Files that are read from git are identified by their contents instead,
+    since a ref like ``HEAD`` can move without touching the file system.
+    """
+    return (
+        json.dumps(config, sort_keys=True, default=str),
+        (
+            *((path, stat_signature(path)) for path in fragment_paths(config)),
+            *(
+                (f"{ref}:{path}", git_digest(ref, path))
+                for ref, path in git_sources(config)
+            ),
+        ),
+    )
+
+
+def clear_memo() -> None:
+    """
+    Forget everything that has been memoized in this process.
+    """
+    with _memo_lock:
+        _configs.clear()
+        _templates.clear()
+        _readmes.clear()
+
+
+def _remember(memo: dict[Any, Any], key: Any, value: Any) -> None:
+    memo[key] = value
+    while len(memo) > MEMO_SIZE:
+        del memo[next(iter(memo))]
+
+
+def fingerprint(
+    config: dict[str, Any], package_name: str, pkg_version: str
+) -> str:
+    """
+    Compute a key that changes whenever the rendered readme could change.
+
+    That is: the hook configuration, the contents of all files that are
+    referenced by fragments, the packaging metadata, and our own version.
+    """
+    h = hashlib.sha256()
+    h.update(
+        json.dumps(
+            [own_version(), package_name, pkg_version, config],
+            sort_keys=True,
+            default=str,
+        ).encode()
+    )
+
+    for path in fragment_paths(config):
+        h.update(b"\0" + path.encode())
+        try:
+            h.update(hashlib.sha256(Path(path).read_bytes()).digest())
+        except OSError:
+            h.update(b"\0missing")
+
+    for ref, path in git_sources(config):
+        h.update(f"\0{ref}:{path}".encode())
+        h.update((git_digest(ref, path) or "missing").encode())
+
+    return h.hexdigest()
+
+
+@dataclass
+class RenderCache:
+    """
+    A directory of rendered readmes that can be shared between processes.
+
+    Entries are written atomically, so reading doesn't need a lock.  Writing
+    and eviction are serialized using a lock file within the directory.
+    Once the entries exceed *max_size* bytes, the least recently used ones
+    are evicted.
+    """
+
+    directory: Path
+    max_size: int = DEFAULT_MAX_SIZE
+
+    def get(self, key: str) -> dict[str, str] | None:
+        path = self.directory / f"{key}.json"
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        # Mark as recently used for eviction.
+        with contextlib.suppress(OSError):
+            os.utime(path)
+
+        return entry  # type: ignore[no-any-return]
+
+    def set(self, key: str, entry: dict[str, str]) -> None:
+        """
+        Store *entry* under *key*.
+
+        The cache is only a shortcut, so if it can't be written -- for
+        instance because *directory* is read-only -- the entry is dropped
+        instead of failing the build.
+        """
+        with contextlib.suppress(OSError):
+            self._store(key, entry)
+
+    def _store(self, key: str, entry: dict[str, str]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with self._locked():
+            import tempfile
+
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                Path(tmp).replace(self.directory / f"{key}.json")
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*.json"):
+            with contextlib.suppress(OSError):
+                st = path.stat()
+                entries.append((st.st_mtime_ns, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            with contextlib.suppress(OSError):
+                path.unlink()
+            total -= size
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        fd = os.open(self.directory / ".lock", os.O_RDWR | os.O_CREAT)
+        try:
+            _lock_file(fd)
+            try:
+                yield
+            finally:
+                _unlock_file(fd)
+        finally:
+            os.close(fd)
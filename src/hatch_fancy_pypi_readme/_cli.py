@@ -7,12 +7,18 @@ from __future__ import annotations
 import sys
 
 from contextlib import suppress
-from typing import Any, NoReturn, TextIO
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, NoReturn, TextIO
 
 from hatch_fancy_pypi_readme.exceptions import ConfigurationError
 
-from ._builder import build_text
-from ._config import load_and_validate_config
+from . import _trace
+from ._builder import write_text
+from ._config import Config, load_and_validate_config
+
+
+if TYPE_CHECKING:
+    from ._files import FileCache
 
 
 def cli_run(
@@ -21,26 +27,145 @@ def cli_run(
     """
     Best-effort verify config and print resulting PyPI readme.
     """
+    try:
+        config = load_cli_config(pyproject, hatch_toml)
+    except CLIError as e:
+        _fail(str(e))
+
+    try:
+        write_text(
+            config.fragments,
+            config.substitutions,
+            out,
+            "your-package",
+            "42.0",
+        )
+    except ConfigurationError as e:
+        # E.g. a substitution that exceeded its regex-timeout.
+        _fail("\n".join(e.errors))
+    out.write("\n")
+
+
+def compile_run(
+    pyproject: dict[str, Any],
+    hatch_toml: dict[str, Any],
+    target: Path | None,
+    root: Path,
+) -> None:
+    """
+    Verify config and write a precompiled readme into *target* -- or where
+    the `precompiled` option relative to *root* points.
+    """
+    from ._precompiled import write_artifact
+
+    try:
+        raw = find_cli_config(pyproject, hatch_toml)
+        config = load_cli_config(pyproject, hatch_toml)
+    except CLIError as e:
+        _fail(str(e))
+
+    if target is None:
+        if not isinstance(raw.get("precompiled"), str):
+            _fail(
+                "Pass a target file using -o or set the 'precompiled' option."
+            )
+        target = root / raw["precompiled"]
+
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        write_artifact(raw, config, target)
+    except ConfigurationError as e:
+        _fail("\n".join(e.errors))
+    except OSError as e:
+        _fail(f"Can't write precompiled readme to {target}: {e}")
+
+    print(f"Precompiled readme written to {target}.", file=sys.stderr)
+
+
+def maybe_load_hatch_toml(hatch_toml_arg: str | None) -> dict[str, object]:
+    """
+    If hatch.toml is passed or detected, load it.
+    """
+    if hatch_toml_arg:
+        return load_toml(Path(hatch_toml_arg))
+
+    if Path("hatch.toml").exists():
+        return load_toml(Path("hatch.toml"))
+
+    return {}
+
+
+def load_toml(path: Path) -> dict[str, Any]:
+    if sys.version_info < (3, 11):
+        import tomli as tomllib
+    else:
+        import tomllib
+
+    return tomllib.loads(path.read_text())
+
+
+class CLIError(Exception):
+    """
+    The configuration can't be rendered; the message tells the user why.
+    """
+
+
+def load_cli_config(
+    pyproject: dict[str, Any],
+    hatch_toml: dict[str, Any],
+    files: FileCache | None = None,
+) -> Config:
+    """
+    Find, load, and validate the configuration in *pyproject* or
+    *hatch_toml*.
+
+    Raises:
+        CLIError: With a helpful message.
+    """
+    cfg = find_cli_config(pyproject, hatch_toml)
+
+    try:
+        return load_and_validate_config(cfg, files)
+    except ConfigurationError as e:
+        msg = "Configuration has errors:\n\n" + "\n".join(
+            f"- {msg}" for msg in e.errors
+        )
+        raise CLIError(msg) from None
+
+
+def find_cli_config(
+    pyproject: dict[str, Any], hatch_toml: dict[str, Any]
+) -> dict[str, Any]:
+    """
+    Find the raw hook configuration in *pyproject* or *hatch_toml*.
+
+    Raises:
+        CLIError: With a helpful message.
+    """
     is_dynamic = False
     with suppress(KeyError):
         is_dynamic = "readme" in pyproject["project"]["dynamic"]
 
     if not is_dynamic:
-        _fail("You must add 'readme' to 'project.dynamic'.")
+        msg = "You must add 'readme' to 'project.dynamic'."
+        raise CLIError(msg)
 
     try:
-        if (
+        both = (
             pyproject["tool"]["hatch"]["metadata"]["hooks"][
                 "fancy-pypi-readme"
             ]
             and hatch_toml["metadata"]["hooks"]["fancy-pypi-readme"]
-        ):
-            _fail(
-                "Both pyproject.toml and hatch.toml contain "
-                "hatch-fancy-pypi-readme configuration."
-            )
+        )
     except KeyError:
-        pass
+        both = False
+
+    if both:
+        msg = (
+            "Both pyproject.toml and hatch.toml contain "
+            "hatch-fancy-pypi-readme configuration."
+        )
+        raise CLIError(msg)
 
     try:
         cfg = hatch_toml["metadata"]["hooks"]["fancy-pypi-readme"]
@@ -50,26 +175,93 @@ def cli_run(
                 "fancy-pypi-readme"
             ]
         except KeyError:
-            _fail(
+            msg = (
                 "Missing configuration "
                 "(`[tool.hatch.metadata.hooks.fancy-pypi-readme]` in"
                 " pyproject.toml or `[metadata.hooks.fancy-pypi-readme]`"
-                " in hatch.toml)",
+                " in hatch.toml)"
             )
+            raise CLIError(msg) from None
+
+    return cfg  # type: ignore[no-any-return]
+
+
+def profile_run(
+    pyproject: dict[str, Any],
+    hatch_toml: dict[str, Any],
+    out: TextIO,
+    pstats_path: str | None = None,
+    limit: int = 10,
+) -> None:
+    """
+    Like `cli_run`, but print the slowest fragments and substitutions to
+    standard error afterwards, and optionally dump a cProfile profile into
+    *pstats_path*.
+    """
+    import cProfile
 
+    spans: list[_trace.Span] = []
+    profiler = cProfile.Profile()
+
+    _trace.add_observer(spans.append)
     try:
-        config = load_and_validate_config(cfg)
-    except ConfigurationError as e:
-        _fail(
-            "Configuration has errors:\n\n"
-            + "\n".join(f"- {msg}" for msg in e.errors),
-        )
+        if pstats_path:
+            profiler.enable()
+        try:
+            cli_run(pyproject, hatch_toml, out)
+        finally:
+            profiler.disable()
+    finally:
+        _trace.remove_observer(spans.append)
+
+    print(format_report(spans, limit), file=sys.stderr)
+
+    if pstats_path:
+        profiler.dump_stats(pstats_path)
+        print(f"Profile written to {pstats_path}.", file=sys.stderr)
+
+
+def format_report(spans: list[_trace.Span], limit: int = 10) -> str:
+    """
+    Render the slowest *limit* fragment and substitution spans as a table,
+    preceded by the totals of the whole stages.
+    """
+    lines = ["Totals:"]
+    lines.extend(
+        f"  {_ms(s.duration)}  {s.name}"
+        for s in spans
+        if s.name in ("config", "build")
+    )
+
+    ranked = sorted(
+        (s for s in spans if s.name in ("fragment", "substitution")),
+        key=lambda s: s.duration,
+        reverse=True,
+    )
+    lines.append("")
+    lines.append(f"Slowest fragments and substitutions (top {limit}):")
+    lines.extend(
+        f"  {_ms(s.duration)}  {s.name:<12}  {_describe(s)}"
+        for s in ranked[:limit]
+    )
+
+    return "\n".join(lines)
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:>9.2f} ms"
+
+
+def _describe(span: _trace.Span) -> str:
+    attrs = span.attributes
+    if span.name == "substitution":
+        patterns = " | ".join(attrs.get("patterns", []))
+        return f"{patterns} (matches: {attrs.get('matches', 0)})"
 
-    print(
-        build_text(
-            config.fragments, config.substitutions, "your-package", "42.0"
-        ),
-        file=out,
+    what = attrs.get("path") or attrs.get("type", "?")
+    return (
+        f"{what} (read: {attrs.get('bytes_read', 0)} B, "
+        f"kept: {attrs.get('bytes_kept', 0)} B)"
     )
 
 
@@ -4,25 +4,66 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, cast
+from contextlib import closing
+from dataclasses import dataclass, field
+from functools import partial
+from typing import TYPE_CHECKING, Any, cast
 
-from ._fragments import VALID_FRAGMENTS, Fragment
+from . import _trace
+from ._builder import apply_substitutions
+from ._files import FileCache
+from ._fragments import VALID_FRAGMENTS, Fragment, TextFragment
 from ._substitutions import Substituter
 from .exceptions import ConfigurationError
 
 
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+
 @dataclass
 class Config:
     content_type: str
     fragments: list[Fragment]
     substitutions: list[Substituter]
+    files: FileCache = field(
+        default_factory=FileCache, repr=False, compare=False
+    )
 
 
 _BASE = "tool.hatch.metadata.hooks.fancy-pypi-readme."
 
 
-def load_and_validate_config(config: dict[str, Any]) -> Config:
+def load_and_validate_config(
+    config: dict[str, Any], files: FileCache | None = None
+) -> Config:
+    """
+    Each file that fragments refer to is read only once per call.  The
+    statistics of *files* -- or a fresh cache -- are available as
+    `Config.files` for debugging.
+
+    A fresh cache is released once loading is done.  If you pass *files*,
+    its contents are kept, so they can be reused across calls.
+    """
+    with _trace.span("config") as attrs:
+        if files is None:
+            with closing(FileCache()) as fc:
+                cfg = _load_and_validate_config(config, fc)
+        else:
+            cfg = _load_and_validate_config(config, files)
+
+        attrs.update(
+            fragments=len(cfg.fragments),
+            substitutions=len(cfg.substitutions),
+            files_read=cfg.files.misses,
+        )
+
+        return cfg
+
+
+def _load_and_validate_config(
+    config: dict[str, Any], files: FileCache
+) -> Config:
     errs = []
 
     ct = config.get("content-type")
@@ -34,21 +75,45 @@ def load_and_validate_config(config: dict[str, Any]) -> Config:
             "['text/markdown', 'text/x-rst']"
         )
 
+    cache_dir = config.get("cache-dir")
+    if cache_dir is not None and not isinstance(cache_dir, str):
+        errs.append(f"{_BASE}cache-dir must be a string.")
+
+    precompiled = config.get("precompiled")
+    if precompiled is not None and not isinstance(precompiled, str):
+        errs.append(f"{_BASE}precompiled must be a string.")
+
+    workers = config.get("load-workers")
+    if workers is not None and (
+        not isinstance(workers, int)
+        or isinstance(workers, bool)
+        or workers < 1
+    ):
+        errs.append(f"{_BASE}load-workers must be a positive integer.")
+        workers = None
+
+    regex_timeout = config.get("regex-timeout")
+    if regex_timeout is not None and (
+        not isinstance(regex_timeout, (int, float))
+        or isinstance(regex_timeout, bool)
+        or regex_timeout <= 0
+    ):
+        errs.append(f"{_BASE}regex-timeout must be a positive number.")
+        regex_timeout = None
+
     try:
-        fragments = _load_fragments(config.get("fragments"))
+        fragments = _load_fragments(
+            config.get("fragments"), files, workers, regex_timeout
+        )
     except ConfigurationError as e:
         errs.extend(e.errors)
 
     try:
-        subs_cfg = config.get("substitutions", [])
-        if not isinstance(subs_cfg, list):
-            raise ConfigurationError(
-                [f"{_BASE}substitutions must be an array."]
-            )
-
-        substitutions = [
-            Substituter.from_config(sub_cfg) for sub_cfg in subs_cfg
-        ]
+        substitutions = _load_substitutions(
+            config.get("substitutions", []),
+            f"{_BASE}substitutions",
+            regex_timeout,
+        )
     except ConfigurationError as e:
         errs.extend(e.errors)
 
@@ -59,38 +124,145 @@ def load_and_validate_config(config: dict[str, Any]) -> Config:
         content_type=cast("str", ct),
         fragments=fragments,
         substitutions=substitutions,
+        files=files,
     )
 
 
-def _load_fragments(config: list[dict[str, str]] | None) -> list[Fragment]:
+def _load_substitutions(
+    config: Any, name: str, regex_timeout: float | None
+) -> list[Substituter]:
+    if not isinstance(config, list):
+        raise ConfigurationError([f"{name} must be an array."])
+
+    return [
+        Substituter.from_config(sub_cfg, regex_timeout) for sub_cfg in config
+    ]
+
+
+async def load_and_validate_config_async(
+    config: dict[str, Any],
+    files: FileCache | None = None,
+    executor: Executor | None = None,
+) -> Config:
+    """
+    Like `load_and_validate_config`, but read the fragment files in
+    *executor* -- or the event loop's default one -- without blocking the
+    event loop.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(
+        executor, partial(load_and_validate_config, config, files)
+    )
+
+
+def _load_fragments(
+    config: list[dict[str, str]] | None,
+    files: FileCache,
+    workers: int | None = None,
+    regex_timeout: float | None = None,
+) -> list[Fragment]:
     """
     Load fragments from *config*.
+
+    If *workers* is passed, the fragments are loaded concurrently by that many
+    threads.  Their order and the order of the errors stay the same.
     """
     if config is None:
         raise ConfigurationError([f"{_BASE}fragments is missing."])
     if not config:
         raise ConfigurationError([f"{_BASE}fragments must not be empty."])
 
+    load = partial(
+        _try_load_fragment, files=files, regex_timeout=regex_timeout
+    )
+    if workers is None:
+        results = [load(frag_cfg) for frag_cfg in config]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(load, config))
+
     frags = []
     errs = []
+    for result in results:
+        if isinstance(result, ConfigurationError):
+            errs.extend(result.errors)
+        else:
+            frags.append(result)
+
+    if errs:
+        raise ConfigurationError(errs)
+
+    return frags
 
-    for frag_cfg in config:
-        for frag in VALID_FRAGMENTS:
-            if frag.key not in frag_cfg:
-                continue
 
+def _try_load_fragment(
+    frag_cfg: dict[str, str],
+    files: FileCache,
+    regex_timeout: float | None = None,
+) -> Fragment | ConfigurationError:
+    """
+    Return errors instead of raising them, so the errors of all fragments can
+    be collected in order.
+    """
+    for frag in VALID_FRAGMENTS:
+        if frag.key not in frag_cfg:
+            continue
+
+        with _trace.span("fragment", type=frag.key) as attrs:
+            if frag.key in ("path", "glob"):
+                attrs[frag.key] = frag_cfg[frag.key]
             try:
-                frags.append(frag.from_config(frag_cfg))
+                fragment = _load_fragment(frag, frag_cfg, files, regex_timeout)
             except ConfigurationError as e:
-                errs.extend(e.errors)
+                attrs["error"] = "ConfigurationError"
+                return e
+
+            if _trace.enabled():
+                attrs["bytes_kept"] = len(fragment.render().encode())
+
+            return fragment
+
+    return ConfigurationError([f"Unknown fragment type {frag_cfg!r}."])
 
-            # We have either detected and added or detected and errored, but in
-            # any case we're done with this fragment.
-            break
-        else:
-            errs.append(f"Unknown fragment type {frag_cfg!r}.")
+
+def _load_fragment(
+    frag: type[Fragment],
+    frag_cfg: dict[str, Any],
+    files: FileCache,
+    regex_timeout: float | None,
+) -> Fragment:
+    """
+    Load a fragment and apply its own substitutions, if it has any.
+    """
+    # Fragments consume their configuration, but ours must stay intact for
+    # repeated loads.
+    frag_cfg = frag_cfg.copy()
+    subs_cfg = frag_cfg.pop("substitutions", [])
+
+    errs = []
+    try:
+        fragment = frag.from_config(frag_cfg, files, regex_timeout)
+    except ConfigurationError as e:
+        errs.extend(e.errors)
+
+    try:
+        substitutions = _load_substitutions(
+            subs_cfg, "Fragment substitutions", regex_timeout
+        )
+    except ConfigurationError as e:
+        errs.extend(e.errors)
 
     if errs:
         raise ConfigurationError(errs)
 
-    return frags
+    if not substitutions:
+        return fragment
+
+    # Fragments are rendered more than once, so it's cheaper to keep the
+    # result than to substitute again each time.
+    return TextFragment(apply_substitutions(substitutions, fragment.render()))
@@ -0,0 +1,181 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import contextlib
+import fnmatch
+import mmap
+import os
+import threading
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator
+
+from . import _trace
+
+
+@dataclass
+class FileCache:
+    """
+    Contents of the files that fragments read during one configuration load.
+
+    Each file is opened at most once: either it's memory-mapped, or its
+    decoded text is kept.  *hits* and *misses* count how many requests were
+    served from the cache and how many had to open the file.
+
+    It's safe to use from multiple threads.  Different files are read
+    concurrently, while requests for the same file wait for each other.
+
+    If files can change while they're cached, pass ``use_mmap=False``:
+    accessing memory maps of truncated files crashes the process.
+    """
+
+    use_mmap: bool = True
+    hits: int = 0
+    misses: int = 0
+    _texts: dict[Path, str] = field(default_factory=dict, repr=False)
+    _maps: dict[Path, mmap.mmap] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _path_locks: dict[Path, threading.Lock] = field(
+        default_factory=dict, repr=False
+    )
+
+    def map(self, path: Path, min_size: int) -> mmap.mmap | None:
+        """
+        Return a read-only memory map of *path* if it's at least *min_size*
+        bytes big.
+
+        Otherwise, the file's text is cached for `read_text` and None is
+        returned.
+        """
+        key = path.absolute()
+        with self._locked(key):
+            if key in self._maps or key in self._texts:
+                self._count(hit=True)
+                return self._maps.get(key)
+
+            self._count(hit=False)
+            with path.open("rb") as f:
+                if self.use_mmap and os.fstat(f.fileno()).st_size >= min_size:
+                    try:
+                        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    except (OSError, ValueError):
+                        pass
+                    else:
+                        self._maps[key] = mm
+                        return mm
+
+                data = f.read()
+
+            _trace.add("bytes_read", len(data))
+            self._texts[key] = decode_text(data)
+
+            return None
+
+    def read_text(self, path: Path) -> str:
+        """
+        Return the contents of *path* like ``path.read_text("utf-8")``.
+        """
+        key = path.absolute()
+        with self._locked(key):
+            text = self._texts.get(key)
+            if text is not None:
+                self._count(hit=True)
+                return text
+
+            mm = self._maps.get(key)
+            if mm is not None:
+                self._count(hit=True)
+                data = mm[:]
+            else:
+                self._count(hit=False)
+                data = path.read_bytes()
+
+            _trace.add("bytes_read", len(data))
+            text = decode_text(data)
+
+            self._texts[key] = text
+
+            return text
+
+    def invalidate(self, path: Path) -> None:
+        """
+        Forget the contents of *path*, so it's read again on next access.
+        """
+        key = path.absolute()
+        with self._locked(key):
+            self._texts.pop(key, None)
+            mm = self._maps.pop(key, None)
+            if mm is not None:
+                mm.close()
+
+    def _count(self, *, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @contextlib.contextmanager
+    def _locked(self, key: Path) -> Iterator[None]:
+        with self._lock:
+            lock = self._path_locks.setdefault(key, threading.Lock())
+        with lock:
+            yield
+
+    def close(self) -> None:
+        """
+        Release all memory maps and texts.  Statistics are kept.
+        """
+        for mm in self._maps.values():
+            mm.close()
+        self._maps.clear()
+        self._texts.clear()
+        self._path_locks.clear()
+
+
+def decode_text(data: bytes) -> str:
+    """
+    Decode *data* like reading a file in text mode would, including newline
+    translation.
+    """
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+
+    return text
+
+
+def glob_files(pattern: str) -> list[str]:
+    """
+    Return the paths of the regular files that match *pattern*, sorted by
+    name.
+
+    Only the last component of *pattern* may contain wildcards, such that a
+    single `os.scandir` of its directory finds all matches.  Like with
+    `glob.glob`, names that start with a dot only match if the pattern does
+    too.
+
+    Raises:
+        FileNotFoundError: If the directory doesn't exist.
+        ValueError: If the directory part contains wildcards.
+    """
+    path = Path(pattern)
+    directory, name_pattern = path.parent, path.name
+    if any(c in str(directory) for c in "*?["):
+        raise ValueError(directory)
+
+    hidden = name_pattern.startswith(".")
+    with os.scandir(directory) as it:
+        names = sorted(
+            entry.name
+            for entry in it
+            if fnmatch.fnmatchcase(entry.name, name_pattern)
+            and (hidden or not entry.name.startswith("."))
+            and entry.is_file()
+        )
+
+    return [str(directory / name) for name in names]
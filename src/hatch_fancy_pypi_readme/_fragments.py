@@ -4,20 +4,34 @@
 
 from __future__ import annotations
 
+import os
 import re
 
+from contextlib import closing
 from dataclasses import dataclass
 from pathlib import Path
-from typing import ClassVar, Iterable, Protocol
+from typing import TYPE_CHECKING, BinaryIO, ClassVar, Iterable, Protocol
 
+from . import _git, _trace
+from ._files import FileCache, decode_text, glob_files
+from ._timeout import check_backtracking, run_with_timeout, search_groups
 from .exceptions import ConfigurationError
 
 
+if TYPE_CHECKING:
+    import mmap
+
+
 class Fragment(Protocol):
     key: ClassVar[str]
 
     @classmethod
-    def from_config(cls, cfg: dict[str, str]) -> Fragment: ...
+    def from_config(
+        cls,
+        cfg: dict[str, str],
+        files: FileCache | None = None,
+        regex_timeout: float | None = None,
+    ) -> Fragment: ...
 
     def render(self) -> str: ...
 
@@ -33,7 +47,12 @@ class TextFragment:
     _text: str
 
     @classmethod
-    def from_config(cls, cfg: dict[str, str]) -> Fragment:
+    def from_config(
+        cls,
+        cfg: dict[str, str],
+        files: FileCache | None = None,  # noqa: ARG003
+        regex_timeout: float | None = None,  # noqa: ARG003
+    ) -> Fragment:
         text = cfg[cls.key]
         if not text:
             raise ConfigurationError(["Text fragments must not be empty."])
@@ -55,64 +74,78 @@ class FileFragment:
     _contents: str
 
     @classmethod
-    def from_config(cls, cfg: dict[str, str]) -> Fragment:
+    def from_config(
+        cls,
+        cfg: dict[str, str],
+        files: FileCache | None = None,
+        regex_timeout: float | None = None,
+    ) -> Fragment:
+        """
+        Files are read through *files* if passed, so fragments that share a
+        file read it only once.
+
+        *regex_timeout* works like for `Substituter.from_config`.
+
+        If *cfg* has a ``git-ref``, the file is read as of that commit from
+        the git repository that contains it instead.
+        """
+        if files is None:
+            with closing(FileCache()) as fc:
+                return cls.from_config(cfg, fc, regex_timeout)
+
         path = Path(cfg.pop(cls.key))
+        starts = [k for k in _START_KEYS if cfg.get(k) is not None]
         start_after = cfg.pop("start-after", None)
         start_at = cfg.pop("start-at", None)
+        tail = _Tail.from_config(cfg)
         end_before = cfg.pop("end-before", None)
         pattern = cfg.pop("pattern", None)
+        git_ref = cfg.pop("git-ref", None)
 
-        errs: list[str] = []
-
-        try:
-            contents = path.read_text(encoding="utf-8")
-        except FileNotFoundError:
-            raise ConfigurationError(
-                [f"Fragment file '{path}' not found."]
-            ) from None
+        contents: str | None
+        if git_ref is not None:
+            contents = _read_git(git_ref, path)
+            sliced = False
+        else:
+            try:
+                if tail is not None:
+                    contents = tail.read(path)
+                else:
+                    contents = _read_slice(
+                        files, path, start_after, start_at, end_before
+                    )
+                sliced = contents is not None
+                if contents is None:
+                    contents = files.read_text(path)
+            except FileNotFoundError:
+                raise ConfigurationError(
+                    [f"Fragment file '{path}' not found."]
+                ) from None
 
-        if start_after and start_at:
+        if len(starts) > 1:
             raise ConfigurationError(
                 [
-                    "file fragment: 'start-after' and 'start-at' are "
-                    "mutually exclusive."
+                    "file fragment: "
+                    + " and ".join(f"'{k}'" for k in starts)
+                    + " are mutually exclusive."
                 ]
             )
 
-        if start_after is not None:
-            try:
-                _, contents = contents.split(start_after, 1)
-            except ValueError:
-                errs.append(
-                    f"file fragment: 'start-after' {start_after!r} not found."
-                )
-        elif start_at is not None:
-            p = contents.find(start_at)
-            if p == -1:
-                errs.append(
-                    f"file fragment: 'start-at' {start_at!r} not found."
-                )
-            contents = contents[p:]
+        errs: list[str] = []
 
-        if end_before is not None:
-            try:
-                contents, _ = contents.split(end_before, 1)
-            except ValueError:
-                errs.append(
-                    f"file fragment: 'end-before' {end_before!r} not found."
-                )
+        if tail is not None:
+            if not sliced:
+                contents, errs = tail.cut(contents)
+            contents, more_errs = _cut(contents, None, None, end_before)
+            errs.extend(more_errs)
+        elif not sliced:
+            contents, errs = _cut(contents, start_after, start_at, end_before)
 
         if pattern:
-            m = re.search(pattern, contents, re.DOTALL)
-            if not m:
-                errs.append(f"file fragment: pattern {pattern!r} not found.")
-            else:
-                try:
-                    contents = m.group(1)
-                except IndexError:
-                    errs.append(
-                        "file fragment: pattern matches, but no group defined."
-                    )
+            try:
+                contents = _apply_pattern(pattern, contents, regex_timeout)
+            except ConfigurationError as e:
+                errs.extend(e.errors)
 
         if errs:
             raise ConfigurationError(errs)
@@ -123,4 +156,370 @@ class FileFragment:
         return self._contents
 
 
-VALID_FRAGMENTS: Iterable[type[Fragment]] = (TextFragment, FileFragment)
+_START_KEYS = (
+    "start-after",
+    "start-at",
+    "start-after-last",
+    "start-at-last",
+    "tail-lines",
+)
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class _Tail:
+    """
+    The end of a file: either its last *lines* lines, or everything from the
+    last occurrence of *marker* -- including it if *keep_marker* is True.
+
+    Lines are separated by newlines, and a final newline doesn't start
+    another line.
+    """
+
+    lines: int | None = None
+    marker: str | None = None
+    keep_marker: bool = False
+
+    @classmethod
+    def from_config(cls, cfg: dict[str, str]) -> _Tail | None:
+        """
+        Pop the tail options from *cfg*, or return None if there are none.
+        """
+        lines: object = cfg.pop("tail-lines", None)
+        start_after_last = cfg.pop("start-after-last", None)
+        start_at_last = cfg.pop("start-at-last", None)
+
+        if lines is not None:
+            if (
+                not isinstance(lines, int)
+                or isinstance(lines, bool)
+                or lines < 1
+            ):
+                raise ConfigurationError(
+                    ["file fragment: 'tail-lines' must be a positive integer."]
+                )
+            return cls(lines=lines)
+
+        for key, marker in (
+            ("start-after-last", start_after_last),
+            ("start-at-last", start_at_last),
+        ):
+            if marker is None:
+                continue
+            if not isinstance(marker, str) or not marker:
+                raise ConfigurationError(
+                    [f"file fragment: '{key}' must be a non-empty string."]
+                )
+            return cls(marker=marker, keep_marker=key == "start-at-last")
+
+        return None
+
+    def read(self, path: Path) -> str | None:
+        """
+        Read *path* backwards in blocks until the tail is found and decode
+        only the tail.
+
+        Returns None if that's not possible -- the marker is missing, or
+        newline translation would move it -- in which case the caller has to
+        read the whole file and `cut` it.  That's also where errors are
+        reported.
+        """
+        with path.open("rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            start = self._find_start(f, size)
+            if start is None:
+                return None
+
+            f.seek(start)
+            data = f.read(size - start)
+
+        _trace.add("bytes_read", len(data))
+        if self.marker is not None and not self.keep_marker:
+            data = data[len(self.marker.encode()) :]
+
+        return decode_text(data)
+
+    def _find_start(self, f: BinaryIO, size: int) -> int | None:
+        marker = self.marker.encode() if self.marker is not None else None
+        remaining = self.lines or 0
+        # The beginning of the previously read block, for markers and line
+        # breaks that span blocks.
+        carry = b""
+        end = size
+        while end > 0:
+            start = max(0, end - TAIL_BLOCK_SIZE)
+            f.seek(start)
+            block = f.read(end - start)
+            _trace.add("bytes_scanned", len(block))
+            hay = block + carry
+
+            # Lone carriage returns are line breaks in text mode, and line
+            # breaks within markers would be translated.
+            if block.count(b"\r") != hay[: len(block) + 1].count(b"\r\n") or (
+                marker is not None and b"\n" in marker and b"\r" in block
+            ):
+                return None
+
+            if marker is not None:
+                i = hay.rfind(marker)
+                if i != -1:
+                    return start + i
+            else:
+                i = len(block)
+                if end == size and block.endswith(b"\n"):
+                    i -= 1
+                while (i := block.rfind(b"\n", 0, i)) != -1:
+                    remaining -= 1
+                    if not remaining:
+                        return start + i + 1
+
+            carry = block[: max(len(marker or b"") - 1, 1)]
+            end = start
+
+        return None if marker is not None else 0
+
+    def cut(self, contents: str) -> tuple[str, list[str]]:
+        """
+        Cut the tail out of the whole *contents*.
+        """
+        if self.marker is None:
+            i = len(contents)
+            if contents.endswith("\n"):
+                i -= 1
+            for _ in range(self.lines or 0):
+                i = contents.rfind("\n", 0, i)
+                if i == -1:
+                    return contents, []
+
+            return contents[i + 1 :], []
+
+        i = contents.rfind(self.marker)
+        if i == -1:
+            key = "start-at-last" if self.keep_marker else "start-after-last"
+            return contents, [
+                f"file fragment: '{key}' {self.marker!r} not found."
+            ]
+
+        if not self.keep_marker:
+            i += len(self.marker)
+
+        return contents[i:], []
+
+
+GLOB_WORKERS = 8
+
+
+@dataclass
+class GlobFragment:
+    """
+    The concatenated contents of all files that match a glob pattern.
+    """
+
+    key: ClassVar[str] = "glob"
+
+    _contents: str
+
+    @classmethod
+    def from_config(
+        cls,
+        cfg: dict[str, str],
+        files: FileCache | None = None,
+        regex_timeout: float | None = None,  # noqa: ARG003
+    ) -> Fragment:
+        """
+        The files are read concurrently through *files* and joined in the
+        order of their names, using the optional *separator*.
+        """
+        if files is None:
+            with closing(FileCache()) as fc:
+                return cls.from_config(cfg, fc)
+
+        pattern = cfg.pop(cls.key)
+        separator = cfg.pop("separator", "")
+        if not isinstance(separator, str):
+            raise ConfigurationError(
+                ["glob fragment: 'separator' must be a string."]
+            )
+
+        try:
+            paths = [Path(p) for p in glob_files(pattern)]
+            _trace.add("files", len(paths))
+            if len(paths) > 1:
+                from concurrent.futures import ThreadPoolExecutor
+
+                with ThreadPoolExecutor(
+                    max_workers=min(GLOB_WORKERS, len(paths))
+                ) as pool:
+                    texts = list(pool.map(files.read_text, paths))
+            else:
+                texts = [files.read_text(p) for p in paths]
+        except FileNotFoundError as e:
+            raise ConfigurationError(
+                [f"Fragment glob {pattern!r}: '{e.filename}' not found."]
+            ) from None
+        except ValueError:
+            raise ConfigurationError(
+                [
+                    f"glob fragment: only the last path component of "
+                    f"{pattern!r} may contain wildcards."
+                ]
+            ) from None
+
+        return cls(separator.join(texts))
+
+    def render(self) -> str:
+        return self._contents
+
+
+def _read_git(ref: object, path: Path) -> str:
+    if not isinstance(ref, str) or not ref:
+        raise ConfigurationError(
+            ["file fragment: 'git-ref' must be a non-empty string."]
+        )
+
+    try:
+        with _trace.span("git", path=str(path), ref=ref):
+            return decode_text(_git.read_blob(ref, path))
+    except _git.GitError as e:
+        raise ConfigurationError(
+            [f"Fragment file '{path}' not found at git ref '{ref}': {e}"]
+        ) from None
+
+
+def _apply_pattern(pattern: str, contents: str, timeout: float | None) -> str:
+    """
+    Return the first group of the first match of *pattern* in *contents*.
+    """
+    compiled = re.compile(pattern, re.DOTALL)
+    if timeout is None:
+        check_backtracking(compiled, "File fragment pattern")
+
+    try:
+        groups = run_with_timeout(timeout, search_groups, compiled, contents)
+    except TimeoutError:
+        raise ConfigurationError(
+            [
+                f"file fragment: pattern {pattern!r} exceeded the "
+                f"regex-timeout of {timeout} seconds."
+            ]
+        ) from None
+
+    if groups is None:
+        raise ConfigurationError(
+            [f"file fragment: pattern {pattern!r} not found."]
+        )
+    if not groups:
+        raise ConfigurationError(
+            ["file fragment: pattern matches, but no group defined."]
+        )
+
+    return groups[0] or ""
+
+
+MMAP_THRESHOLD = 1024 * 1024
+
+
+def _read_slice(
+    files: FileCache,
+    path: Path,
+    start_after: str | None,
+    start_at: str | None,
+    end_before: str | None,
+) -> str | None:
+    """
+    Memory-map *path* and decode only the part between the markers.
+
+    Returns None if that's not possible or worthwhile -- the file is small,
+    there are no markers, or a marker is missing -- in which case the caller
+    has to read the whole file.  That's also where errors are reported.
+    """
+    markers = [m for m in (start_after, start_at, end_before) if m is not None]
+    if (
+        not markers
+        or (start_after is not None and start_at is not None)
+        or not all(markers)
+        or any("\r" in m for m in markers)
+    ):
+        return None
+
+    mm = files.map(path, MMAP_THRESHOLD)
+    if mm is None:
+        return None
+
+    # Reading text translates newlines.  As long as the markers don't contain
+    # any, their positions don't change.
+    if any("\n" in m for m in markers) and mm.find(b"\r") != -1:
+        return None
+
+    span = _find_span(mm, start_after, start_at, end_before)
+    if span is None:
+        return None
+
+    data = mm[span[0] : span[1]]
+    _trace.add("bytes_read", len(data))
+
+    return decode_text(data)
+
+
+def _find_span(
+    mm: mmap.mmap,
+    start_after: str | None,
+    start_at: str | None,
+    end_before: str | None,
+) -> tuple[int, int] | None:
+    start = 0
+    if start_after is not None:
+        marker = start_after.encode()
+        start = mm.find(marker)
+        if start != -1:
+            start += len(marker)
+    elif start_at is not None:
+        start = mm.find(start_at.encode())
+
+    end = len(mm)
+    if start != -1 and end_before is not None:
+        end = mm.find(end_before.encode(), start)
+
+    if start == -1 or end == -1:
+        return None
+
+    return start, end
+
+
+def _cut(
+    contents: str,
+    start_after: str | None,
+    start_at: str | None,
+    end_before: str | None,
+) -> tuple[str, list[str]]:
+    errs: list[str] = []
+
+    if start_after is not None:
+        try:
+            _, contents = contents.split(start_after, 1)
+        except ValueError:
+            errs.append(
+                f"file fragment: 'start-after' {start_after!r} not found."
+            )
+    elif start_at is not None:
+        p = contents.find(start_at)
+        if p == -1:
+            errs.append(f"file fragment: 'start-at' {start_at!r} not found.")
+        contents = contents[p:]
+
+    if end_before is not None:
+        try:
+            contents, _ = contents.split(end_before, 1)
+        except ValueError:
+            errs.append(
+                f"file fragment: 'end-before' {end_before!r} not found."
+            )
+
+    return contents, errs
+
+
+VALID_FRAGMENTS: Iterable[type[Fragment]] = (
+    TextFragment,
+    FileFragment,
+    GlobFragment,
+)
@@ -0,0 +1,178 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import os
+import subprocess
+import threading
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO
+
+
+class GitError(Exception):
+    """
+    The object can't be read; the message tells the user why.
+    """
+
+
+def read_blob(ref: str, path: Path) -> bytes:
+    """
+    Return the contents of *path* -- relative to the current directory --
+    at *ref* from the repository that contains it.
+
+    Raises:
+        GitError: If there's no repository, or no such ref or path.
+    """
+    if "\n" in ref:
+        msg = f"Invalid git ref {ref!r}."
+        raise GitError(msg)
+
+    # Git doesn't resolve "..", so "pkg/../other/x.md" wouldn't exist.
+    path = Path(os.path.normpath(Path.cwd() / path))
+    root = _find_root(path.parent)
+    if root is None:
+        msg = f"'{path}' is not within a git repository."
+        raise GitError(msg)
+
+    return _reader(root).read(f"{ref}:{path.relative_to(root).as_posix()}")
+
+
+def _find_root(directory: Path) -> Path | None:
+    for d in (directory, *directory.parents):
+        if (d / ".git").exists():
+            return d
+
+    return None
+
+
+@dataclass
+class BatchReader:
+    """
+    A long-running ``git cat-file --batch`` process that reads objects from
+    the repository at *root* on request.
+
+    It's started on first use and restarted if it died.
+    """
+
+    root: Path
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _process: subprocess.Popen[bytes] | None = None
+
+    def read(self, spec: str) -> bytes:
+        with self._lock:
+            stdin, stdout = self._start()
+            try:
+                stdin.write(spec.encode() + b"\n")
+                stdin.flush()
+                header = stdout.readline()
+            except OSError:
+                header = b""
+
+            parsed = _parse_header(header)
+            if parsed is None:
+                # "<spec> missing", "<spec> ambiguous", or the process died.
+                self._reap()
+                msg = f"'{spec}' doesn't exist."
+                raise GitError(msg)
+
+            kind, size = parsed
+            data = stdout.read(size)
+            stdout.read(1)  # Trailing newline.
+
+        if kind != b"blob":
+            msg = f"'{spec}' is a {kind.decode()}, not a file."
+            raise GitError(msg)
+
+        return data
+
+    def close(self) -> None:
+        with self._lock:
+            if self._process is not None:
+                with contextlib.suppress(OSError):
+                    self._process.stdin.close()  # type: ignore[union-attr]
+                self._process.wait()
+                self._process.stdout.close()  # type: ignore[union-attr]
+                self._process = None
+
+    def _start(self) -> tuple[IO[bytes], IO[bytes]]:
+        if self._process is None:
+            try:
+                self._process = subprocess.Popen(
+                    ["git", "cat-file", "--batch"],  # noqa: S607
+                    cwd=self.root,
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                )
+            except OSError as e:
+                msg = f"Can't run git: {e}"
+                raise GitError(msg) from None
+
+        return (
+            self._process.stdin,  # type: ignore[return-value]
+            self._process.stdout,
+        )
+
+    def _reap(self) -> None:
+        """
+        Forget the process if it died, such that the next read starts a new
+        one.
+        """
+        if self._process is not None and self._process.poll() is not None:
+            self._process.stdout.close()  # type: ignore[union-attr]
+            with contextlib.suppress(OSError):
+                self._process.stdin.close()  # type: ignore[union-attr]
+            self._process = None
+
+
+def _parse_header(header: bytes) -> tuple[bytes, int] | None:
+    """
+    Return the type and size from a ``<oid> <type> <size>`` header, or None
+    if *header* is anything else.
+
+    Replies for objects that don't exist repeat the requested spec, which can
+    contain spaces, so counting fields isn't enough.
+    """
+    fields = header.rstrip(b"\n").split(b" ")
+    if len(fields) != 3:  # noqa: PLR2004
+        return None
+
+    oid, kind, size = fields
+    try:
+        int(oid, 16)
+    except ValueError:
+        return None
+    if not size.isdigit():
+        return None
+
+    return kind, int(size)
+
+
+_readers: dict[Path, BatchReader] = {}
+_readers_lock = threading.Lock()
+
+
+def _reader(root: Path) -> BatchReader:
+    with _readers_lock:
+        reader = _readers.get(root)
+        if reader is None:
+            reader = _readers[root] = BatchReader(root)
+
+        return reader
+
+
+@atexit.register
+def close_readers() -> None:
+    """
+    Stop all git processes.
+    """
+    with _readers_lock:
+        for reader in _readers.values():
+            reader.close()
+        _readers.clear()
@@ -0,0 +1,113 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+"""
+The inputs of a configuration -- the files that its fragments read -- and
+how to tell whether they changed.
+
+Shared by the memo and the on-disk cache, precompiled readmes, and the
+watcher.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+
+from pathlib import Path
+from typing import Any
+
+from . import _git
+from ._files import glob_files
+
+
+def fragment_paths(config: dict[str, Any]) -> list[str]:
+    """
+    Return the paths of the files that fragments read from disk.
+
+    Glob fragments contribute the files they currently match, so adding or
+    removing one changes the result.
+    """
+    frags = config.get("fragments")
+    if not isinstance(frags, list):
+        return []
+
+    paths = []
+    for frag in frags:
+        if not isinstance(frag, dict):
+            continue
+        if isinstance(frag.get("path"), str) and "git-ref" not in frag:
+            paths.append(frag["path"])
+        elif isinstance(frag.get("glob"), str):
+            with contextlib.suppress(OSError, ValueError):
+                paths.extend(glob_files(frag["glob"]))
+
+    return paths
+
+
+def glob_dirs(config: dict[str, Any]) -> list[str]:
+    """
+    Return the directories that glob fragments scan.
+    """
+    frags = config.get("fragments")
+    if not isinstance(frags, list):
+        return []
+
+    return [
+        str(Path(frag["glob"]).parent)
+        for frag in frags
+        if isinstance(frag, dict) and isinstance(frag.get("glob"), str)
+    ]
+
+
+def git_sources(config: dict[str, Any]) -> list[tuple[str, str]]:
+    """
+    Return the git refs and paths of fragments that are read from git.
+    """
+    frags = config.get("fragments")
+    if not isinstance(frags, list):
+        return []
+
+    return [
+        (frag["git-ref"], frag["path"])
+        for frag in frags
+        if isinstance(frag, dict)
+        and isinstance(frag.get("path"), str)
+        and isinstance(frag.get("git-ref"), str)
+    ]
+
+
+def git_digest(ref: str, path: str) -> str | None:
+    """
+    Return the SHA-256 of *path* at *ref*, or None if it can't be read.
+    """
+    try:
+        return hashlib.sha256(_git.read_blob(ref, Path(path))).hexdigest()
+    except _git.GitError:
+        return None
+
+
+def own_version() -> str:
+    """
+    Our own version, since it can change how readmes are rendered.
+    """
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("hatch-fancy-pypi-readme")
+    except PackageNotFoundError:  # pragma: no cover
+        return "unknown"
+
+
+def stat_signature(path: str) -> tuple[int, int, int] | None:
+    """
+    Return what changes when *path* is written to, or None if it doesn't
+    exist.
+    """
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return None
+
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
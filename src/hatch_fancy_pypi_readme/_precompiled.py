@@ -0,0 +1,150 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import hashlib
+import json
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from . import _trace
+from ._builder import TextTemplate, compile_text
+from ._inputs import fragment_paths, git_digest, git_sources, own_version
+
+
+if TYPE_CHECKING:
+    from ._config import Config
+
+
+FORMAT = 1
+
+
+def write_artifact(config: dict[str, Any], cfg: Config, path: Path) -> None:
+    """
+    Apply the fragments and substitutions of the loaded *cfg* and write the
+    result to *path*, together with everything needed to tell whether it's
+    still up to date for *config*.
+    """
+    template = compile_text(cfg.fragments, cfg.substitutions)
+
+    git_inputs = [
+        [ref, frag_path, git_digest(ref, frag_path)]
+        for ref, frag_path in git_sources(config)
+    ]
+    inputs = []
+    for frag_path in fragment_paths(config):
+        p = Path(frag_path)
+        st = p.stat()
+        inputs.append(
+            [
+                frag_path,
+                st.st_mtime_ns,
+                st.st_size,
+                hashlib.sha256(p.read_bytes()).hexdigest(),
+            ]
+        )
+
+    artifact = {
+        "format": FORMAT,
+        "version": own_version(),
+        "config": _config_hash(config),
+        "inputs": inputs,
+        "git-inputs": git_inputs,
+        "content-type": cfg.content_type,
+        "chunks": template.chunks,
+    }
+
+    path.write_text(
+        json.dumps(artifact, separators=(",", ":")), encoding="utf-8"
+    )
+
+
+def render_precompiled(
+    config: dict[str, Any], path: Path, package_name: str, pkg_version: str
+) -> dict[str, str] | None:
+    """
+    Render the readme metadata table from the artifact at *path*, or return
+    None if it's missing or out of date.
+
+    Input files whose size and modification time match the artifact aren't
+    read at all.  Otherwise, their contents must still match -- as must the
+    contents of files that are read from git.
+    """
+    with _trace.span("precompiled", hit=False) as attrs:
+        try:
+            artifact = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        try:
+            if not _is_current(artifact, config):
+                return None
+
+            content_type = artifact["content-type"]
+            chunks = tuple(artifact["chunks"])  # JSON has no tuples.
+        except (KeyError, TypeError, ValueError):
+            # Malformed artifact.
+            return None
+
+        if not isinstance(content_type, str) or not all(
+            isinstance(c, str) or c in (0, 1) for c in chunks
+        ):
+            return None
+
+        attrs["hit"] = True
+
+        return {
+            "content-type": content_type,
+            "text": TextTemplate(chunks).render(package_name, pkg_version),
+        }
+
+
+def _is_current(artifact: Any, config: dict[str, Any]) -> bool:
+    if (
+        not isinstance(artifact, dict)
+        or artifact.get("format") != FORMAT
+        or artifact.get("version") != own_version()
+        or artifact.get("config") != _config_hash(config)
+    ):
+        return False
+
+    inputs = artifact["inputs"]
+    if [i[0] for i in inputs] != fragment_paths(config):
+        return False
+
+    for frag_path, mtime_ns, size, digest in inputs:
+        p = Path(frag_path)
+        try:
+            st = p.stat()
+            if (st.st_mtime_ns, st.st_size) == (mtime_ns, size):
+                continue
+            if hashlib.sha256(p.read_bytes()).hexdigest() != digest:
+                return False
+        except OSError:
+            return False
+
+    git_inputs = artifact.get("git-inputs", [])
+    if [i[:2] for i in git_inputs] != [list(s) for s in git_sources(config)]:
+        return False
+
+    return all(
+        digest is not None and git_digest(ref, frag_path) == digest
+        for ref, frag_path, digest in git_inputs
+    )
+
+
+def _config_hash(config: dict[str, Any]) -> str:
+    """
+    Hash *config*, except for the location of the artifact itself, such that
+    it can be added after compiling.
+    """
+    return hashlib.sha256(
+        json.dumps(
+            {k: v for k, v in config.items() if k != "precompiled"},
+            sort_keys=True,
+            default=str,
+        ).encode()
+    ).hexdigest()
@@ -0,0 +1,487 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import re
+import sys
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterator, cast
+
+
+if sys.version_info >= (3, 11):
+    import re._constants as sre_constants
+    import re._parser as sre_parse
+else:  # pragma: no cover
+    import sre_constants
+    import sre_parse
+
+
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: "digit",
+    sre_constants.CATEGORY_SPACE: "space",
+    sre_constants.CATEGORY_WORD: "word",
+}
+_CATEGORY_RES = {
+    "digit": re.compile(r"\d"),
+    "space": re.compile(r"\s"),
+    "word": re.compile(r"\w"),
+}
+_DISJOINT_CATEGORIES = {
+    frozenset(("digit", "space")),
+    frozenset(("word", "space")),
+}
+# Characters besides lower & upper case that IGNORECASE considers equal to
+# an ASCII letter.
+_SPECIAL_CASES = {
+    "i": "\u0130\u0131",
+    "k": "\u212a",
+    "s": "\u017f",
+}
+_MAX_MATERIALIZED_RANGE = 4096
+_REPEATS = tuple(
+    getattr(sre_constants, name)
+    for name in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(sre_constants, name)
+)
+_ATOMIC_GROUP = getattr(sre_constants, "ATOMIC_GROUP", None)
+_POSSESSIVE_REPEAT = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+# Start of the Unicode private use area.
+_SENTINEL_BASE = 0xE000
+
+
+@dataclass(frozen=True)
+class CharSet:
+    """
+    A superset of characters that can be consumed by (a part of) a regex.
+    """
+
+    chars: frozenset[str] = frozenset()
+    categories: frozenset[str] = frozenset()
+    ranges: tuple[tuple[int, int], ...] = ()
+    any: bool = False
+
+    def __or__(self, other: CharSet) -> CharSet:
+        return CharSet(
+            self.chars | other.chars,
+            self.categories | other.categories,
+            self.ranges + other.ranges,
+            self.any or other.any,
+        )
+
+    def overlaps(self, other: CharSet) -> bool:
+        """
+        Could there be a character that's in both sets?
+        """
+        if self.is_empty() or other.is_empty():
+            return False
+
+        return (
+            self.any
+            or other.any
+            or bool(self.chars & other.chars)
+            or any(other.contains(c) for c in self.chars)
+            or any(self.contains(c) for c in other.chars)
+            or any(
+                frozenset((a, b)) not in _DISJOINT_CATEGORIES
+                for a in self.categories
+                for b in other.categories
+            )
+            or any(
+                lo <= other_hi and other_lo <= hi
+                for lo, hi in self.ranges
+                for other_lo, other_hi in other.ranges
+            )
+            # We don't know the relationship between categories and big
+            # ranges, so assume the worst.
+            or bool(self.categories and other.ranges)
+            or bool(self.ranges and other.categories)
+        )
+
+    def contains(self, c: str) -> bool:
+        return (
+            self.any
+            or c in self.chars
+            or any(_CATEGORY_RES[cat].match(c) for cat in self.categories)
+            or any(lo <= ord(c) <= hi for lo, hi in self.ranges)
+        )
+
+    def is_empty(self) -> bool:
+        return not (self.chars or self.categories or self.ranges or self.any)
+
+
+_ANY = CharSet(any=True)
+_EMPTY = CharSet()
+
+
+@dataclass(frozen=True)
+class PatternInfo:
+    """
+    What we know about a compiled pattern.
+
+    *context_free* patterns can't match the empty string and their matches
+    depend on nothing but the characters they consume: no anchors, no
+    lookarounds, no back references.
+
+    *first* is a superset of the characters a match can start with, *chars*
+    a superset of all characters a match can consist of.
+    """
+
+    context_free: bool
+    first: CharSet
+    chars: CharSet
+
+
+def analyze(pattern: re.Pattern[str]) -> PatternInfo:
+    """
+    Find out what *pattern* can match.
+
+    Everything in here errs on the side of "don't know", in which case
+    callers must fall back to the plain, obviously correct behavior.
+    """
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except re.error:  # pragma: no cover -- it compiled before
+        return PatternInfo(context_free=False, first=_ANY, chars=_ANY)
+
+    a = _Analyzer(ignore_case=bool(pattern.flags & re.IGNORECASE))
+    chars = a.chars(parsed)
+    first, _ = a.first(parsed)
+
+    return PatternInfo(
+        context_free=a.context_free and parsed.getwidth()[0] > 0,
+        first=first,
+        chars=chars,
+    )
+
+
+def required_literal(pattern: re.Pattern[str]) -> str | None:
+    """
+    Return the longest string that every match of *pattern* must contain.
+    """
+    parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    candidates = _required_literals(
+        parsed, ignore_case=bool(pattern.flags & re.IGNORECASE)
+    )
+
+    return max(candidates, key=len, default=None)
+
+
+def pure_literal(pattern: re.Pattern[str]) -> str | None:
+    """
+    If *pattern* matches exactly one string and nothing else, return it.
+    """
+    parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    ignore_case = bool(pattern.flags & re.IGNORECASE)
+
+    literal = "".join(
+        chr(av) for op, av in parsed if op is sre_constants.LITERAL
+    )
+    if (
+        not literal
+        or len(literal) != len(parsed)
+        or not _is_case_safe(literal, ignore_case=ignore_case)
+    ):
+        return None
+
+    return literal
+
+
+def nested_quantifier(pattern: re.Pattern[str]) -> bool:
+    """
+    Does *pattern* repeat something that's variable-length by itself, like
+    ``(a+)+``?
+
+    Such patterns can backtrack exponentially on input that almost matches.
+    Possessive quantifiers and atomic groups don't backtrack, so they're
+    fine.
+    """
+    return _nested_quantifier(
+        sre_parse.parse(pattern.pattern, pattern.flags), in_repeat=False
+    )
+
+
+def _nested_quantifier(items: Any, *, in_repeat: bool) -> bool:
+    for op, av in items:
+        if op is _ATOMIC_GROUP or op is _POSSESSIVE_REPEAT:
+            continue
+
+        if op in _REPEATS:
+            lo, hi, body = av
+            if in_repeat and hi > lo:
+                return True
+            if _nested_quantifier(body, in_repeat=in_repeat or hi > 1):
+                return True
+        elif op is sre_constants.SUBPATTERN:
+            if _nested_quantifier(av[3], in_repeat=in_repeat):
+                return True
+        elif op is sre_constants.BRANCH:
+            if any(
+                _nested_quantifier(branch, in_repeat=in_repeat)
+                for branch in av[1]
+            ):
+                return True
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            if _nested_quantifier(av[1], in_repeat=in_repeat):
+                return True
+
+    return False
+
+
+def _required_literals(items: Any, *, ignore_case: bool) -> list[str]:
+    """
+    Find runs of literals in *items* that can't be skipped.
+    """
+    rv = []
+    run: list[str] = []
+    for op, av in items:
+        if op is sre_constants.LITERAL and _is_case_safe(
+            chr(av), ignore_case=ignore_case
+        ):
+            run.append(chr(av))
+            continue
+
+        if run:
+            rv.append("".join(run))
+            run = []
+
+        if op is sre_constants.SUBPATTERN:
+            rv.extend(
+                _required_literals(
+                    av[3],
+                    ignore_case=ignore_case or bool(av[1] & re.IGNORECASE),
+                )
+            )
+        elif op in _REPEATS and av[0] > 0:
+            rv.extend(_required_literals(av[2], ignore_case=ignore_case))
+        elif op is _ATOMIC_GROUP:
+            rv.extend(_required_literals(av, ignore_case=ignore_case))
+
+    if run:
+        rv.append("".join(run))
+
+    return rv
+
+
+def _is_case_safe(s: str, *, ignore_case: bool) -> bool:
+    """
+    Can we look for *s* using plain string search?
+    """
+    return not ignore_case or all(c.isascii() and not c.isalpha() for c in s)
+
+
+@dataclass(frozen=True)
+class ReplacementInfo:
+    """
+    What we know about the output of a replacement template.
+
+    *chars* is a superset of all characters the replacement can produce,
+    *first* a superset of the characters it can start with.  *never_empty*
+    is True if it always produces at least one character.
+    """
+
+    chars: CharSet
+    first: CharSet
+    never_empty: bool
+
+
+def analyze_replacement(
+    pattern: re.Pattern[str], replacement: str, info: PatternInfo
+) -> ReplacementInfo | None:
+    """
+    Return None if the template is invalid.
+    """
+    template = compile_template(pattern, replacement)
+    if template is None:
+        return None
+
+    literals = CharSet(
+        frozenset("".join(p for p in template if isinstance(p, str)))
+    )
+    if all(isinstance(p, str) for p in template):
+        chars = literals
+    else:
+        chars = literals | info.chars
+
+    return ReplacementInfo(
+        chars=chars,
+        first=(
+            CharSet(frozenset(template[0][:1]))
+            if template and isinstance(template[0], str)
+            else chars
+        ),
+        never_empty=not literals.is_empty(),
+    )
+
+
+def compile_template(
+    pattern: re.Pattern[str], replacement: str
+) -> list[str | int] | None:
+    """
+    Split *replacement* into literal strings and group indexes, such that
+    joining the literals and the groups of a match gives the same result as
+    ``match.expand(replacement)``.
+
+    Return None if the template is invalid.
+    """
+    sentinels = {
+        chr(_SENTINEL_BASE + idx): idx for idx in range(pattern.groups + 1)
+    }
+    if any(c in sentinels for c in replacement):
+        return None
+
+    # Create a match with the same groups as *pattern*, each containing its
+    # own sentinel.  The whole match additionally starts with the sentinel
+    # for group 0.
+    names = {idx: name for name, idx in pattern.groupindex.items()}
+    groups = "".join(
+        f"(?P<{names[idx]}>{chr(_SENTINEL_BASE + idx)})"
+        if idx in names
+        else f"({chr(_SENTINEL_BASE + idx)})"
+        for idx in range(1, pattern.groups + 1)
+    )
+    whole = "".join(sentinels)
+    m = cast("re.Match[str]", re.compile(whole[0] + groups).match(whole))
+
+    try:
+        expanded = m.expand(replacement)
+    except (re.error, IndexError):
+        return None
+
+    rv: list[str | int] = []
+    literal: list[str] = []
+    i = 0
+    while i < len(expanded):
+        c = expanded[i]
+        idx = sentinels.get(c)
+        if idx is None:
+            literal.append(c)
+            i += 1
+            continue
+
+        if literal:
+            rv.append("".join(literal))
+            literal = []
+        rv.append(idx)
+        i += len(whole) if idx == 0 else 1
+
+    if literal:
+        rv.append("".join(literal))
+
+    return rv
+
+
+class _Analyzer:
+    def __init__(self, *, ignore_case: bool) -> None:
+        self.ignore_case = ignore_case
+        self.context_free = True
+
+    def chars(self, items: Any) -> CharSet:
+        rv = _EMPTY
+        for op, av in items:
+            rv |= self._item_chars(op, av)
+
+        return rv
+
+    def first(self, items: Any) -> tuple[CharSet, bool]:
+        """
+        Return the set of possible first characters of *items* and whether
+        they can match the empty string.
+        """
+        rv = _EMPTY
+        for op, av in items:
+            first, nullable = self._item_first(op, av)
+            rv |= first
+            if not nullable:
+                return rv, False
+
+        return rv, True
+
+    def _item_chars(self, op: Any, av: Any) -> CharSet:  # noqa: PLR0911
+        if op is sre_constants.LITERAL:
+            return self._literal(chr(av))
+        if op is sre_constants.IN:
+            return self._in(av)
+        if op in _REPEATS:
+            return self.chars(av[2])
+        if op is sre_constants.SUBPATTERN:
+            with self._flags(av[1]):
+                return self.chars(av[3])
+        if op is _ATOMIC_GROUP:
+            return self.chars(av)
+        if op is sre_constants.BRANCH:
+            rv = _EMPTY
+            for branch in av[1]:
+                rv |= self.chars(branch)
+            return rv
+        if op in (sre_constants.ANY, sre_constants.NOT_LITERAL):
+            return _ANY
+
+        # Anchors, lookarounds, group references, conditionals, ...
+        self.context_free = False
+        return _ANY
+
+    def _item_first(self, op: Any, av: Any) -> tuple[CharSet, bool]:
+        if op in _REPEATS:
+            first, nullable = self.first(av[2])
+            return first, nullable or av[0] == 0
+        if op is sre_constants.SUBPATTERN:
+            with self._flags(av[1]):
+                return self.first(av[3])
+        if op is _ATOMIC_GROUP:
+            return self.first(av)
+        if op is sre_constants.BRANCH:
+            rv = _EMPTY
+            nullable = False
+            for branch in av[1]:
+                first, branch_nullable = self.first(branch)
+                rv |= first
+                nullable = nullable or branch_nullable
+            return rv, nullable
+
+        return self._item_chars(op, av), False
+
+    @contextmanager
+    def _flags(self, add_flags: int) -> Iterator[None]:
+        ignore_case = self.ignore_case
+        self.ignore_case = ignore_case or bool(add_flags & re.IGNORECASE)
+        try:
+            yield
+        finally:
+            self.ignore_case = ignore_case
+
+    def _literal(self, c: str) -> CharSet:
+        if not self.ignore_case or c.lower() == c.upper():
+            return CharSet(frozenset(c))
+        if not c.isascii():
+            return _ANY
+
+        lower = c.lower()
+        return CharSet(
+            frozenset(lower + c.upper() + _SPECIAL_CASES.get(lower, ""))
+        )
+
+    def _in(self, items: Any) -> CharSet:
+        rv = _EMPTY
+        for op, av in items:
+            if op is sre_constants.LITERAL:
+                rv |= self._literal(chr(av))
+            elif op is sre_constants.RANGE:
+                lo, hi = av
+                if hi - lo < _MAX_MATERIALIZED_RANGE:
+                    for i in range(lo, hi + 1):
+                        rv |= self._literal(chr(i))
+                elif self.ignore_case:
+                    return _ANY
+                else:
+                    rv |= CharSet(ranges=((lo, hi),))
+            elif op is sre_constants.CATEGORY and av in _CATEGORIES:
+                rv |= CharSet(categories=frozenset((_CATEGORIES[av],)))
+            else:
+                # NEGATE, negated categories, ...
+                return _ANY
+
+        return rv
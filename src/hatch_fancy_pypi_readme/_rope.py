@@ -0,0 +1,222 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import bisect
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+
+if TYPE_CHECKING:
+    from ._substitutions import Substituter
+
+
+@dataclass
+class Rope:
+    """
+    Text that is kept as the list of its *segments* -- usually the rendered
+    fragments -- and only concatenated once it's needed as a whole.
+
+    Substitutions that know where they can match rewrite only the segments
+    around their matches, and leave the others alone.
+    """
+
+    segments: list[str]
+
+    def join(self) -> str:
+        return "".join(self.segments)
+
+    def __len__(self) -> int:
+        return sum(map(len, self.segments))
+
+    def slice(self, start: int, end: int) -> str:
+        """
+        Return ``self.join()[start:end]`` without joining everything.
+        """
+        return self._slice(self._starts(), start, end)
+
+    def _slice(self, starts: list[int], start: int, end: int) -> str:
+        """
+        Like `slice`, with the *starts* of the segments already known.
+        """
+        start = max(start, 0)
+        pieces = []
+        i = max(bisect.bisect_right(starts, start) - 1, 0)
+        while i < len(self.segments) and starts[i] < end:
+            seg = self.segments[i]
+            pieces.append(seg[max(start - starts[i], 0) : end - starts[i]])
+            i += 1
+
+        return "".join(pieces)
+
+    def find(self, literal: str) -> Iterator[int]:
+        """
+        Yield the positions of all occurrences of *literal*, including
+        overlapping ones and those that span segments, in no particular
+        order.
+        """
+        n = len(literal)
+        for start, seg in zip(self._starts(), self.segments):
+            i = seg.find(literal)
+            while i != -1:
+                yield start + i
+                i = seg.find(literal, i + 1)
+
+        for boundary, offset, seam in self._seams(n - 1):
+            yield from _straddling(seam, offset, literal, boundary)
+
+    def find_literals(self, literals: set[str]) -> set[str]:
+        """
+        Like `find_literals` for the whole text.
+        """
+        width = max(map(len, literals), default=1) - 1
+        texts = [*self.segments, *(seam for _, _, seam in self._seams(width))]
+
+        return {lit for lit in literals if any(lit in t for t in texts)}
+
+    def isolate(self, literal: str) -> None:
+        """
+        Join segments such that no occurrence of *literal* spans segments.
+        """
+        self._merge(
+            (p, p + len(literal))
+            for boundary, offset, seam in self._seams(len(literal) - 1)
+            for p in _straddling(seam, offset, literal, boundary)
+        )
+
+    def substitute(self, sub: Substituter) -> int:
+        """
+        Apply *sub* whose `Substituter.locality` is known to the whole text,
+        but rewrite only the segments around its literal.
+
+        Returns the number of matches.
+        """
+        literal, window = sub.locality  # type: ignore[misc]
+        # A match that contains the literal at p lies within
+        # [p + len(literal) - window, p + window).  Word boundaries look at
+        # one more character.
+        margin = window + 1
+        before = window - len(literal) + 1
+        indices = self._merge(
+            (p - before, p + margin) for p in self.find(literal)
+        )
+
+        # Take the context from the original text, before any segment is
+        # replaced.
+        starts = self._starts()
+        jobs = []
+        for i in indices:
+            seg = self.segments[i]
+            end = starts[i] + len(seg)
+            if sub.is_literal:
+                # Plain strings need no context.
+                jobs.append((i, seg, 0, len(seg)))
+            else:
+                context = self._slice(starts, starts[i] - margin, starts[i])
+                jobs.append(
+                    (
+                        i,
+                        context + seg + self._slice(starts, end, end + margin),
+                        len(context),
+                        len(context) + len(seg),
+                    )
+                )
+
+        n = 0
+        for i, text, start, end in jobs:
+            if sub.is_literal:
+                self.segments[i], matches = sub.subn(text)
+            else:
+                self.segments[i], matches = sub.substitute_span(
+                    text, start, end
+                )
+            n += matches
+
+        return n
+
+    def _merge(self, ranges: Iterable[tuple[int, int]]) -> list[int]:
+        """
+        Join the segments that overlap each of *ranges*, and return the
+        indices of the resulting segments in order.
+        """
+        starts = self._starts()
+        total = starts[-1] + len(self.segments[-1]) if self.segments else 0
+        spans = []
+        for start, end in ranges:
+            lo, hi = max(start, 0), min(end, total)
+            if lo < hi:
+                spans.append(
+                    (
+                        bisect.bisect_right(starts, lo) - 1,
+                        bisect.bisect_left(starts, hi),
+                    )
+                )
+        if not spans:
+            return []
+
+        spans.sort()
+        merged = [list(spans[0])]
+        for i, j in spans[1:]:
+            if i < merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], j)
+            else:
+                merged.append([i, j])
+
+        segments = []
+        indices = []
+        pos = 0
+        for i, j in merged:
+            segments.extend(self.segments[pos:i])
+            indices.append(len(segments))
+            segments.append("".join(self.segments[i:j]))
+            pos = j
+        segments.extend(self.segments[pos:])
+        self.segments = segments
+
+        return indices
+
+    def _starts(self) -> list[int]:
+        starts = []
+        pos = 0
+        for seg in self.segments:
+            starts.append(pos)
+            pos += len(seg)
+
+        return starts
+
+    def _seams(self, width: int) -> Iterator[tuple[int, int, str]]:
+        """
+        Yield each boundary between segments, together with the up to
+        *width* characters on each side of it, and where they start.
+        """
+        if width < 1:
+            return
+
+        starts = self._starts()
+        for i in range(1, len(self.segments)):
+            boundary = starts[i]
+            start = max(boundary - width, 0)
+            before, after = self.segments[i - 1], self.segments[i]
+            if len(before) >= width and len(after) >= width:
+                # Usually, the neighbors are enough.
+                seam = before[len(before) - width :] + after[:width]
+            else:
+                seam = self._slice(starts, start, boundary + width)
+            yield boundary, start, seam
+
+
+def _straddling(
+    seam: str, offset: int, literal: str, boundary: int
+) -> Iterator[int]:
+    """
+    Yield the positions of the occurrences of *literal* in *seam* -- which
+    starts at *offset* -- that span *boundary*.
+    """
+    i = seam.find(literal)
+    while i != -1:
+        if offset + i < boundary < offset + i + len(literal):
+            yield offset + i
+        i = seam.find(literal, i + 1)
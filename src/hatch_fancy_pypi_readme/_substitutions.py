@@ -4,21 +4,49 @@
 
 from __future__ import annotations
 
+import itertools
 import re
 
-from dataclasses import dataclass
-from typing import cast
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, cast
 
 from hatch_fancy_pypi_readme.exceptions import ConfigurationError
 
+from ._regex import (
+    CharSet,
+    PatternInfo,
+    ReplacementInfo,
+    analyze,
+    analyze_replacement,
+    compile_template,
+    pure_literal,
+    required_literal,
+)
+from ._timeout import check_backtracking, run_with_timeout, subn
+
+
+if TYPE_CHECKING:
+    from ._rope import Rope
+
 
 @dataclass
 class Substituter:
     pattern: re.Pattern[str]
     replacement: str
+    timeout: float | None = None
+    max_match_length: int | None = None
 
     @classmethod
-    def from_config(cls, cfg: dict[str, str]) -> Substituter:
+    def from_config(
+        cls, cfg: dict[str, str], timeout: float | None = None
+    ) -> Substituter:
+        """
+        If *timeout* is passed, the regular expression runs in a worker
+        process and `ConfigurationError` is raised if it takes longer than
+        that many seconds.  Otherwise, patterns that are prone to
+        catastrophic backtracking cause a warning.
+        """
         errs = []
         flags = 0
 
@@ -28,6 +56,17 @@ class Substituter:
                 f"Value {ignore_case!r} for 'ignore-case' is not a bool."
             )
 
+        max_match_length = cfg.get("max-match-length")
+        if max_match_length is not None and (
+            not isinstance(max_match_length, int)
+            or isinstance(max_match_length, bool)
+            or max_match_length < 1
+        ):
+            errs.append(
+                f"Value {max_match_length!r} for 'max-match-length' is not a "
+                "positive integer."
+            )
+
         if ignore_case:
             flags += re.IGNORECASE
 
@@ -49,7 +88,422 @@ class Substituter:
         if errs:
             raise ConfigurationError(errs)
 
-        return cls(pattern, cast("str", replacement))
+        if timeout is None:
+            check_backtracking(pattern, "Substitution pattern")
+
+        return cls(
+            pattern,
+            cast("str", replacement),
+            timeout,
+            cast("int | None", max_match_length),
+        )
 
     def substitute(self, text: str) -> str:
+        if self._literal_replacement is not None:
+            return text.replace(*self._literal_replacement)
+        if self.timeout is not None:
+            return self.subn(text)[0]
+
         return self.pattern.sub(self.replacement, text)
+
+    def subn(self, text: str) -> tuple[str, int]:
+        """
+        Like `substitute`, but also return the number of replacements.
+        """
+        if self._literal_replacement is not None:
+            old, new = self._literal_replacement
+            return text.replace(old, new), text.count(old)
+
+        try:
+            return run_with_timeout(  # type: ignore[no-any-return]
+                self.timeout, subn, self.pattern, self.replacement, text
+            )
+        except TimeoutError:
+            raise ConfigurationError(
+                [
+                    f"Substitution {self.pattern.pattern!r} exceeded the "
+                    f"regex-timeout of {self.timeout} seconds."
+                ]
+            ) from None
+
+    @property
+    def streamable(self) -> bool:
+        """
+        Can this substitution be applied using `substitute_stream`?
+        """
+        return self.max_match_length is not None and self.timeout is None
+
+    def substitute_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Like `substitute`, but apply it to the concatenation of *chunks*
+        without concatenating them.
+
+        Matches -- including their lookarounds -- must not be longer than
+        `max_match_length`.  Therefore, only that many characters plus one
+        have to be held back at the end of each chunk, and kept as context
+        for lookbehinds and word boundaries at the start of the next one.
+        The extra character keeps ``$`` from matching before a newline at
+        the end of a chunk.
+        """
+        expand = self._expand
+        window = cast("int", self.max_match_length)
+        keep = window + 1
+        context = ""
+        pending = ""
+        for chunk in itertools.chain(chunks, [None]):
+            if chunk is not None:
+                pending += chunk
+                if len(pending) <= 2 * keep:
+                    continue
+
+            buf = context + pending
+            pos = len(context)
+            # At the end, empty matches at the very end count, too.
+            cut = len(buf) + 1 if chunk is None else len(buf) - keep
+            out = []
+            for m in self.pattern.finditer(buf, pos):
+                if m.start() >= cut:
+                    break
+                out.append(buf[pos : m.start()])
+                out.append(expand(m))
+                pos = m.end()
+
+            stop = len(buf) if chunk is None else max(pos, cut)
+            out.append(buf[pos:stop])
+            yield "".join(out)
+
+            context = buf[max(0, stop - window) : stop]
+            pending = buf[stop:]
+
+    @property
+    def is_literal(self) -> bool:
+        """
+        Is the pattern a plain string?
+        """
+        return self._literal_replacement is not None
+
+    @cached_property
+    def locality(self) -> tuple[str, int] | None:
+        """
+        A literal that every match contains, and how many characters --
+        including lookarounds -- a match can span.
+
+        Text that is farther away than that from all occurrences of the
+        literal can't be affected.  None, if we don't know.
+        """
+        if self._literal_replacement is not None:
+            literal = self._literal_replacement[0]
+            return literal, len(literal)
+
+        if self.streamable and self.required_literal is not None:
+            return self.required_literal, cast("int", self.max_match_length)
+
+        return None
+
+    def substitute_span(
+        self, text: str, start: int, end: int
+    ) -> tuple[str, int]:
+        """
+        Substitute the matches that start within ``text[start:end]`` and
+        return that part, together with the number of matches.
+
+        The rest of *text* is context for lookarounds and anchors.  Matches
+        must not extend past *end*.
+        """
+        expand = self._expand
+        out = []
+        pos = start
+        n = 0
+        for m in self.pattern.finditer(text, start):
+            if m.start() >= end:
+                break
+            out.append(text[pos : m.start()])
+            out.append(expand(m))
+            pos = m.end()
+            n += 1
+
+        out.append(text[pos:end])
+
+        return "".join(out), n
+
+    @cached_property
+    def _expand(self) -> Callable[[re.Match[str]], str]:
+        """
+        Match.expand() parses the template each time it's called.
+        """
+        template = compile_template(self.pattern, self.replacement)
+        if template is None:
+            return lambda m: m.expand(self.replacement)
+
+        return lambda m: "".join(
+            [
+                part if isinstance(part, str) else m.group(part) or ""
+                for part in template
+            ]
+        )
+
+    @property
+    def patterns(self) -> list[str]:
+        return [self.pattern.pattern]
+
+    @cached_property
+    def required_literal(self) -> str | None:
+        """
+        A string that must be part of the text for this substitution to match
+        anything.
+        """
+        return required_literal(self.pattern)
+
+    @cached_property
+    def _literal_replacement(self) -> tuple[str, str] | None:
+        """
+        If the pattern is a plain string, it's faster to replace it using
+        `str.replace`.
+        """
+        literal = pure_literal(self.pattern)
+        if literal is None:
+            return None
+
+        template = compile_template(self.pattern, self.replacement)
+        if template is None:
+            # Let re complain.
+            return None
+
+        return literal, "".join(
+            part if isinstance(part, str) else literal for part in template
+        )
+
+    @cached_property
+    def _pattern_info(self) -> PatternInfo:
+        return analyze(self.pattern)
+
+    @cached_property
+    def _replacement_info(self) -> ReplacementInfo | None:
+        return analyze_replacement(
+            self.pattern, self.replacement, self._pattern_info
+        )
+
+    @cached_property
+    def fusion_info(self) -> tuple[PatternInfo, ReplacementInfo] | None:
+        """
+        What we need to know to fuse this substitution with others, or None
+        if it can't be fused at all.
+        """
+        if self.timeout is not None:
+            # The worker process can't run our replacement function.
+            return None
+
+        if self.pattern.flags & ~(
+            re.UNICODE | re.IGNORECASE
+        ) or _INLINE_FLAGS.search(self.pattern.pattern):
+            return None
+
+        info = self._pattern_info
+        if not info.context_free:
+            return None
+
+        repl = self._replacement_info
+        if repl is None:
+            return None
+
+        return info, repl
+
+
+_INLINE_FLAGS = re.compile(r"\(\?[aiLmsux]+\)")
+
+
+@dataclass
+class FusedSubstituter:
+    """
+    Independent substitutions (see `fuse`) that are applied in a single
+    pass.
+    """
+
+    substituters: list[Substituter]
+    pattern: re.Pattern[str] = field(init=False)
+    _templates: dict[int, tuple[int, list[str | int]]] = field(
+        init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        branches = []
+        self._templates = {}
+        offset = 0
+        for sub in self.substituters:
+            flags = "i" if sub.pattern.flags & re.IGNORECASE else ""
+            # The empty group at the end of each branch is the last to close,
+            # so lastindex tells us which branch matched.  Wrapping the
+            # branches in groups instead would be more obvious, but defeats
+            # the prefix optimizations of the regex engine.
+            branches.append(f"(?{flags}:{sub.pattern.pattern})()")
+            self._templates[offset + sub.pattern.groups + 1] = (
+                offset,
+                cast(
+                    "list[str | int]",
+                    compile_template(sub.pattern, sub.replacement),
+                ),
+            )
+            offset += sub.pattern.groups + 1
+
+        self.pattern = re.compile("|".join(branches))
+
+    def substitute(self, text: str) -> str:
+        return self.pattern.sub(self._replace, text)
+
+    def subn(self, text: str) -> tuple[str, int]:
+        return self.pattern.subn(self._replace, text)
+
+    @property
+    def patterns(self) -> list[str]:
+        return [sub.pattern.pattern for sub in self.substituters]
+
+    def _replace(self, m: re.Match[str]) -> str:
+        offset, template = self._templates[cast("int", m.lastindex)]
+
+        return "".join(
+            [
+                part
+                if isinstance(part, str)
+                else m.group(part and part + offset) or ""
+                for part in template
+            ]
+        )
+
+
+def prefilter(
+    substitutions: list[Substituter], text: str | Rope
+) -> list[Substituter]:
+    """
+    Drop *substitutions* that can't match anything, because their required
+    literal is neither part of *text*, nor can an earlier substitution
+    produce it.
+    """
+    literals = {
+        sub.required_literal
+        for sub in substitutions
+        if sub.required_literal is not None
+    }
+    present = (
+        find_literals(text, literals)
+        if isinstance(text, str)
+        else text.find_literals(literals)
+    )
+
+    rv = []
+    # Union of everything kept substitutions can produce.
+    produced = CharSet()
+    can_join = False
+    for sub in substitutions:
+        lit = sub.required_literal
+        if (
+            lit is None
+            or lit in present
+            or can_join
+            or produced.overlaps(CharSet(frozenset(lit)))
+        ):
+            rv.append(sub)
+
+            repl = sub._replacement_info  # noqa: SLF001
+            if repl is None or not repl.never_empty:
+                # Removing text can join a literal.
+                can_join = True
+            else:
+                produced |= repl.chars
+
+    return rv
+
+
+def find_literals(text: str, literals: set[str]) -> set[str]:
+    """
+    Return which of *literals* are part of *text*.
+
+    Looking for each literal on its own uses the fast substring search of
+    str, and needs no regular expression that would have to be compiled
+    first.  An alternation of all literals is much slower, since it keeps
+    the regex engine from skipping ahead.
+    """
+    return {lit for lit in literals if lit in text}
+
+
+def fuse(
+    substitutions: list[Substituter],
+) -> list[Substituter | FusedSubstituter]:
+    """
+    Merge runs of independent *substitutions* into `FusedSubstituter`s, such
+    that applying the result in order is equivalent to applying
+    *substitutions* in order.
+
+    Applying an earlier and a later substitution one after another is
+    equivalent to a single pass over the original text, if their matches
+    can't overlap in the original text, and the later one can neither match
+    anything the earlier one produces, nor be joined across something the
+    earlier one removed.
+    """
+    rv: list[Substituter | FusedSubstituter] = []
+    group = _Group()
+    for sub in substitutions:
+        if not group.accepts(sub):
+            rv.extend(group.fuse())
+            group = _Group()
+        group.add(sub)
+
+    rv.extend(group.fuse())
+
+    return rv
+
+
+@dataclass
+class _Group:
+    """
+    A run of independent substitutions.
+
+    Since all conditions must hold for each earlier member, it's enough to
+    check them against the union of all members.
+    """
+
+    members: list[Substituter] = field(default_factory=list)
+    fusable: bool = True
+    first: CharSet = field(default_factory=CharSet)
+    chars: CharSet = field(default_factory=CharSet)
+    repl_first: CharSet = field(default_factory=CharSet)
+    repl_chars: CharSet = field(default_factory=CharSet)
+
+    def accepts(self, sub: Substituter) -> bool:
+        if not self.members:
+            return True
+
+        fi = sub.fusion_info
+        if not self.fusable or fi is None:
+            return False
+
+        info, _ = fi
+        return not (
+            self.first.overlaps(info.chars)
+            or info.first.overlaps(self.chars)
+            or info.first.overlaps(self.repl_chars)
+            or self.repl_first.overlaps(info.chars)
+        )
+
+    def add(self, sub: Substituter) -> None:
+        self.members.append(sub)
+
+        fi = sub.fusion_info
+        if fi is None or not fi[1].never_empty:
+            self.fusable = False
+            return
+
+        info, repl = fi
+        self.first |= info.first
+        self.chars |= info.chars
+        self.repl_first |= repl.first
+        self.repl_chars |= repl.chars
+
+    def fuse(self) -> list[Substituter] | list[FusedSubstituter]:
+        if len(self.members) < 2:  # noqa: PLR2004
+            return self.members
+
+        try:
+            return [FusedSubstituter(self.members)]
+        except re.error:
+            # E.g. clashing group names.
+            return self.members
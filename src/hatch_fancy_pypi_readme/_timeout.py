@@ -0,0 +1,136 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import threading
+import warnings
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable
+
+from ._regex import nested_quantifier
+from .exceptions import CatastrophicBacktrackingWarning
+
+
+if TYPE_CHECKING:
+    import re
+
+    from multiprocessing.connection import Connection
+    from multiprocessing.process import BaseProcess
+
+
+def check_backtracking(pattern: re.Pattern[str], what: str) -> None:
+    """
+    Warn if *pattern* -- used by *what* -- has nested quantifiers.
+    """
+    if nested_quantifier(pattern):
+        warnings.warn(
+            f"{what} {pattern.pattern!r} contains nested quantifiers and can "
+            "take exponential time. Consider setting 'regex-timeout'.",
+            CatastrophicBacktrackingWarning,
+            stacklevel=3,
+        )
+
+
+def search_groups(
+    pattern: re.Pattern[str], text: str
+) -> tuple[str | None, ...] | None:
+    """
+    Like ``pattern.search(text).groups()``, but match objects can't be sent
+    between processes.
+    """
+    m = pattern.search(text)
+
+    return None if m is None else m.groups()
+
+
+def subn(pattern: re.Pattern[str], repl: str, text: str) -> tuple[str, int]:
+    return pattern.subn(repl, text)
+
+
+@dataclass
+class _Worker:
+    """
+    A process that runs functions on our behalf and that can be killed if
+    they take too long.  Threads can't be interrupted while the regex engine
+    is running.
+
+    It's started on first use and restarted after it has been killed.
+    """
+
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    _process: BaseProcess | None = None
+    _conn: Connection | None = None
+
+    def run(self, timeout: float, func: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            conn = self._start()
+            conn.send((func, args))
+            if not conn.poll(timeout):
+                self._kill()
+                raise TimeoutError
+
+            ok, rv = conn.recv()
+
+        if not ok:
+            raise rv
+
+        return rv
+
+    def _start(self) -> Connection:
+        if self._conn is not None:
+            return self._conn
+
+        import multiprocessing
+
+        self._conn, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_serve, args=(child,), daemon=True
+        )
+        self._process.start()
+        child.close()
+
+        return self._conn
+
+    def _kill(self) -> None:
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+        if self._conn is not None:
+            self._conn.close()
+
+        self._process = self._conn = None
+
+
+def _serve(conn: Connection) -> None:  # pragma: no cover -- in the worker
+    while True:
+        try:
+            func, args = conn.recv()
+        except EOFError:
+            return
+
+        try:
+            conn.send((True, func(*args)))
+        except Exception as e:  # noqa: BLE001
+            conn.send((False, e))
+
+
+_worker = _Worker()
+
+
+def run_with_timeout(
+    timeout: float | None, func: Callable[..., Any], *args: Any
+) -> Any:
+    """
+    Return ``func(*args)``.
+
+    If *timeout* isn't None, run it in the worker process and raise
+    `TimeoutError` if it takes longer than *timeout* seconds.  *func* and
+    *args* must be picklable.
+    """
+    if timeout is None:
+        return func(*args)
+
+    return _worker.run(timeout, func, *args)
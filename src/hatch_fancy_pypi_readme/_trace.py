@@ -0,0 +1,140 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Opt-in instrumentation of the render pipeline.
+
+Observers are called with a `Span` for each stage once it's done.  Setting
+the *HFPR_TRACE* environment variable to a path appends all spans to that
+file as JSON lines, which also works from within isolated builds.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+
+@dataclass
+class Span:
+    """
+    A finished stage: its *name*, when it *started* (seconds since the
+    epoch), how many seconds it took, and stage-specific *attributes*.
+    """
+
+    name: str
+    started: float
+    duration: float
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+Observer = Callable[[Span], None]
+
+_observers: list[Observer] = []
+_exporters: dict[str, JSONLinesExporter] = {}
+_lock = threading.Lock()
+_current: ContextVar[dict[str, Any] | None] = ContextVar(
+    "hfpr_span", default=None
+)
+
+
+def add_observer(observer: Observer) -> None:
+    with _lock:
+        _observers.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    with _lock:
+        _observers.remove(observer)
+
+
+def enabled() -> bool:
+    """
+    Whether anyone is interested in spans.  Instrumented code can use it to
+    skip collecting expensive attributes.
+    """
+    return bool(_observers) or bool(os.environ.get("HFPR_TRACE"))
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[dict[str, Any]]:
+    """
+    Time the body and pass the result to all observers.
+
+    The yielded attributes can be extended by the body -- or by code it
+    calls, using `add`.  If the body raises, the exception's type is
+    recorded as the *error* attribute.
+    """
+    if not enabled():
+        yield attributes
+        return
+
+    token = _current.set(attributes)
+    started = time.time()
+    start = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current.reset(token)
+        _emit(Span(name, started, duration, attributes))
+
+
+def add(key: str, n: int) -> None:
+    """
+    Add *n* to the attribute *key* of the innermost span, if any.
+    """
+    attributes = _current.get()
+    if attributes is not None:
+        attributes[key] = attributes.get(key, 0) + n
+
+
+def _emit(span: Span) -> None:
+    with _lock:
+        observers = list(_observers)
+        path = os.environ.get("HFPR_TRACE")
+        if path:
+            exporter = _exporters.get(path)
+            if exporter is None:
+                exporter = _exporters[path] = JSONLinesExporter(path)
+            observers.append(exporter)
+
+    for observer in observers:
+        observer(span)
+
+
+@dataclass
+class JSONLinesExporter:
+    """
+    An observer that appends each span as a JSON object on its own line to
+    the file at *path*.
+    """
+
+    path: str
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __call__(self, span: Span) -> None:
+        line = json.dumps(
+            {
+                "name": span.name,
+                "started": span.started,
+                "duration": span.duration,
+                "pid": os.getpid(),
+                **span.attributes,
+            },
+            default=str,
+        )
+        with self._lock, Path(self.path).open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
@@ -0,0 +1,143 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import sys
+import time
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from ._builder import build_text
+from ._cli import CLIError, find_cli_config, load_cli_config, load_toml
+from ._files import FileCache
+from ._inputs import fragment_paths, glob_dirs, stat_signature
+from .exceptions import ConfigurationError
+
+
+@dataclass
+class Watcher:
+    """
+    Re-render a readme whenever one of its inputs changes.
+
+    The inputs are the pyproject.toml, the hatch.toml (whether it exists or
+    not), all files referenced by fragments, and the directories of glob
+    fragments.  Their contents are kept in
+    memory between renders and only changed files are read again.
+    """
+
+    pyproject_path: Path
+    hatch_toml_path: Path | None
+    files: FileCache = field(default_factory=lambda: FileCache(use_mmap=False))
+    _signatures: dict[Path, tuple[int, int, int] | None] = field(
+        default_factory=dict, repr=False
+    )
+    _watched: set[Path] = field(default_factory=set, repr=False)
+
+    def changed(self) -> bool:
+        """
+        Check whether any input changed since the last call and forget the
+        contents of those that did.
+        """
+        rv = False
+        for path in self._watched | self._config_paths():
+            sig = stat_signature(str(path))
+            if self._signatures.get(path, ()) != sig:
+                self._signatures[path] = sig
+                self.files.invalidate(path)
+                rv = True
+
+        return rv
+
+    def render(self) -> str:
+        """
+        Render the readme from the current state of the inputs.
+
+        Raises:
+            CLIError: If the configuration is broken.
+        """
+        pyproject = self._load_toml(self.pyproject_path)
+        hatch_toml = (
+            self._load_toml(self.hatch_toml_path)
+            if self.hatch_toml_path is not None
+            and self.hatch_toml_path.exists()
+            else {}
+        )
+
+        # Start watching fragment files before reading them, such that
+        # neither changes during the render nor creating a missing file are
+        # missed.  Directories of glob fragments change when files are added
+        # or removed.
+        cfg = find_cli_config(pyproject, hatch_toml)
+        self._watched = {
+            Path(p) for p in (*fragment_paths(cfg), *glob_dirs(cfg))
+        }
+        for path in self._watched - self._signatures.keys():
+            self._signatures[path] = stat_signature(str(path))
+
+        config = load_cli_config(pyproject, hatch_toml, self.files)
+
+        try:
+            return build_text(
+                config.fragments, config.substitutions, "your-package", "42.0"
+            )
+        except ConfigurationError as e:
+            raise CLIError("\n".join(e.errors)) from None
+
+    def _config_paths(self) -> set[Path]:
+        paths = {self.pyproject_path}
+        if self.hatch_toml_path is not None:
+            paths.add(self.hatch_toml_path)
+
+        return paths
+
+    def _load_toml(self, path: Path) -> dict[str, Any]:
+        try:
+            return load_toml(path)
+        except OSError as e:
+            msg = f"Can't read {path}: {e.strerror}"
+            raise CLIError(msg) from None
+        except ValueError as e:
+            msg = f"{path} is not valid TOML: {e}"
+            raise CLIError(msg) from None
+
+
+def watch(
+    watcher: Watcher,
+    out_path: str | None,
+    interval: float = 0.1,
+    should_stop: Callable[[], bool] = lambda: False,
+) -> None:
+    """
+    Render whenever *watcher* detects changes -- into *out_path* or to
+    standard out -- until *should_stop* returns True.
+
+    Errors are reported on standard error and rendering resumes once the
+    inputs change again.
+    """
+    while not should_stop():
+        if not watcher.changed():
+            time.sleep(interval)
+            continue
+
+        start = time.perf_counter()
+        try:
+            text = watcher.render()
+        except CLIError as e:
+            print(e, file=sys.stderr)
+            continue
+
+        if out_path:
+            Path(out_path).write_text(text + "\n")
+        else:
+            print(text, flush=True)
+
+        print(
+            f"Rendered in {(time.perf_counter() - start) * 1000:.1f} ms."
+            " Watching for changes...",
+            file=sys.stderr,
+            flush=True,
+        )
@@ -14,3 +14,9 @@ class ConfigurationError(Exception):
     """
 
     errors: list[str]
+
+
+class CatastrophicBacktrackingWarning(UserWarning):
+    """
+    A regular expression can take exponential time on some inputs.
+    """
@@ -9,9 +9,6 @@ from typing import Any
 from hatchling.metadata.plugin.interface import MetadataHookInterface
 from hatchling.plugin import hookimpl
 
-from ._builder import build_text
-from ._config import load_and_validate_config
-
 
 class FancyReadmeMetadataHook(MetadataHookInterface):
     PLUGIN_NAME = "fancy-pypi-readme"
@@ -20,17 +17,32 @@ class FancyReadmeMetadataHook(MetadataHookInterface):
         """
         Update the project table's metadata.
         """
-        config = load_and_validate_config(self.config)
-
-        metadata["readme"] = {
-            "content-type": config.content_type,
-            "text": build_text(
-                config.fragments,
-                config.substitutions,
-                package_name=metadata.get("name", ""),
-                version=metadata.get("version", ""),
-            ),
-        }
+        # Hatchling imports all registered plugins, so only pay for what's
+        # needed to render once we're actually used.
+        from pathlib import Path
+
+        from ._cache import RenderCache, render_readme
+
+        name = metadata.get("name", "")
+        version = metadata.get("version", "")
+
+        precompiled = self.config.get("precompiled")
+        if isinstance(precompiled, str):
+            from ._precompiled import render_precompiled
+
+            readme = render_precompiled(
+                self.config, Path(self.root, precompiled), name, version
+            )
+            if readme is not None:
+                metadata["readme"] = readme
+                return
+
+        cache = None
+        cache_dir = self.config.get("cache-dir")
+        if isinstance(cache_dir, str):
+            cache = RenderCache(Path(self.root, cache_dir))
+
+        metadata["readme"] = render_readme(self.config, name, version, cache)
 
 
 @hookimpl
@@ -9,6 +9,28 @@ from tempfile import TemporaryDirectory
 
 import pytest
 
+from hatch_fancy_pypi_readme._cache import clear_memo
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--timing",
+        action="store_true",
+        help="Also check that run times scale linearly.  Needs an idle "
+        "machine to be reliable.",
+    )
+
+
+@pytest.fixture(autouse=True)
+def _clear_memo():
+    """
+    The memo is process-global, so don't let tests see each other's
+    configurations and readmes.
+    """
+    clear_memo()
+    yield
+    clear_memo()
+
 
 @pytest.fixture(name="plugin_dir", scope="session")
 def _plugin_dir():
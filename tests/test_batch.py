@@ -0,0 +1,252 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from hatch_fancy_pypi_readme._batch import (
+    BatchResult,
+    expand_paths,
+    format_summary,
+    render_project,
+    run_batch,
+)
+
+from .utils import run
+
+
+PYPROJECT = """\
+[project]
+dynamic = ["readme"]
+
+[tool.hatch.metadata.hooks.fancy-pypi-readme]
+content-type = "text/markdown"
+fragments = [{ path = "README.md" }]
+"""
+
+
+def make_project(root: Path, readme: str) -> Path:
+    root.mkdir(parents=True)
+    (root / "README.md").write_text(readme)
+    (root / "pyproject.toml").write_text(PYPROJECT)
+
+    return root / "pyproject.toml"
+
+
+@pytest.fixture(name="projects")
+def _projects(tmp_path):
+    return [
+        make_project(tmp_path / "packages" / name, f"# {name}\n")
+        for name in ("a", "b", "c")
+    ]
+
+
+class TestExpandPaths:
+    def test_files_and_dirs(self, projects):
+        """
+        Files are kept and directories point to their pyproject.toml.
+        """
+        assert projects[:2] == expand_paths(
+            [str(projects[0]), str(projects[1].parent)]
+        )
+
+    def test_glob(self, projects, tmp_path):
+        """
+        Glob patterns are expanded in sorted order and duplicates removed.
+        """
+        assert projects == expand_paths(
+            [
+                str(tmp_path / "packages" / "*"),
+                str(tmp_path / "**" / "pyproject.toml"),
+            ]
+        )
+
+    def test_no_match(self, tmp_path):
+        """
+        Patterns that match nothing are passed through.
+        """
+        pattern = str(tmp_path / "nope" / "*")
+
+        assert [Path(pattern)] == expand_paths([pattern])
+
+
+class TestRenderProject:
+    def test_ok(self, projects, monkeypatch):
+        """
+        The readme is rendered relative to the project into *out_name* and
+        the working directory is restored.
+        """
+        monkeypatch.chdir(projects[0].parent.parent)
+
+        result = render_project(Path("b") / "pyproject.toml", "README.out")
+
+        assert None is result.error
+        assert result.duration > 0
+        assert "# b\n\n" == (projects[1].parent / "README.out").read_text()
+        assert projects[0].parent.parent == Path.cwd()
+
+    def test_check_only(self, projects):
+        """
+        Without *out_name*, nothing is written.
+        """
+        result = render_project(projects[0], None)
+
+        assert None is result.error
+        assert {"README.md", "pyproject.toml"} == {
+            p.name for p in projects[0].parent.iterdir()
+        }
+
+    def test_hatch_toml(self, projects):
+        """
+        A hatch.toml in the project is picked up.
+        """
+        root = projects[0].parent
+        projects[0].write_text('[project]\ndynamic = ["readme"]\n')
+        (root / "hatch.toml").write_text(
+            "[metadata.hooks.fancy-pypi-readme]\n"
+            'content-type = "text/markdown"\n'
+            'fragments = [{ text = "from hatch.toml" }]\n'
+        )
+
+        result = render_project(projects[0], "out.md")
+
+        assert None is result.error
+        assert "from hatch.toml\n" == (root / "out.md").read_text()
+
+    def test_config_error(self, projects):
+        """
+        Configuration errors are reported like by the single-project CLI.
+        """
+        (projects[0].parent / "README.md").unlink()
+
+        result = render_project(projects[0], None)
+
+        assert result.error.startswith("Configuration has errors:")
+        assert "README.md' not found." in result.error
+
+    def test_invalid_toml(self, projects):
+        """
+        Broken TOML is reported.
+        """
+        projects[0].write_text("[project")
+
+        assert render_project(projects[0], None).error.startswith(
+            "Invalid TOML: "
+        )
+
+    def test_invalid_utf8_fragment(self, projects):
+        """
+        Fragment files that aren't UTF-8 aren't reported as broken TOML.
+        """
+        (projects[0].parent / "README.md").write_bytes(b"\xff\xfe")
+
+        assert render_project(projects[0], None).error.startswith(
+            "Fragment file is not valid UTF-8: "
+        )
+
+    def test_missing(self, tmp_path):
+        """
+        Missing pyproject.toml files are reported.
+        """
+        path = tmp_path / "pyproject.toml"
+
+        assert f"No such file or directory: {path}" == (
+            render_project(path, None).error
+        )
+
+
+class TestRunBatch:
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_run_batch(self, projects, jobs):
+        """
+        All projects are rendered, in-process or on a process pool, and the
+        results are returned in order.
+        """
+        (projects[1].parent / "README.md").unlink()
+
+        results = run_batch(projects, "out.md", jobs)
+
+        assert projects == [r.pyproject_path for r in results]
+        assert [None, "Configuration", None] == [
+            r.error and r.error.split()[0] for r in results
+        ]
+        assert ["# a\n\n", "# c\n\n"] == [
+            (p.parent / "out.md").read_text() for p in projects[::2]
+        ]
+
+
+class TestFormatSummary:
+    def test_summary(self):
+        """
+        Every project gets a line, errors are indented below, and totals
+        come last.
+        """
+        assert (
+            "ok           1.50 ms  a/pyproject.toml\n"
+            "FAILED      20.00 ms  b/pyproject.toml\n"
+            "        line 1\n"
+            "        line 2\n"
+            "\n"
+            "1 rendered, 1 failed in 25.00 ms."
+        ) == format_summary(
+            [
+                BatchResult(Path("a/pyproject.toml"), 0.0015),
+                BatchResult(Path("b/pyproject.toml"), 0.02, "line 1\nline 2"),
+            ],
+            0.025,
+        )
+
+
+class TestBatchEndToEnd:
+    def test_glob(self, projects, tmp_path, monkeypatch):
+        """
+        Passing a glob renders all projects and fails if one of them fails.
+        """
+        monkeypatch.chdir(tmp_path)
+        projects[2].write_text("[project]\n")
+
+        out = run(
+            "hatch_fancy_pypi_readme",
+            "packages/*",
+            "-o",
+            "README.out",
+            check=False,
+        )
+
+        assert "2 rendered, 1 failed in" in out
+        assert "You must add 'readme' to 'project.dynamic'." in out
+        assert "# a\n\n" == (projects[0].parent / "README.out").read_text()
+
+    def test_single_project_options(self, projects):
+        """
+        Options that only make sense for single projects are rejected.
+        """
+        out = run(
+            "hatch_fancy_pypi_readme",
+            str(projects[0]),
+            str(projects[1]),
+            "--watch",
+            check=False,
+        )
+
+        assert "work only with a single project" in out
+
+    @pytest.mark.parametrize("jobs", ["0", "-1", "x"])
+    def test_invalid_jobs(self, projects, jobs):
+        """
+        The number of jobs must be a positive integer.
+        """
+        out = run(
+            "hatch_fancy_pypi_readme",
+            *map(str, projects),
+            "-j",
+            jobs,
+            check=False,
+        )
+
+        assert "-j/--jobs: must be a positive integer" in out
+        assert "Traceback" not in out
@@ -2,8 +2,22 @@
 #
 # SPDX-License-Identifier: MIT
 
-from hatch_fancy_pypi_readme._builder import build_text
+import random
+
+from io import StringIO
+
+import pytest
+
+from hatch_fancy_pypi_readme._builder import (
+    TextTemplate,
+    _replace_stream,
+    build_text,
+    compile_text,
+    iter_text,
+    write_text,
+)
 from hatch_fancy_pypi_readme._fragments import TextFragment
+from hatch_fancy_pypi_readme._substitutions import Substituter
 
 
 class TestBuildText:
@@ -36,3 +50,176 @@ class TestBuildText:
             "your-package",
             "1.0",
         )
+
+
+class ExplodingFragment:
+    def render(self):
+        raise RuntimeError
+
+
+class TestIterText:
+    def test_incremental(self):
+        """
+        Fragments are rendered only once the previous chunk was consumed.
+
+        Only tails that might be the start of placeholders are held back.
+        """
+        text = "first " * 10
+        it = iter_text([TextFragment(text), ExplodingFragment()], [])
+
+        chunk = next(it)
+
+        assert len(chunk) >= len(text) - len("$HFPR_PACKAGE_NAME$HFPR_VERSION")
+        assert text.startswith(chunk)
+
+        with pytest.raises(RuntimeError):
+            next(it)
+
+    def test_placeholders_across_fragments(self):
+        """
+        Placeholders that are split across fragments are replaced.
+        """
+        frags = [
+            TextFragment("Hi $HFPR_PACK"),
+            TextFragment("AGE_NAME $"),
+            TextFragment("HFPR_VERSION!"),
+        ]
+
+        assert "Hi pkg 1.0!" == "".join(iter_text(frags, [], "pkg", "1.0"))
+
+    def test_substitutions(self):
+        """
+        With substitutions, the result is the same as build_text's.
+        """
+        frags = [TextFragment("a $HFPR_VERSION a"), TextFragment("b")]
+        subs = [Substituter.from_config({"pattern": "ab", "replacement": "X"})]
+
+        assert build_text(frags, subs, "pkg", "1.0") == "".join(
+            iter_text(frags, subs, "pkg", "1.0")
+        )
+
+    def test_streaming_substitutions(self):
+        """
+        If all substitutions have a maximum match length, they're applied
+        while streaming and the result is the same as build_text's.
+        """
+        frags = [
+            TextFragment("a" * 100),
+            TextFragment("b #1"),
+            ExplodingFragment(),
+        ]
+        subs = [
+            Substituter.from_config(
+                {"pattern": "ab", "replacement": "X", "max-match-length": 2}
+            ),
+            Substituter.from_config(
+                {
+                    "pattern": r"#(\d{1,3})",
+                    "replacement": r"[#\1]",
+                    "max-match-length": 4,
+                }
+            ),
+        ]
+        it = iter_text(frags, subs)
+
+        chunk = next(it)
+
+        assert chunk
+        assert "a" * len(chunk) == chunk
+
+        frags.pop()
+
+        assert build_text(frags, subs) == "".join(iter_text(frags, subs))
+
+    def test_not_all_streamable(self):
+        """
+        If a substitution lacks a maximum match length, the whole text is
+        built first.
+        """
+        subs = [
+            Substituter.from_config(
+                {"pattern": "a", "replacement": "b", "max-match-length": 1}
+            ),
+            Substituter.from_config({"pattern": "b", "replacement": "c"}),
+        ]
+        it = iter_text([TextFragment("a"), ExplodingFragment()], subs)
+
+        with pytest.raises(RuntimeError):
+            next(it)
+
+    def test_write_text(self):
+        """
+        write_text writes the same text into a file-like object.
+        """
+        frags = [TextFragment("$HFPR_PACKAGE_NAME "), TextFragment("rocks")]
+        out = StringIO()
+
+        write_text(frags, [], out, "pkg", "1.0")
+
+        assert "pkg rocks" == out.getvalue()
+
+
+class TestReplaceStream:
+    @pytest.mark.parametrize("seed", range(20))
+    def test_same_as_replace(self, seed):
+        """
+        Replacing in a stream of chunks has the same result as replacing in
+        their concatenation, no matter where the chunks are split.
+        """
+        rnd = random.Random(seed)
+        old = rnd.choice(["ab", "aba", "$X", "aaa"])
+        new = rnd.choice(["", "a", "b", "ba"])
+        text = "".join(rnd.choice("ab$X") for _ in range(rnd.randrange(40)))
+        cuts = sorted(rnd.sample(range(len(text) + 1), rnd.randrange(5)))
+        chunks = [text[i:j] for i, j in zip([0, *cuts], [*cuts, len(text)])]
+
+        assert text.replace(old, new) == "".join(
+            _replace_stream(chunks, old, new)
+        )
+
+
+class TestCompileText:
+    def test_render(self):
+        """
+        Fragments and substitutions are applied once and the template can be
+        rendered for any metadata.
+        """
+        template = compile_text(
+            [TextFragment("$HFPR_PACKAGE_NAME $HFPR_VERSION is out!")],
+            [Substituter.from_config({"pattern": "out", "replacement": "in"})],
+        )
+
+        assert (0, " ", 1, " is in!") == template.chunks
+        assert ["pkg 1.0 is in!", "pkg 2.0rc1 is in!"] == [
+            template.render("pkg", v) for v in ("1.0", "2.0rc1")
+        ]
+
+    @pytest.mark.parametrize(
+        "name", ["", "_", "$HFPR_VER", "SION", "a$HFPR_VERSIONb"]
+    )
+    def test_name_forms_placeholder(self, name):
+        """
+        Package names that can form a version placeholder together with
+        their surroundings are replaced like build_text does.
+        """
+        text = "$HFPR_$HFPR_PACKAGE_NAMEVERSION $HFPR_PACKAGE_NAMESION"
+
+        assert build_text([TextFragment(text)], [], name, "1.0") == (
+            TextTemplate.from_text(text).render(name, "1.0")
+        )
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_same_as_build_text(self, seed):
+        """
+        Rendering a template has the same result as build_text, no matter
+        the text and metadata.
+        """
+        rnd = random.Random(seed)
+        atoms = ["$HFPR_PACKAGE_NAME", "$HFPR_VERSION", "$HFPR_", "VER", "x"]
+        text = "".join(rnd.choice(atoms) for _ in range(rnd.randrange(20)))
+        name = "".join(rnd.choice(atoms) for _ in range(rnd.randrange(3)))
+        version = rnd.choice(["", "1.0", "$HFPR_PACKAGE_NAME"])
+
+        assert build_text([TextFragment(text)], [], name, version) == (
+            TextTemplate.from_text(text).render(name, version)
+        )
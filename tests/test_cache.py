@@ -0,0 +1,263 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from hatch_fancy_pypi_readme import _cache
+from hatch_fancy_pypi_readme._cache import (
+    RenderCache,
+    clear_memo,
+    fingerprint,
+    load_config_memoized,
+    render_readme,
+)
+from hatch_fancy_pypi_readme.hooks import FancyReadmeMetadataHook
+
+from .utils import boom
+
+
+@pytest.fixture(name="cfg")
+def _cfg(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "README.md").write_text("# Hello $HFPR_VERSION\n")
+
+    return {
+        "content-type": "text/markdown",
+        "cache-dir": ".cache",
+        "fragments": [{"path": "README.md"}, {"text": "Bye!"}],
+    }
+
+
+class TestFingerprint:
+    def test_stable(self, cfg):
+        """
+        The same inputs lead to the same fingerprint.
+        """
+        assert fingerprint(cfg, "pkg", "1.0") == fingerprint(cfg, "pkg", "1.0")
+
+    def test_metadata(self, cfg):
+        """
+        Package name and version are part of the fingerprint.
+        """
+        fp = fingerprint(cfg, "pkg", "1.0")
+
+        assert fp != fingerprint(cfg, "pkg", "2.0")
+        assert fp != fingerprint(cfg, "other-pkg", "1.0")
+
+    def test_config(self, cfg):
+        """
+        Changing the configuration changes the fingerprint.
+        """
+        fp = fingerprint(cfg, "pkg", "1.0")
+        cfg["fragments"][1]["text"] = "Ciao!"
+
+        assert fp != fingerprint(cfg, "pkg", "1.0")
+
+    def test_file_contents(self, cfg, tmp_path):
+        """
+        Changing the contents of a fragment file changes the fingerprint.
+        """
+        fp = fingerprint(cfg, "pkg", "1.0")
+        (tmp_path / "README.md").write_text("# Goodbye\n")
+
+        assert fp != fingerprint(cfg, "pkg", "1.0")
+
+    def test_missing_file(self, cfg, tmp_path):
+        """
+        Missing files don't crash and lead to a different fingerprint.
+        """
+        fp = fingerprint(cfg, "pkg", "1.0")
+        (tmp_path / "README.md").unlink()
+
+        assert fp != fingerprint(cfg, "pkg", "1.0")
+
+
+class TestRenderCache:
+    def test_roundtrip(self, tmp_path):
+        """
+        Set entries can be retrieved, unknown ones are None.
+        """
+        cache = RenderCache(tmp_path / "cache")
+        entry = {"content-type": "text/markdown", "text": "# Hi"}
+
+        assert cache.get("abc") is None
+
+        cache.set("abc", entry)
+
+        assert entry == cache.get("abc")
+        assert cache.get("def") is None
+
+    def test_corrupt(self, tmp_path):
+        """
+        Corrupt entries are treated as misses.
+        """
+        cache = RenderCache(tmp_path)
+        (tmp_path / "abc.json").write_text("{nope")
+
+        assert cache.get("abc") is None
+
+    def test_unwritable(self, tmp_path):
+        """
+        If the cache directory can't be written, entries are dropped instead
+        of raising.
+        """
+        (tmp_path / "cache").write_text("not a directory")
+        cache = RenderCache(tmp_path / "cache")
+
+        cache.set("abc", {"text": "# Hi"})
+
+        assert cache.get("abc") is None
+
+    def test_evict(self, tmp_path):
+        """
+        If the entries exceed the maximum size, the least recently used ones
+        are evicted.
+        """
+        cache = RenderCache(tmp_path, max_size=250)
+        cache.set("0", {"text": "0" * 100})
+        cache.set("1", {"text": "1" * 100})
+        os.utime(tmp_path / "0.json", ns=(2, 2))
+        os.utime(tmp_path / "1.json", ns=(1, 1))
+
+        cache.set("2", {"text": "2" * 100})
+
+        assert cache.get("0") is not None
+        assert cache.get("1") is None
+        assert cache.get("2") is not None
+
+
+class TestHook:
+    def test_cache_hit(self, cfg, tmp_path, monkeypatch):
+        """
+        With a cache-dir configured, the second render doesn't touch the
+        configuration at all.
+        """
+        FancyReadmeMetadataHook(str(tmp_path), cfg).update(
+            md := {"name": "pkg", "version": "1.0"}
+        )
+
+        assert {
+            "content-type": "text/markdown",
+            "text": "# Hello 1.0\nBye!",
+        } == md["readme"]
+        assert 1 == len(list((tmp_path / ".cache").glob("*.json")))
+
+        clear_memo()
+        monkeypatch.setattr(_cache, "load_and_validate_config", boom)
+        monkeypatch.setattr(_cache, "compile_text", boom)
+
+        FancyReadmeMetadataHook(str(tmp_path), cfg).update(
+            md2 := {"name": "pkg", "version": "1.0"}
+        )
+
+        assert md["readme"] == md2["readme"]
+
+    def test_unwritable_cache(self, cfg, tmp_path):
+        """
+        An unwritable cache-dir doesn't fail the build.
+        """
+        (tmp_path / ".cache").write_text("not a directory")
+
+        FancyReadmeMetadataHook(str(tmp_path), cfg).update(
+            md := {"name": "pkg", "version": "1.0"}
+        )
+
+        assert "# Hello 1.0\nBye!" == md["readme"]["text"]
+
+    def test_no_cache(self, cfg, tmp_path):
+        """
+        Without a cache-dir, nothing is written.
+        """
+        del cfg["cache-dir"]
+
+        FancyReadmeMetadataHook(str(tmp_path), cfg).update(
+            md := {"name": "pkg", "version": "1.0"}
+        )
+
+        assert "# Hello 1.0\nBye!" == md["readme"]["text"]
+        assert not (tmp_path / ".cache").exists()
+
+
+class TestMemo:
+    def test_config(self, cfg):
+        """
+        Loading the same configuration twice returns the same Config.
+        """
+        config = load_config_memoized(cfg)
+
+        assert config is load_config_memoized(cfg)
+        assert config is not load_config_memoized(
+            {**cfg, "content-type": "text/x-rst"}
+        )
+
+    def test_readme(self, cfg, monkeypatch):
+        """
+        Rendering the same configuration twice doesn't load or build again,
+        even if the metadata changes.
+        """
+        readme = render_readme(cfg, "pkg", "1.0")
+
+        monkeypatch.setattr(_cache, "compile_text", boom)
+
+        assert readme == render_readme(cfg, "pkg", "1.0")
+        assert "# Hello 2.0\nBye!" == render_readme(cfg, "pkg", "2.0")["text"]
+
+    def test_invalidate_on_change(self, cfg, tmp_path):
+        """
+        If a fragment file changes on disk, the memo is invalidated.
+        """
+        assert "# Hello 1.0\nBye!" == render_readme(cfg, "pkg", "1.0")["text"]
+
+        readme = tmp_path / "README.md"
+        readme.write_text("# Hello again, $HFPR_VERSION\n")
+        os.utime(readme, ns=(1, 1))
+
+        assert (
+            "# Hello again, 1.0\nBye!"
+            == render_readme(cfg, "pkg", "1.0")["text"]
+        )
+
+    def test_glob_listing(self, tmp_path):
+        """
+        The memo key of glob fragments changes if matching files are added or
+        changed.
+        """
+        (tmp_path / "1.md").write_text("one\n")
+        config = {"fragments": [{"glob": str(tmp_path / "*.md")}]}
+        key = _cache.memo_key(config)
+
+        assert key == _cache.memo_key(config)
+
+        (tmp_path / "2.md").write_text("two\n")
+        key2 = _cache.memo_key(config)
+
+        assert key != key2
+
+        (tmp_path / "2.md").write_text("three\n")
+        os.utime(tmp_path / "2.md", ns=(1, 1))
+
+        assert key2 != _cache.memo_key(config)
+
+    def test_returns_copies(self, cfg):
+        """
+        Callers can't poison the memo by mutating the result.
+        """
+        render_readme(cfg, "pkg", "1.0")["text"] = "poison"
+
+        assert "poison" != render_readme(cfg, "pkg", "1.0")["text"]
+
+    def test_bounded(self, cfg, monkeypatch):
+        """
+        The memo doesn't grow beyond MEMO_SIZE entries.
+        """
+        monkeypatch.setattr(_cache, "MEMO_SIZE", 2)
+
+        for i in range(5):
+            render_readme(cfg, "pkg", str(i))
+
+        assert _cache.MEMO_SIZE == len(_cache._readmes)  # noqa: SLF001
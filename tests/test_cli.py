@@ -2,6 +2,7 @@
 #
 # SPDX-License-Identifier: MIT
 
+import pstats
 import sys
 
 from io import StringIO
@@ -9,17 +10,21 @@ from pathlib import Path
 
 import pytest
 
-from hatch_fancy_pypi_readme.__main__ import _maybe_load_hatch_toml, tomllib
-from hatch_fancy_pypi_readme._cli import cli_run
+from hatch_fancy_pypi_readme._cli import (
+    cli_run,
+    format_report,
+    load_toml,
+    maybe_load_hatch_toml,
+    profile_run,
+)
+from hatch_fancy_pypi_readme._trace import Span
 
 from .utils import run
 
 
 @pytest.fixture(name="pyproject", scope="session")
 def _pyproject():
-    return tomllib.loads(
-        (Path("tests") / "example_pyproject.toml").read_text()
-    )
+    return load_toml(Path("tests") / "example_pyproject.toml")
 
 
 @pytest.fixture(name="empty_pyproject")
@@ -225,6 +230,92 @@ class TestCLI:
         assert sio.getvalue().startswith("# Level 1 Header")
 
 
+class TestProfile:
+    def test_report(self, capfd, pyproject):
+        """
+        The readme is rendered and the slowest fragments and substitutions are
+        reported on stderr.
+        """
+        sio = StringIO()
+
+        profile_run(pyproject, {}, sio)
+
+        out, err = capfd.readouterr()
+
+        assert "" == out
+        assert sio.getvalue().startswith("# Level 1 Header")
+        assert err.startswith("Totals:\n")
+        assert "Slowest fragments and substitutions (top 10):" in err
+        assert "fragment      tests/example_changelog.md (read: " in err
+        assert "substitution  #(\\d+) (matches: 2)" in err
+
+    def test_pstats(self, capfd, pyproject, tmp_path):
+        """
+        If a path is passed, a cProfile profile is written to it.
+        """
+        path = tmp_path / "readme.pstats"
+
+        profile_run(pyproject, {}, StringIO(), str(path))
+
+        _, err = capfd.readouterr()
+        stats = pstats.Stats(str(path))
+
+        assert f"Profile written to {path}.\n" in err
+        assert any(func[2] == "build_text" for func in stats.stats)
+
+    def test_limit(self):
+        """
+        Only the slowest spans up to the limit are listed, slowest first.
+        """
+        spans = [
+            Span("fragment", 0, i / 1000, {"type": "text"}) for i in range(5)
+        ]
+
+        lines = format_report(spans, limit=2).splitlines()
+
+        assert [
+            "Totals:",
+            "",
+            "Slowest fragments and substitutions (top 2):",
+            "       4.00 ms  fragment      text (read: 0 B, kept: 0 B)",
+            "       3.00 ms  fragment      text (read: 0 B, kept: 0 B)",
+        ] == lines
+
+    def test_end_to_end(self, tmp_path):
+        """
+        --profile works from the command line.
+        """
+        path = tmp_path / "readme.pstats"
+
+        out = run(
+            "hatch_fancy_pypi_readme",
+            "tests/example_pyproject.toml",
+            "--profile",
+            f"--profile-output={path}",
+        )
+
+        assert "# Level 1 Header" in out
+        assert "Slowest fragments and substitutions" in out
+        assert path.exists()
+
+    def test_flag_keeps_positional(self, tmp_path):
+        """
+        --profile takes no value, so a path after it is the pyproject.toml to
+        render and is left alone.
+        """
+        pyproject = tmp_path / "pyproject.toml"
+        pyproject.write_bytes(
+            Path("tests/example_pyproject.toml").read_bytes()
+        )
+        before = pyproject.read_bytes()
+
+        out = run("hatch_fancy_pypi_readme", "--profile", str(pyproject))
+
+        assert "# Level 1 Header" in out
+        assert "Slowest fragments and substitutions" in out
+        assert before == pyproject.read_bytes()
+
+
 class TestMaybeLoadHatchToml:
     def test_none(self, tmp_path, monkeypatch):
         """
@@ -232,7 +323,7 @@ class TestMaybeLoadHatchToml:
         """
         monkeypatch.chdir(tmp_path)
 
-        assert {} == _maybe_load_hatch_toml(None)
+        assert {} == maybe_load_hatch_toml(None)
 
     def test_explicit(self, tmp_path, monkeypatch):
         """
@@ -247,7 +338,7 @@ class TestMaybeLoadHatchToml:
         not_hatch_toml = tmp_path / "not-hatch.toml"
         not_hatch_toml.write_text("[foo]\nbar='qux'")
 
-        assert {"foo": {"bar": "qux"}} == _maybe_load_hatch_toml(
+        assert {"foo": {"bar": "qux"}} == maybe_load_hatch_toml(
             str(not_hatch_toml)
         )
 
@@ -261,4 +352,4 @@ class TestMaybeLoadHatchToml:
         hatch_toml = tmp_path / "hatch.toml"
         hatch_toml.write_text("[foo]\nbar='qux'")
 
-        assert {"foo": {"bar": "qux"}} == _maybe_load_hatch_toml(None)
+        assert {"foo": {"bar": "qux"}} == maybe_load_hatch_toml(None)
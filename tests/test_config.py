@@ -2,9 +2,15 @@
 #
 # SPDX-License-Identifier: MIT
 
+import asyncio
+
 import pytest
 
-from hatch_fancy_pypi_readme._config import load_and_validate_config
+from hatch_fancy_pypi_readme._builder import build_text, build_text_async
+from hatch_fancy_pypi_readme._config import (
+    load_and_validate_config,
+    load_and_validate_config_async,
+)
 from hatch_fancy_pypi_readme.exceptions import ConfigurationError
 
 
@@ -49,6 +55,204 @@ class TestValidateConfig:
             "'text/html' is not one of ['text/markdown', 'text/x-rst']"
         ] == ei.value.errors
 
+    def test_cache_dir_not_string(self):
+        """
+        cache-dir must be a string.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            load_and_validate_config(
+                {
+                    "content-type": "text/markdown",
+                    "cache-dir": 42,
+                    "fragments": [{"text": "foo"}],
+                }
+            )
+
+        assert [
+            "tool.hatch.metadata.hooks.fancy-pypi-readme.cache-dir must be a "
+            "string."
+        ] == ei.value.errors
+
+    def test_precompiled_not_string(self):
+        """
+        precompiled must be a string.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            load_and_validate_config(
+                {
+                    "content-type": "text/markdown",
+                    "precompiled": True,
+                    "fragments": [{"text": "foo"}],
+                }
+            )
+
+        assert [
+            "tool.hatch.metadata.hooks.fancy-pypi-readme.precompiled must be "
+            "a string."
+        ] == ei.value.errors
+
+    @pytest.mark.parametrize("workers", [0, -1, True, 1.5, "4"])
+    def test_load_workers_invalid(self, workers):
+        """
+        load-workers must be a positive integer.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            load_and_validate_config(
+                {
+                    "content-type": "text/markdown",
+                    "load-workers": workers,
+                    "fragments": [{"text": "foo"}],
+                }
+            )
+
+        assert [
+            "tool.hatch.metadata.hooks.fancy-pypi-readme.load-workers must be "
+            "a positive integer."
+        ] == ei.value.errors
+
+    @pytest.mark.parametrize("timeout", [0, -1, True, "1"])
+    def test_regex_timeout_invalid(self, timeout):
+        """
+        regex-timeout must be a positive number.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            load_and_validate_config(
+                {
+                    "content-type": "text/markdown",
+                    "regex-timeout": timeout,
+                    "fragments": [{"text": "foo"}],
+                }
+            )
+
+        assert [
+            "tool.hatch.metadata.hooks.fancy-pypi-readme.regex-timeout must "
+            "be a positive number."
+        ] == ei.value.errors
+
+    def test_regex_timeout(self, tmp_path):
+        """
+        regex-timeout is passed to fragments and substitutions.
+        """
+        path = tmp_path / "text.md"
+        path.write_text("<foo>")
+
+        cfg = load_and_validate_config(
+            {
+                "content-type": "text/markdown",
+                "regex-timeout": 2.5,
+                "fragments": [{"path": str(path), "pattern": "<(.*)>"}],
+                "substitutions": [{"pattern": "o+", "replacement": "0"}],
+            }
+        )
+
+        assert "foo" == cfg.fragments[0].render()
+        assert 2.5 == cfg.substitutions[0].timeout  # noqa: PLR2004
+
+
+class TestConcurrentLoad:
+    def test_order(self, tmp_path):
+        """
+        Fragments loaded by a thread pool keep their order.
+        """
+        paths = []
+        for i in range(32):
+            path = tmp_path / f"{i}.md"
+            path.write_text(f"<{i}>")
+            paths.append(path)
+
+        cfg = load_and_validate_config(
+            {
+                "content-type": "text/markdown",
+                "load-workers": 8,
+                "fragments": [{"path": str(p)} for p in paths * 2],
+            }
+        )
+
+        assert [f"<{i}>" for i in range(32)] * 2 == [
+            f.render() for f in cfg.fragments
+        ]
+        assert len(paths) == cfg.files.misses
+
+    def test_errors(self, tmp_path):
+        """
+        Errors of concurrently loaded fragments are aggregated in order.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            load_and_validate_config(
+                {
+                    "content-type": "text/markdown",
+                    "load-workers": 4,
+                    "fragments": [
+                        {"path": str(tmp_path / "a.md")},
+                        {"text": "ok"},
+                        {"foo": "bar"},
+                        {"path": str(tmp_path / "b.md")},
+                    ],
+                }
+            )
+
+        assert [
+            f"Fragment file '{tmp_path / 'a.md'}' not found.",
+            "Unknown fragment type {'foo': 'bar'}.",
+            f"Fragment file '{tmp_path / 'b.md'}' not found.",
+        ] == ei.value.errors
+
+
+class TestLoadAsync:
+    def test_same_as_sync(self, tmp_path):
+        """
+        Many projects can be loaded and rendered concurrently and the result
+        is the same as with the synchronous API.
+        """
+        configs = []
+        for i in range(20):
+            path = tmp_path / f"{i}.md"
+            path.write_text(f"# Project {i}\n\nSee #{i}.\n")
+            configs.append(
+                {
+                    "content-type": "text/markdown",
+                    "fragments": [
+                        {"path": str(path)},
+                        {"text": "$HFPR_PACKAGE_NAME $HFPR_VERSION"},
+                    ],
+                    "substitutions": [
+                        {"pattern": r"#(\d+)", "replacement": r"[#\1](x/\1)"}
+                    ],
+                }
+            )
+
+        async def render(config):
+            cfg = await load_and_validate_config_async(config)
+            return await build_text_async(
+                cfg.fragments, cfg.substitutions, "pkg", "1.0"
+            )
+
+        async def render_all():
+            return await asyncio.gather(*(render(c) for c in configs))
+
+        expected = []
+        for config in configs:
+            cfg = load_and_validate_config(config)
+            expected.append(
+                build_text(cfg.fragments, cfg.substitutions, "pkg", "1.0")
+            )
+
+        assert expected == asyncio.run(render_all())
+
+    def test_errors(self):
+        """
+        Configuration errors are raised like by the synchronous API.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            asyncio.run(load_and_validate_config_async({"fragments": []}))
+
+        assert [
+            "tool.hatch.metadata.hooks.fancy-pypi-readme.content-type is "
+            "missing.",
+            "tool.hatch.metadata.hooks.fancy-pypi-readme.fragments must not "
+            "be empty.",
+        ] == ei.value.errors
+
 
 VALID_FOR_FRAG = {"content-type": "text/markdown"}
 
@@ -251,3 +455,76 @@ class TestValidateConfigSubstitutions:
             "tool.hatch.metadata.hooks.fancy-pypi-readme.substitutions must "
             "be an array."
         } == set(ei.value.errors)
+
+
+class TestFragmentSubstitutions:
+    def test_scoped(self, tmp_path):
+        """
+        Fragment substitutions apply only to their fragment and before the
+        global ones.
+        """
+        path = tmp_path / "CHANGELOG.md"
+        path.write_text("#1 and #2\n")
+
+        cfg = load_and_validate_config(
+            {
+                "content-type": "text/markdown",
+                "fragments": [
+                    {"text": "#1 stays. "},
+                    {
+                        "path": str(path),
+                        "substitutions": [
+                            {"pattern": r"#(\d+)", "replacement": r"[#\1]"}
+                        ],
+                    },
+                ],
+                "substitutions": [{"pattern": r"\]", "replacement": "]!"}],
+            }
+        )
+
+        assert "#1 stays. [#1]! and [#2]!\n" == build_text(
+            cfg.fragments, cfg.substitutions
+        )
+
+    def test_repeated_load(self):
+        """
+        Loading doesn't consume the fragment configuration.
+        """
+        config = {
+            "content-type": "text/markdown",
+            "fragments": [
+                {
+                    "text": "foo",
+                    "substitutions": [{"pattern": "o", "replacement": "0"}],
+                }
+            ],
+        }
+
+        assert ["f00", "f00"] == [
+            load_and_validate_config(config).fragments[0].render()
+            for _ in range(2)
+        ]
+
+    def test_errors(self, tmp_path):
+        """
+        Errors of the fragment and its substitutions are reported together.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            load_and_validate_config(
+                {
+                    "content-type": "text/markdown",
+                    "fragments": [
+                        {
+                            "path": str(tmp_path / "nope.md"),
+                            "substitutions": [{"pattern": "x"}],
+                        },
+                        {"text": "foo", "substitutions": {}},
+                    ],
+                }
+            )
+
+        assert [
+            f"Fragment file '{tmp_path / 'nope.md'}' not found.",
+            "Substitution {'pattern': 'x'} is missing a 'replacement' key.",
+            "Fragment substitutions must be an array.",
+        ] == ei.value.errors
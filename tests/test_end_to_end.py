@@ -3,6 +3,7 @@
 # SPDX-License-Identifier: MIT
 
 import email.parser
+import json
 
 import pytest
 
@@ -81,3 +82,30 @@ def test_invalid_config(new_project):
         "tool.hatch.metadata.hooks.fancy-pypi-readme.fragments is missing."
         in out
     ), out
+
+
+@pytest.mark.slow
+def test_trace(new_project, monkeypatch):
+    """
+    HFPR_TRACE works from within isolated builds.
+    """
+    append(
+        new_project / "pyproject.toml",
+        """
+[tool.hatch.metadata.hooks.fancy-pypi-readme]
+content-type = "text/markdown"
+
+[[tool.hatch.metadata.hooks.fancy-pypi-readme.fragments]]
+text = "# Level 1"
+""",
+    )
+    trace = new_project / "trace.jsonl"
+    monkeypatch.setenv("HFPR_TRACE", str(trace))
+
+    build_project()
+
+    names = {
+        json.loads(line)["name"] for line in trace.read_text().splitlines()
+    }
+
+    assert {"render", "config", "fragment", "build"} <= names
@@ -0,0 +1,194 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hatch_fancy_pypi_readme._config import load_and_validate_config
+from hatch_fancy_pypi_readme._files import FileCache, glob_files
+
+
+@pytest.fixture(name="path")
+def _path(tmp_path):
+    path = tmp_path / "text.md"
+    path.write_bytes(b"# Header\r\n\r\nBody\r\n")
+
+    return path
+
+
+class TestFileCache:
+    def test_read_text(self, path):
+        """
+        Texts are read like Path.read_text and only once.
+        """
+        files = FileCache()
+
+        assert path.read_text(encoding="utf-8") == files.read_text(path)
+        assert files.read_text(path) is files.read_text(path)
+        assert (1, 2) == (files.misses, files.hits)
+
+    def test_map_small(self, path):
+        """
+        Files smaller than min_size aren't mapped, but their text is cached.
+        """
+        files = FileCache()
+
+        assert None is files.map(path, 1024)
+        assert "# Header\n\nBody\n" == files.read_text(path)
+        assert None is files.map(path, 0)
+        assert (1, 2) == (files.misses, files.hits)
+
+    def test_map(self, path):
+        """
+        Large enough files are mapped once and their text is decoded from the
+        map.
+        """
+        files = FileCache()
+
+        mm = files.map(path, 1)
+
+        assert b"# Header\r\n" == mm[:10]
+        assert mm is files.map(path, 1)
+        assert "# Header\n\nBody\n" == files.read_text(path)
+        assert (1, 2) == (files.misses, files.hits)
+
+    def test_close(self, path):
+        """
+        Closing releases maps and texts, but keeps the statistics.
+        """
+        files = FileCache()
+        mm = files.map(path, 1)
+
+        files.close()
+
+        assert mm.closed
+        assert (1, 0) == (files.misses, files.hits)
+
+        files.read_text(path)
+
+        assert (2, 0) == (files.misses, files.hits)
+
+    def test_no_mmap(self, path):
+        """
+        If use_mmap is False, files are never mapped, but their text is
+        cached.
+        """
+        files = FileCache(use_mmap=False)
+
+        assert None is files.map(path, 1)
+        assert "# Header\n\nBody\n" == files.read_text(path)
+        assert (1, 1) == (files.misses, files.hits)
+
+    def test_invalidate(self, path):
+        """
+        Invalidated files are read again and their maps are closed.
+        """
+        files = FileCache()
+        mm = files.map(path, 1)
+        files.read_text(path)
+
+        path.write_text("changed")
+        files.invalidate(path)
+
+        assert mm.closed
+        assert "changed" == files.read_text(path)
+        assert (2, 1) == (files.misses, files.hits)
+
+    def test_invalidate_unknown(self, path):
+        """
+        Invalidating files that have never been read is a no-op.
+        """
+        files = FileCache()
+
+        files.invalidate(path)
+
+        assert (0, 0) == (files.misses, files.hits)
+
+    def test_threads(self, path):
+        """
+        Concurrent requests for the same file read it only once.
+        """
+        files = FileCache()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            texts = set(pool.map(files.read_text, [path] * 64))
+
+        assert {"# Header\n\nBody\n"} == texts
+        assert 1 == files.misses
+
+    def test_missing(self, tmp_path):
+        """
+        Missing files raise FileNotFoundError.
+        """
+        files = FileCache()
+
+        with pytest.raises(FileNotFoundError):
+            files.map(tmp_path / "nope", 1)
+        with pytest.raises(FileNotFoundError):
+            files.read_text(tmp_path / "nope")
+
+
+class TestGlobFiles:
+    def test_ok(self, tmp_path):
+        """
+        Regular files that match are returned sorted by name, including the
+        directory part of the pattern.  Hidden files only match explicitly.
+        """
+        for name in ("b.md", "a.md", ".c.md", "d.txt"):
+            (tmp_path / name).write_text(name)
+        (tmp_path / "dir.md").mkdir()
+
+        assert [str(tmp_path / "a.md"), str(tmp_path / "b.md")] == glob_files(
+            str(tmp_path / "*.md")
+        )
+        assert [str(tmp_path / ".c.md")] == glob_files(str(tmp_path / ".*"))
+
+    def test_cwd(self, tmp_path, monkeypatch):
+        """
+        Patterns without a directory scan the current one.
+        """
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "a.md").write_text("")
+
+        assert ["a.md"] == glob_files("*.md")
+
+    def test_missing(self, tmp_path):
+        """
+        Missing directories raise FileNotFoundError.
+        """
+        with pytest.raises(FileNotFoundError):
+            glob_files(str(tmp_path / "nope" / "*.md"))
+
+    def test_wildcard_directory(self):
+        """
+        Wildcards are only supported in the last component.
+        """
+        with pytest.raises(ValueError, match="docs"):
+            glob_files("docs*/*.md")
+
+
+class TestLoad:
+    def test_read_once(self, path):
+        """
+        Fragments that share a file read it only once per load.
+        """
+        cfg = load_and_validate_config(
+            {
+                "content-type": "text/markdown",
+                "fragments": [
+                    {"path": str(path), "end-before": "\n\n"},
+                    {"path": str(path), "start-after": "\n\n"},
+                    {"path": str(path), "pattern": "(Body)"},
+                ],
+            }
+        )
+
+        assert ["# Header", "Body\n", "Body"] == [
+            f.render() for f in cfg.fragments
+        ]
+        assert 1 == cfg.files.misses
+        assert cfg.files.hits > 1
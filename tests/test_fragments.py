@@ -4,14 +4,24 @@
 
 from __future__ import annotations
 
+import random
 import secrets
 
 from pathlib import Path
 
 import pytest
 
-from hatch_fancy_pypi_readme._fragments import FileFragment, TextFragment
-from hatch_fancy_pypi_readme.exceptions import ConfigurationError
+from hatch_fancy_pypi_readme import _fragments, _trace
+from hatch_fancy_pypi_readme._files import FileCache
+from hatch_fancy_pypi_readme._fragments import (
+    FileFragment,
+    GlobFragment,
+    TextFragment,
+)
+from hatch_fancy_pypi_readme.exceptions import (
+    CatastrophicBacktrackingWarning,
+    ConfigurationError,
+)
 
 
 class TestTextFragment:
@@ -208,3 +218,450 @@ This is the *interesting* body!""" == FileFragment.from_config(
                 }
             ).render()
         )
+
+    def test_pattern_timeout_ok(self, txt_path):
+        """
+        Patterns with a timeout give the same results.
+        """
+        assert (
+            "*interesting*"
+            == FileFragment.from_config(
+                {"path": str(txt_path), "pattern": r"the (.*) body"},
+                regex_timeout=5,
+            ).render()
+        )
+
+    def test_pattern_timeout_exceeded(self, tmp_path):
+        """
+        Patterns that exceed the timeout are reported.
+        """
+        path = tmp_path / "evil.md"
+        path.write_text("a" * 40 + "b")
+
+        with pytest.raises(ConfigurationError) as ei:
+            FileFragment.from_config(
+                {"path": str(path), "pattern": r"((a+)+)$"},
+                regex_timeout=0.2,
+            )
+
+        assert [
+            "file fragment: pattern '((a+)+)$' exceeded the regex-timeout of "
+            "0.2 seconds."
+        ] == ei.value.errors
+
+    def test_pattern_backtracking_warning(self, txt_path):
+        """
+        Patterns that are prone to catastrophic backtracking cause a warning.
+        """
+        with pytest.warns(
+            CatastrophicBacktrackingWarning, match="^File fragment pattern"
+        ):
+            FileFragment.from_config(
+                {"path": str(txt_path), "pattern": r"the ((\S+\s?)+) body"}
+            )
+
+
+@pytest.fixture(name="mapped")
+def _mapped(monkeypatch):
+    return _map_files(monkeypatch)
+
+
+def _map_files(monkeypatch):
+    """
+    Memory-map all files and record those that are read in full.
+    """
+    monkeypatch.setattr(_fragments, "MMAP_THRESHOLD", 1)
+
+    read_text = FileCache.read_text
+    calls = []
+
+    def spy(self, path):
+        calls.append(path)
+        return read_text(self, path)
+
+    monkeypatch.setattr(FileCache, "read_text", spy)
+
+    return calls
+
+
+class TestMappedFileFragment:
+    @pytest.mark.parametrize(
+        "cfg",
+        [
+            {"start-after": "<!-- cut after this -->\n\n"},
+            {"start-at": "This is the *interesting* body!"},
+            {"end-before": "\n\n<!-- but before this -->"},
+            {
+                "start-after": "<!-- cut after this -->\n\n",
+                "end-before": "\n\n<!-- but before this -->",
+                "pattern": r"the (.*) body",
+            },
+        ],
+    )
+    def test_same_as_read(self, txt_path, monkeypatch, cfg):
+        """
+        Large files are sliced without reading them in full, and the result is
+        the same.
+        """
+        cfg = {"path": str(txt_path), **cfg}
+        expected = FileFragment.from_config(cfg.copy()).render()
+
+        calls = _map_files(monkeypatch)
+
+        assert expected == FileFragment.from_config(cfg).render()
+        assert [] == calls
+
+    def test_newlines_translated(self, tmp_path, mapped):
+        """
+        Newlines within the slice are translated like when reading the file as
+        text.
+        """
+        path = tmp_path / "crlf.md"
+        path.write_bytes(b"head\r\nSTART\r\na\r\nb\rc\r\nEND\r\n")
+
+        assert (
+            "\na\nb\nc\n"
+            == FileFragment.from_config(
+                {
+                    "path": str(path),
+                    "start-after": "START",
+                    "end-before": "END",
+                }
+            ).render()
+        )
+        assert [] == mapped
+
+    def test_newline_markers_carriage_returns(self, tmp_path, mapped):
+        """
+        If markers contain newlines and the file carriage returns, the file is
+        read in full so the markers are found.
+        """
+        path = tmp_path / "crlf.md"
+        path.write_bytes(b"head\r\n\r\nbody\r\n")
+
+        assert (
+            "body\n"
+            == FileFragment.from_config(
+                {"path": str(path), "start-after": "head\n\n"}
+            ).render()
+        )
+        assert [path] == mapped
+
+    @pytest.mark.usefixtures("mapped")
+    def test_only_slice_decoded(self, tmp_path):
+        """
+        Only the slice between the markers is decoded.
+        """
+        path = tmp_path / "mixed.md"
+        path.write_bytes(b"\xff\xfeSTART\xc3\xa4END\xff")
+
+        assert (
+            "\u00e4"
+            == FileFragment.from_config(
+                {
+                    "path": str(path),
+                    "start-after": "START",
+                    "end-before": "END",
+                }
+            ).render()
+        )
+
+    @pytest.mark.usefixtures("mapped")
+    def test_not_found(self, txt_path):
+        """
+        Missing markers are reported like for small files.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            FileFragment.from_config(
+                {
+                    "path": str(txt_path),
+                    "start-at": "nope",
+                    "end-before": "also nope",
+                }
+            )
+
+        assert [
+            "file fragment: 'start-at' 'nope' not found.",
+            "file fragment: 'end-before' 'also nope' not found.",
+        ] == ei.value.errors
+
+    @pytest.mark.usefixtures("mapped")
+    def test_missing_file(self, tmp_path):
+        """
+        Missing files are reported like for small files.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            FileFragment.from_config(
+                {"path": str(tmp_path / "nope.md"), "start-at": "x"}
+            )
+
+        assert [
+            f"Fragment file '{tmp_path / 'nope.md'}' not found."
+        ] == ei.value.errors
+
+
+@pytest.fixture(name="changelog_d")
+def _changelog_d(tmp_path):
+    d = tmp_path / "changelog.d"
+    d.mkdir()
+    for i in (3, 1, 2):
+        (d / f"{i}.added.md").write_text(f"- Change {i}.\n")
+    (d / "template.jinja").write_text("nope")
+
+    return d
+
+
+class TestGlobFragment:
+    def test_ok(self, changelog_d):
+        """
+        Matching files are concatenated in the order of their names.
+        """
+        assert (
+            "- Change 1.\n- Change 2.\n- Change 3.\n"
+            == GlobFragment.from_config(
+                {"glob": str(changelog_d / "*.md")}
+            ).render()
+        )
+
+    def test_separator(self, changelog_d):
+        """
+        If a separator is passed, it's put between files.
+        """
+        assert (
+            "- Change 1.\n\n- Change 2.\n\n- Change 3.\n"
+            == GlobFragment.from_config(
+                {"glob": str(changelog_d / "*.md"), "separator": "\n"}
+            ).render()
+        )
+
+    def test_files(self, changelog_d):
+        """
+        Files are read through the passed FileCache.
+        """
+        files = FileCache()
+        GlobFragment.from_config({"glob": str(changelog_d / "*.md")}, files)
+        GlobFragment.from_config({"glob": str(changelog_d / "*.md")}, files)
+
+        assert (3, 3) == (files.misses, files.hits)
+
+    def test_no_matches(self, changelog_d):
+        """
+        An empty match renders nothing, such that a changelog directory may be
+        empty after a release.
+        """
+        assert (
+            ""
+            == GlobFragment.from_config(
+                {"glob": str(changelog_d / "*.rst")}
+            ).render()
+        )
+
+    def test_missing_directory(self, tmp_path):
+        """
+        Missing directories are errors.
+        """
+        with pytest.raises(ConfigurationError, match="not found"):
+            GlobFragment.from_config({"glob": str(tmp_path / "nope" / "*")})
+
+    def test_wildcard_directory(self):
+        """
+        Wildcards in directories are errors.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            GlobFragment.from_config({"glob": "*/*.md"})
+
+        assert [
+            "glob fragment: only the last path component of '*/*.md' may "
+            "contain wildcards."
+        ] == ei.value.errors
+
+    def test_invalid_separator(self, changelog_d):
+        """
+        Separators must be strings.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            GlobFragment.from_config(
+                {"glob": str(changelog_d / "*.md"), "separator": 1}
+            )
+
+        assert ["glob fragment: 'separator' must be a string."] == (
+            ei.value.errors
+        )
+
+
+HISTORY = """\
+# History
+
+## 1.0
+
+First.
+
+## 2.0
+
+Second.
+
+## 3.0
+
+Third.
+"""
+
+
+@pytest.fixture(name="history")
+def _history(tmp_path):
+    path = tmp_path / "HISTORY.md"
+    path.write_text(HISTORY)
+
+    return str(path)
+
+
+class TestTailFileFragment:
+    @pytest.mark.parametrize(
+        ("lines", "expected"),
+        [
+            (1, "Third.\n"),
+            (3, "## 3.0\n\nThird.\n"),
+            (100, HISTORY),
+        ],
+    )
+    def test_tail_lines(self, history, lines, expected):
+        """
+        tail-lines keeps that many lines from the end.
+        """
+        assert (
+            expected
+            == FileFragment.from_config(
+                {"path": history, "tail-lines": lines}
+            ).render()
+        )
+
+    def test_start_after_last(self, history):
+        """
+        start-after-last cuts away everything before and including the last
+        occurrence of the marker.
+        """
+        assert (
+            " 3.0\n\nThird.\n"
+            == FileFragment.from_config(
+                {"path": history, "start-after-last": "##"}
+            ).render()
+        )
+
+    def test_start_at_last(self, history):
+        """
+        start-at-last preserves the marker and works with end-before and
+        pattern.
+        """
+        assert (
+            "3.0"
+            == FileFragment.from_config(
+                {
+                    "path": history,
+                    "start-at-last": "## ",
+                    "end-before": "\n\nThird",
+                    "pattern": "## (.*)",
+                }
+            ).render()
+        )
+
+    def test_marker_not_found(self, history):
+        """
+        Missing markers are reported.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            FileFragment.from_config(
+                {"path": history, "start-at-last": "## 4.0"}
+            )
+
+        assert ["file fragment: 'start-at-last' '## 4.0' not found."] == (
+            ei.value.errors
+        )
+
+    def test_cut(self):
+        """
+        Contents that are already in memory are cut the same way.
+        """
+        tail = _fragments._Tail(lines=3)  # noqa: SLF001
+
+        assert ("## 3.0\n\nThird.\n", []) == tail.cut(HISTORY)
+
+    @pytest.mark.parametrize(
+        "cfg",
+        [
+            {"tail-lines": 0},
+            {"tail-lines": True},
+            {"tail-lines": "3"},
+            {"start-after-last": ""},
+            {"start-at-last": 1},
+        ],
+    )
+    def test_invalid(self, history, cfg):
+        """
+        tail-lines must be a positive integer and markers non-empty strings.
+        """
+        with pytest.raises(ConfigurationError, match="must be"):
+            FileFragment.from_config({"path": history, **cfg})
+
+    def test_mutually_exclusive(self, history):
+        """
+        Only one way to find the start can be used.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            FileFragment.from_config(
+                {"path": history, "start-after": "#", "tail-lines": 1}
+            )
+
+        assert [
+            "file fragment: 'start-after' and 'tail-lines' are mutually "
+            "exclusive."
+        ] == ei.value.errors
+
+    def test_reads_only_tail(self, tmp_path, monkeypatch):
+        """
+        Only the blocks at the end of the file that contain the tail are read.
+        """
+        monkeypatch.setattr(_fragments, "TAIL_BLOCK_SIZE", 1024)
+        path = tmp_path / "big.md"
+        path.write_text("x" * 100 + "\n" * 100_000 + "a\nb\n")
+        spans = []
+        _trace.add_observer(spans.append)
+        try:
+            with _trace.span("fragment") as attrs:
+                text = FileFragment.from_config(
+                    {"path": str(path), "tail-lines": 2}
+                ).render()
+        finally:
+            _trace.remove_observer(spans.append)
+
+        assert "a\nb\n" == text
+        assert {"bytes_scanned": 1024, "bytes_read": 4} == attrs
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_fuzz(self, tmp_path, monkeypatch, seed):
+        """
+        Reading backwards in blocks gives the same result as cutting the
+        whole text, or falls back to it.
+        """
+        monkeypatch.setattr(_fragments, "TAIL_BLOCK_SIZE", 3)
+        rnd = random.Random(seed)
+        data = "".join(
+            rnd.choice(["a", "b", "ab", "\n", "\r\n", "\r", "é"])
+            for _ in range(rnd.randrange(60))
+        )
+        path = tmp_path / "fuzz.md"
+        path.write_bytes(data.encode())
+        text = path.read_text(encoding="utf-8")
+
+        for tail in (
+            _fragments._Tail(lines=rnd.randrange(1, 5)),  # noqa: SLF001
+            _fragments._Tail(marker="ab"),  # noqa: SLF001
+            _fragments._Tail(marker="b\na", keep_marker=True),  # noqa: SLF001
+        ):
+            rv = tail.read(path)
+            if rv is None:
+                assert (
+                    "\r" in data.replace("\r\n", "")
+                    or tail.marker not in text
+                    or ("\r" in data and "\n" in tail.marker)
+                )
+            else:
+                assert (rv, []) == tail.cut(text)
@@ -0,0 +1,249 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import shutil
+import subprocess
+
+from pathlib import Path
+
+import pytest
+
+from hatch_fancy_pypi_readme import _cache, _git
+from hatch_fancy_pypi_readme._config import load_and_validate_config
+from hatch_fancy_pypi_readme._fragments import FileFragment
+from hatch_fancy_pypi_readme._inputs import git_digest
+from hatch_fancy_pypi_readme._precompiled import (
+    render_precompiled,
+    write_artifact,
+)
+from hatch_fancy_pypi_readme.exceptions import ConfigurationError
+
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("git") is None, reason="git is not installed"
+)
+
+
+def git(*args: str) -> str:
+    return subprocess.run(
+        [
+            "git",
+            "-c",
+            "user.name=Test",
+            "-c",
+            "user.email=test@example.com",
+            *args,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+def commit(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    git("add", str(path))
+    git("commit", "-q", "-m", text)
+
+
+@pytest.fixture(name="repo")
+def _repo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    git("init", "-q")
+    commit(Path("docs/a.md"), "first\n")
+    git("tag", "v1")
+    commit(Path("docs/a.md"), "second\n")
+
+    yield tmp_path
+
+    _git.close_readers()
+
+
+class TestReadBlob:
+    @pytest.mark.usefixtures("repo")
+    def test_ok(self):
+        """
+        Files are read at the given ref, relative to the current directory.
+        """
+        Path("docs/a.md").write_text("work tree\n")
+
+        assert b"first\n" == _git.read_blob("v1", Path("docs/a.md"))
+        assert b"second\n" == _git.read_blob("HEAD", Path("docs/a.md"))
+
+    def test_subdirectory(self, repo, monkeypatch):
+        """
+        Paths are relative to the current directory, even if it's not the
+        top of the repository.
+        """
+        monkeypatch.chdir(repo / "docs")
+
+        assert b"first\n" == _git.read_blob("v1", Path("a.md"))
+
+    def test_parent_directory(self, repo, monkeypatch):
+        """
+        Paths can leave the current directory using "..", like in monorepos.
+        """
+        commit(Path("pkg/other/x.md"), "other\n")
+        (repo / "pkg" / "sub").mkdir()
+        monkeypatch.chdir(repo / "pkg" / "sub")
+
+        assert b"other\n" == _git.read_blob("HEAD", Path("../other/x.md"))
+        assert b"other\n" == _git.read_blob(
+            "HEAD", Path("../sub/../other/x.md")
+        )
+
+    def test_reuses_process(self, repo):
+        """
+        All reads from a repository go through the same process.
+        """
+        _git.read_blob("v1", Path("docs/a.md"))
+        reader = _git._readers[repo]  # noqa: SLF001
+        process = reader._process  # noqa: SLF001
+
+        _git.read_blob("HEAD", Path("docs/a.md"))
+
+        assert process is reader._process  # noqa: SLF001
+
+    @pytest.mark.parametrize(
+        ("ref", "path"),
+        [
+            ("v1", "docs/nope.md"),
+            ("nope", "docs/a.md"),
+            ("HEAD", "docs"),
+            ("HEAD", "my file.md"),
+            ("HEAD", "docs/a b c.md"),
+        ],
+    )
+    @pytest.mark.usefixtures("repo")
+    def test_missing(self, ref, path):
+        """
+        Missing refs and paths, and directories raise GitError, but the
+        reader remains usable.
+        """
+        with pytest.raises(_git.GitError):
+            _git.read_blob(ref, Path(path))
+
+        assert b"first\n" == _git.read_blob("v1", Path("docs/a.md"))
+
+    def test_not_a_repository(self, tmp_path, monkeypatch):
+        """
+        Files outside of a repository raise GitError.
+        """
+        monkeypatch.chdir(tmp_path)
+
+        with pytest.raises(_git.GitError, match="not within a git repository"):
+            _git.read_blob("HEAD", Path("a.md"))
+
+    def test_restarts(self, repo):
+        """
+        If the process dies, the next read starts a new one.
+        """
+        _git.read_blob("v1", Path("docs/a.md"))
+        process = _git._readers[repo]._process  # noqa: SLF001
+        process.kill()
+        process.wait()
+
+        with pytest.raises(_git.GitError):
+            _git.read_blob("v1", Path("docs/a.md"))
+
+        assert b"first\n" == _git.read_blob("v1", Path("docs/a.md"))
+
+
+class TestFileFragment:
+    @pytest.mark.usefixtures("repo")
+    def test_ok(self):
+        """
+        Fragments with a git-ref read the file at that ref and support the
+        usual options.
+        """
+        commit(Path("docs/b.md"), "intro\n<!-- begin -->\nbody\n")
+
+        assert (
+            "\nbody\n"
+            == FileFragment.from_config(
+                {
+                    "path": "docs/b.md",
+                    "git-ref": "HEAD",
+                    "start-after": "<!-- begin -->",
+                }
+            ).render()
+        )
+
+    @pytest.mark.usefixtures("repo")
+    def test_missing(self):
+        """
+        Missing files raise a ConfigurationError that names path and ref.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            FileFragment.from_config({"path": "docs/a.md", "git-ref": "v2"})
+
+        assert ei.value.errors[0].startswith(
+            "Fragment file 'docs/a.md' not found at git ref 'v2'"
+        )
+
+    @pytest.mark.usefixtures("repo")
+    def test_missing_with_space(self):
+        """
+        Missing paths with spaces are reported like any other missing path.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            FileFragment.from_config({"path": "my file.md", "git-ref": "HEAD"})
+
+        assert ei.value.errors[0].startswith(
+            "Fragment file 'my file.md' not found at git ref 'HEAD'"
+        )
+        assert None is git_digest("HEAD", "my file.md")
+
+    @pytest.mark.usefixtures("repo")
+    def test_invalid_ref(self):
+        """
+        The git-ref must be a non-empty string.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            FileFragment.from_config({"path": "docs/a.md", "git-ref": ""})
+
+        assert [
+            "file fragment: 'git-ref' must be a non-empty string."
+        ] == ei.value.errors
+
+
+class TestCaching:
+    @pytest.mark.usefixtures("repo")
+    def test_memo_follows_ref(self):
+        """
+        The memo key changes if the ref moves, although the work tree doesn't.
+        """
+        config = {"fragments": [{"path": "docs/a.md", "git-ref": "HEAD"}]}
+        key = _cache.memo_key(config)
+        fp = _cache.fingerprint(config, "pkg", "1.0")
+
+        assert key == _cache.memo_key(config)
+
+        git("reset", "-q", "--soft", "v1")
+
+        assert key != _cache.memo_key(config)
+        assert fp != _cache.fingerprint(config, "pkg", "1.0")
+
+    def test_precompiled(self, repo):
+        """
+        Precompiled artifacts are stale once a git fragment changes.
+        """
+        config = {
+            "content-type": "text/markdown",
+            "fragments": [{"path": "docs/a.md", "git-ref": "HEAD"}],
+        }
+        artifact = repo / "readme.json"
+        write_artifact(config, load_and_validate_config(config), artifact)
+
+        assert {
+            "content-type": "text/markdown",
+            "text": "second\n",
+        } == render_precompiled(config, artifact, "pkg", "1.0")
+
+        git("reset", "-q", "--soft", "v1")
+
+        assert None is render_precompiled(config, artifact, "pkg", "1.0")
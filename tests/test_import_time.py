@@ -0,0 +1,112 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Hatchling imports every registered plugin in every (isolated) build
+environment, so registering our hook must be cheap.  The same goes for
+asking the CLI for --help.
+
+The budgets are for the self time of our own modules and deliberately
+generous to avoid flakiness on slow CI runners.  Which modules are imported
+is deterministic though, so it's checked exactly.
+"""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+
+pytestmark = [
+    pytest.mark.slow,
+    pytest.mark.skipif(
+        sys.implementation.name != "cpython",
+        reason="-X importtime is CPython-only",
+    ),
+]
+
+# In microseconds, like -X importtime.
+REGISTRATION_BUDGET = 20_000
+HELP_BUDGET = 20_000
+RENDER_BUDGET = 150_000
+
+
+def import_times(*args):
+    """
+    Run Python with *args* and return the self import times of all modules
+    it imported.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        encoding="utf-8",
+        check=True,
+    )
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us)
+
+    return times
+
+
+def own(times):
+    return {
+        name: us
+        for name, us in times.items()
+        if name.split(".")[0] == "hatch_fancy_pypi_readme"
+    }
+
+
+class TestImportTime:
+    def test_hook_registration(self):
+        """
+        Registering the hook imports none of our rendering machinery.
+        """
+        times = own(
+            import_times(
+                "-c",
+                "import hatchling.plugin;"
+                "import hatchling.metadata.plugin.interface;"
+                "import hatch_fancy_pypi_readme.hooks",
+            )
+        )
+
+        assert {
+            "hatch_fancy_pypi_readme",
+            "hatch_fancy_pypi_readme.hooks",
+        } == set(times)
+        assert sum(times.values()) < REGISTRATION_BUDGET
+
+    def test_cli_help(self):
+        """
+        --help imports neither TOML parsers nor our rendering machinery.
+        """
+        times = import_times("-m", "hatch_fancy_pypi_readme", "--help")
+
+        # __main__ is run, not imported, so it doesn't show up.
+        assert {"hatch_fancy_pypi_readme"} == set(own(times))
+        assert not {"tomllib", "tomli"} & set(times)
+        assert sum(own(times).values()) < HELP_BUDGET
+
+    def test_render(self):
+        """
+        Rendering doesn't import modules that are only needed for optional
+        features.
+        """
+        times = import_times("-c", "import hatch_fancy_pypi_readme._cache")
+
+        assert not {
+            "asyncio",
+            "concurrent.futures",
+            "cProfile",
+            "importlib.metadata",
+            "tempfile",
+        } & set(times)
+        assert sum(own(times).values()) < RENDER_BUDGET
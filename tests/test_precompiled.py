@@ -0,0 +1,283 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import json
+import os
+
+from pathlib import Path
+
+import pytest
+
+from hatch_fancy_pypi_readme import _cache, _precompiled
+from hatch_fancy_pypi_readme._cache import render_readme
+from hatch_fancy_pypi_readme._config import load_and_validate_config
+from hatch_fancy_pypi_readme._precompiled import (
+    render_precompiled,
+    write_artifact,
+)
+from hatch_fancy_pypi_readme.hooks import FancyReadmeMetadataHook
+
+from .utils import boom, run
+
+
+@pytest.fixture(name="cfg")
+def _cfg(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "README.md").write_text("# $HFPR_PACKAGE_NAME $HFPR_VERSION\n")
+
+    return {
+        "content-type": "text/markdown",
+        "precompiled": "readme.json",
+        "fragments": [{"path": "README.md"}, {"text": "Bye!"}],
+        "substitutions": [{"pattern": "Bye", "replacement": "Ciao"}],
+    }
+
+
+@pytest.fixture(name="artifact")
+def _artifact(cfg, tmp_path):
+    path = tmp_path / "readme.json"
+    write_artifact(cfg, load_and_validate_config(cfg), path)
+
+    return path
+
+
+class TestRenderPrecompiled:
+    @pytest.mark.parametrize("version", ["1.0", "2.0rc1"])
+    def test_same_as_rendered(self, cfg, artifact, version):
+        """
+        The precompiled readme is the same as a freshly rendered one for any
+        version.
+        """
+        assert render_readme(cfg, "pkg", version) == render_precompiled(
+            cfg, artifact, "pkg", version
+        )
+
+    def test_unchanged_files_not_read(self, cfg, artifact, monkeypatch):
+        """
+        If size and modification time of input files match, they're not
+        read.
+        """
+        monkeypatch.setattr(Path, "read_bytes", boom)
+
+        assert (
+            "# pkg 1.0\nCiao!"
+            == (render_precompiled(cfg, artifact, "pkg", "1.0")["text"])
+        )
+
+    def test_touched(self, cfg, artifact, tmp_path):
+        """
+        If only the modification time changed, the contents are compared.
+        """
+        os.utime(tmp_path / "README.md", ns=(1, 1))
+
+        assert None is not render_precompiled(cfg, artifact, "pkg", "1.0")
+
+    def test_file_changed(self, cfg, artifact, tmp_path):
+        """
+        If an input file changed, the artifact is out of date.
+        """
+        readme = tmp_path / "README.md"
+        readme.write_text("# Something else\n")
+        os.utime(readme, ns=(1, 1))
+
+        assert None is render_precompiled(cfg, artifact, "pkg", "1.0")
+
+    def test_file_missing(self, cfg, artifact, tmp_path):
+        """
+        If an input file is gone, the artifact is out of date.
+        """
+        (tmp_path / "README.md").unlink()
+
+        assert None is render_precompiled(cfg, artifact, "pkg", "1.0")
+
+    def test_config_changed(self, cfg, artifact):
+        """
+        If the configuration changed, the artifact is out of date -- unless
+        it's only the location of the artifact.
+        """
+        assert None is render_precompiled(
+            {**cfg, "substitutions": []}, artifact, "pkg", "1.0"
+        )
+        assert None is not render_precompiled(
+            {**cfg, "precompiled": "elsewhere.json"}, artifact, "pkg", "1.0"
+        )
+
+    def test_other_version(self, cfg, artifact, monkeypatch):
+        """
+        Artifacts written by other versions of hatch-fancy-pypi-readme are
+        ignored.
+        """
+        monkeypatch.setattr(_precompiled, "own_version", lambda: "0.0")
+
+        assert None is render_precompiled(cfg, artifact, "pkg", "1.0")
+
+    @pytest.mark.parametrize("content", ["", "{", "[]", '{"format": 0}'])
+    def test_invalid(self, cfg, artifact, content):
+        """
+        Broken artifacts are ignored.
+        """
+        artifact.write_text(content)
+
+        assert None is render_precompiled(cfg, artifact, "pkg", "1.0")
+
+    @pytest.mark.parametrize(
+        "corrupt",
+        [
+            {"inputs": None},
+            {"inputs": [["README.md", 1]]},
+            {"inputs": [["README.md", None, None, None]]},
+            {"git-inputs": None},
+            {"chunks": [2]},
+            {"chunks": None},
+            {"content-type": None},
+        ],
+    )
+    def test_malformed(self, cfg, artifact, corrupt):
+        """
+        Artifacts that match the configuration but whose body is malformed
+        are ignored.
+        """
+        data = json.loads(artifact.read_text())
+        data.update(corrupt)
+        artifact.write_text(json.dumps(data))
+
+        assert None is render_precompiled(cfg, artifact, "pkg", "1.0")
+
+    def test_inputs_missing(self, cfg, artifact):
+        """
+        Artifacts without inputs are ignored.
+        """
+        data = json.loads(artifact.read_text())
+        del data["inputs"]
+        artifact.write_text(json.dumps(data))
+
+        assert None is render_precompiled(cfg, artifact, "pkg", "1.0")
+
+    def test_missing(self, cfg, tmp_path):
+        """
+        Missing artifacts are ignored.
+        """
+        assert None is render_precompiled(
+            cfg, tmp_path / "nope.json", "pkg", "1.0"
+        )
+
+
+class TestHook:
+    @pytest.mark.usefixtures("artifact")
+    def test_uses_artifact(self, cfg, tmp_path, monkeypatch):
+        """
+        If the precompiled readme is up to date, the configuration isn't
+        loaded at all.
+        """
+        monkeypatch.setattr(_cache, "load_and_validate_config", boom)
+
+        FancyReadmeMetadataHook(str(tmp_path), cfg).update(
+            md := {"name": "pkg", "version": "1.0"}
+        )
+
+        assert {
+            "content-type": "text/markdown",
+            "text": "# pkg 1.0\nCiao!",
+        } == md["readme"]
+
+    def test_stale(self, cfg, artifact, tmp_path):
+        """
+        If the precompiled readme is out of date, it's rendered as usual.
+        """
+        artifact.write_text("{}")
+
+        FancyReadmeMetadataHook(str(tmp_path), cfg).update(
+            md := {"name": "pkg", "version": "1.0"}
+        )
+
+        assert "# pkg 1.0\nCiao!" == md["readme"]["text"]
+
+
+PYPROJECT = """\
+[project]
+dynamic = ["readme"]
+
+[tool.hatch.metadata.hooks.fancy-pypi-readme]
+content-type = "text/markdown"
+precompiled = "readme.json"
+fragments = [{ path = "README.md" }, { text = "Bye!" }]
+substitutions = [{ pattern = "Bye", replacement = "Ciao" }]
+"""
+
+
+class TestCompileEndToEnd:
+    def test_compile(self, cfg, tmp_path):
+        """
+        The compile subcommand writes the artifact to where the precompiled
+        option points.
+        """
+        (tmp_path / "pyproject.toml").write_text(PYPROJECT)
+
+        out = run("hatch_fancy_pypi_readme", "compile")
+
+        assert f"Precompiled readme written to {Path('readme.json')}." in out
+        assert None is not render_precompiled(
+            cfg, tmp_path / "readme.json", "pkg", "1.0"
+        )
+
+    @pytest.mark.usefixtures("cfg")
+    def test_explicit_target(self, tmp_path):
+        """
+        -o overrides the precompiled option.
+        """
+        (tmp_path / "pyproject.toml").write_text(PYPROJECT)
+
+        run("hatch_fancy_pypi_readme", "compile", "-o", "other.json")
+
+        assert ["other.json"] == [p.name for p in tmp_path.glob("*.json")]
+
+    @pytest.mark.usefixtures("cfg")
+    def test_no_target(self, tmp_path):
+        """
+        Without -o and the precompiled option, there's nowhere to write to.
+        """
+        (tmp_path / "pyproject.toml").write_text(
+            PYPROJECT.replace('precompiled = "readme.json"\n', "")
+        )
+
+        out = run("hatch_fancy_pypi_readme", "compile", check=False)
+
+        assert (
+            "Pass a target file using -o or set the 'precompiled' option.\n"
+            == out
+        )
+
+    @pytest.mark.usefixtures("cfg")
+    def test_creates_directory(self, tmp_path):
+        """
+        Missing parent directories of the target are created.
+        """
+        (tmp_path / "pyproject.toml").write_text(PYPROJECT)
+
+        run("hatch_fancy_pypi_readme", "compile", "-o", "build/readme.json")
+
+        assert (tmp_path / "build" / "readme.json").exists()
+
+    @pytest.mark.usefixtures("cfg")
+    def test_unwritable(self, tmp_path):
+        """
+        Errors writing the target are reported without a traceback.
+        """
+        (tmp_path / "pyproject.toml").write_text(PYPROJECT)
+        (tmp_path / "build").write_text("not a directory")
+
+        out = run(
+            "hatch_fancy_pypi_readme",
+            "compile",
+            "-o",
+            "build/readme.json",
+            check=False,
+        )
+
+        assert out.startswith(
+            f"Can't write precompiled readme to {Path('build/readme.json')}: "
+        )
+        assert "Traceback" not in out
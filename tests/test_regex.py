@@ -0,0 +1,283 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import re
+import sys
+
+import pytest
+
+from hatch_fancy_pypi_readme._regex import (
+    CharSet,
+    analyze,
+    analyze_replacement,
+    compile_template,
+    nested_quantifier,
+    pure_literal,
+    required_literal,
+)
+
+
+def chars(s):
+    return CharSet(frozenset(s))
+
+
+class TestCharSet:
+    @pytest.mark.parametrize(
+        ("a", "b"),
+        [
+            (chars("abc"), chars("cde")),
+            (chars("a"), CharSet(categories=frozenset(["word"]))),
+            (chars("7"), CharSet(categories=frozenset(["digit"]))),
+            (
+                CharSet(categories=frozenset(["digit"])),
+                CharSet(categories=frozenset(["word"])),
+            ),
+            (
+                CharSet(ranges=((0, 10_000),)),
+                CharSet(ranges=((9_000, 9_001),)),
+            ),
+            (CharSet(ranges=((0, 10_000),)), chars("a")),
+            (CharSet(any=True), chars("a")),
+        ],
+    )
+    def test_overlaps(self, a, b):
+        """
+        Sets that can share a character overlap, no matter the order.
+        """
+        assert a.overlaps(b)
+        assert b.overlaps(a)
+
+    @pytest.mark.parametrize(
+        ("a", "b"),
+        [
+            (chars("abc"), chars("def")),
+            (chars("#"), CharSet(categories=frozenset(["word"]))),
+            (
+                CharSet(categories=frozenset(["space"])),
+                CharSet(categories=frozenset(["word"])),
+            ),
+            (CharSet(ranges=((0, 10_000),)), chars("\U0001f600")),
+            (CharSet(any=True), CharSet()),
+        ],
+    )
+    def test_disjoint(self, a, b):
+        """
+        Sets that can't share a character don't overlap, no matter the order.
+        """
+        assert not a.overlaps(b)
+        assert not b.overlaps(a)
+
+
+class TestAnalyze:
+    def test_simple(self):
+        """
+        First characters and consumed characters are detected.
+        """
+        info = analyze(re.compile(r"#(\d+)"))
+
+        assert info.context_free
+        assert chars("#") == info.first
+        assert info.chars.contains("#")
+        assert info.chars.contains("4")
+        assert not info.chars.contains("a")
+
+    def test_optional_prefix(self):
+        """
+        If the beginning of a pattern is optional, the next element can be
+        first too.
+        """
+        info = analyze(re.compile(r"x?(?:ab|c)+"))
+
+        assert chars("xac") == info.first
+        assert chars("xabc") == info.chars
+
+    def test_ignore_case(self):
+        """
+        With ignore-case, all case variants are considered.
+        """
+        info = analyze(re.compile(r"k", re.IGNORECASE))
+
+        assert chars("kK\u212a") == info.chars
+
+    def test_scoped_ignore_case(self):
+        """
+        Scoped ignore-case flags are honored.
+        """
+        info = analyze(re.compile(r"a(?i:b)"))
+
+        assert chars("abB") == info.chars
+
+    @pytest.mark.parametrize(
+        "pat",
+        [r"^foo", r"foo\b", r"(?<=a)b", r"a(?!b)", r"(a)\1", r"a*", r"(x)?"],
+    )
+    def test_not_context_free(self, pat):
+        """
+        Anchors, lookarounds, back references, and patterns that match the
+        empty string are not context-free.
+        """
+        assert not analyze(re.compile(pat)).context_free
+
+    @pytest.mark.parametrize("pat", [r"a.b", r"[^a]", r"\W", r"[^\d]"])
+    def test_any(self, pat):
+        """
+        Wildcards and negations can consume anything.
+        """
+        assert analyze(re.compile(pat)).chars.any
+
+
+class TestAnalyzeReplacement:
+    def test_literal(self):
+        """
+        Literal templates produce exactly their characters.
+        """
+        pat = re.compile("a")
+        info = analyze_replacement(pat, r"x\ny", analyze(pat))
+
+        assert chars("x\ny") == info.chars
+        assert chars("x") == info.first
+        assert info.never_empty
+
+    def test_group(self):
+        """
+        Templates that reference groups can produce whatever the pattern
+        consumes.
+        """
+        pat = re.compile("(?P<foo>a)b")
+        info = analyze_replacement(pat, r"\g<foo>-", analyze(pat))
+
+        assert chars("ab-") == info.chars
+        assert chars("ab-") == info.first
+        assert info.never_empty
+
+    def test_group_after_literal(self):
+        """
+        If a template starts with a literal, it's the only possible first
+        character.
+        """
+        pat = re.compile("(a)b")
+        info = analyze_replacement(pat, r"-\1-", analyze(pat))
+
+        assert chars("ab-") == info.chars
+        assert chars("-") == info.first
+
+    def test_empty(self):
+        """
+        Templates that consist only of group references can be empty.
+        """
+        pat = re.compile("(a)")
+
+        assert not analyze_replacement(pat, r"\1", analyze(pat)).never_empty
+        assert not analyze_replacement(pat, "", analyze(pat)).never_empty
+
+    def test_invalid(self):
+        """
+        Invalid templates return None.
+        """
+        pat = re.compile("(a)")
+
+        assert analyze_replacement(pat, r"\2", analyze(pat)) is None
+
+
+class TestCompileTemplate:
+    @pytest.mark.parametrize(
+        ("pat", "repl", "expected"),
+        [
+            ("a", "b", ["b"]),
+            ("(a)", r"[\1]", ["[", 1, "]"]),
+            ("(?P<x>a)(b)", r"\g<x>\2\n", [1, 2, "\n"]),
+            ("(a)(b)", r"<\g<0>>", ["<", 0, ">"]),
+            ("a", "", []),
+        ],
+    )
+    def test_ok(self, pat, repl, expected):
+        """
+        Templates are split into literals and group indexes.
+        """
+        assert expected == compile_template(re.compile(pat), repl)
+
+    def test_sentinel_clash(self):
+        """
+        Templates containing our sentinels are not compiled.
+        """
+        assert compile_template(re.compile("a"), "\ue000") is None
+
+
+class TestRequiredLiteral:
+    @pytest.mark.parametrize(
+        ("pat", "flags", "expected"),
+        [
+            (r"#(\d+)", 0, "#"),
+            (r"https://(\S+)/issues/(\d+)", 0, "https://"),
+            (r"a(bcd)+e", 0, "bcd"),
+            (r"x?yz", 0, "yz"),
+            (r"(?:ab)*c", 0, "c"),
+            (r"a|b", 0, None),
+            (r"\d+", 0, None),
+            (r"foo#", re.IGNORECASE, "#"),
+            (r"foo(?i:bar)baz", 0, "foo"),
+        ],
+    )
+    def test_required_literal(self, pat, flags, expected):
+        """
+        The longest literal that can't be skipped is found.  Cased characters
+        are ignored if the pattern ignores case.
+        """
+        assert expected == required_literal(re.compile(pat, flags))
+
+
+class TestPureLiteral:
+    @pytest.mark.parametrize(
+        ("pat", "flags", "expected"),
+        [
+            ("foo", 0, "foo"),
+            (r"\$\$", 0, "$$"),
+            ("#!", re.IGNORECASE, "#!"),
+            ("foo", re.IGNORECASE, None),
+            ("fo+", 0, None),
+            ("(foo)", 0, None),
+            ("", 0, None),
+        ],
+    )
+    def test_pure_literal(self, pat, flags, expected):
+        """
+        Only patterns that match exactly one string are pure literals.
+        """
+        assert expected == pure_literal(re.compile(pat, flags))
+
+
+class TestNestedQuantifier:
+    @pytest.mark.parametrize(
+        ("pat", "expected"),
+        [
+            (r"(a+)+", True),
+            (r"(a*)*b", True),
+            (r"(\w+\s?)*$", True),
+            (r"(?:x|y+)*", True),
+            (r"(?=(a+)+)", True),
+            (r"(.*?,){11}P", True),
+            (r"(ab{2})+", False),
+            (r"a+b+", False),
+            (r".*foo.*", False),
+            (r"(a|b)+", False),
+            (r"(a+)?", False),
+        ],
+    )
+    def test_nested_quantifier(self, pat, expected):
+        """
+        Repetitions of variable-length repetitions are found.
+        """
+        assert expected is nested_quantifier(re.compile(pat))
+
+    @pytest.mark.skipif(
+        sys.version_info < (3, 11), reason="Needs atomic groups."
+    )
+    @pytest.mark.parametrize("pat", [r"(?>a+)+", r"(a++)+"])
+    def test_atomic(self, pat):
+        """
+        Atomic groups and possessive quantifiers don't backtrack.
+        """
+        assert not nested_quantifier(re.compile(pat))
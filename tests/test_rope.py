@@ -0,0 +1,182 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import random
+import re
+
+import pytest
+
+from hatch_fancy_pypi_readme._builder import build_text
+from hatch_fancy_pypi_readme._fragments import TextFragment
+from hatch_fancy_pypi_readme._rope import Rope
+from hatch_fancy_pypi_readme._substitutions import Substituter, find_literals
+
+
+def random_rope(rnd: random.Random, alphabet: list[str]) -> Rope:
+    text = "".join(rnd.choice(alphabet) for _ in range(rnd.randrange(40)))
+    cuts = sorted(
+        rnd.randrange(len(text) + 1) for _ in range(rnd.randrange(8))
+    )
+
+    return Rope([text[i:j] for i, j in zip([0, *cuts], [*cuts, len(text)])])
+
+
+def occurrences(text: str, literal: str) -> list[int]:
+    return [i for i in range(len(text)) if text.startswith(literal, i)]
+
+
+class TestRope:
+    def test_slice(self):
+        """
+        Slices work across segments and are clipped like str slices.
+        """
+        rope = Rope(["ab", "", "cde", "f"])
+
+        assert "bcd" == rope.slice(1, 4)
+        assert "abcdef" == rope.slice(-3, 100)
+        assert "" == rope.slice(4, 2)
+        assert 6 == len(rope)  # noqa: PLR2004
+
+    @pytest.mark.parametrize("seed", range(30))
+    def test_find(self, seed):
+        """
+        All occurrences are found, also overlapping ones and those that span
+        several segments.
+        """
+        rnd = random.Random(seed)
+        rope = random_rope(rnd, ["a", "b", "ab"])
+        text = rope.join()
+
+        for literal in ("a", "ab", "aba", "bab"):
+            assert occurrences(text, literal) == sorted(
+                set(rope.find(literal))
+            )
+            assert find_literals(
+                text, {"ab", "aba", "bb"}
+            ) == rope.find_literals({"ab", "aba", "bb"})
+
+    def test_find_literals_no_regex(self, monkeypatch):
+        """
+        Finding literals in many segments and the seams between them compiles
+        no patterns.
+        """
+        compiled = []
+        compile_ = re.compile
+
+        def counting_compile(*args, **kw):
+            compiled.append(args[0])
+            return compile_(*args, **kw)
+
+        monkeypatch.setattr(re, "compile", counting_compile)
+        literals = {f"P{i}X" for i in range(300)}
+        rope = Rope([f"x P{i}" for i in range(300, 800)] + ["x P299", "X"])
+
+        assert {"P299X"} == rope.find_literals(literals)
+        assert [] == compiled
+
+    @pytest.mark.parametrize("seed", range(30))
+    def test_isolate(self, seed):
+        """
+        After isolating a literal, every occurrence is within one segment and
+        the text is unchanged.
+        """
+        rnd = random.Random(seed)
+        rope = random_rope(rnd, ["a", "b", "$V", "$", "V"])
+        text = rope.join()
+
+        rope.isolate("$V")
+
+        assert text == rope.join()
+        assert text.count("$V") == sum(
+            seg.count("$V") for seg in rope.segments
+        )
+
+    @pytest.mark.parametrize("seed", range(50))
+    @pytest.mark.parametrize(
+        ("pattern", "length"),
+        [
+            ("ab", None),
+            (r"\bab\b", 2),
+            (r"(?<=x)ab", 3),
+            (r"a{1,3}b", 4),
+            ("^ab", 2),
+            (r"ab$", 2),
+            (r"ab(?=\n)", 3),
+        ],
+    )
+    def test_substitute(self, seed, pattern, length):
+        """
+        Substituting in a rope has the same result as substituting in the
+        joined text.
+        """
+        rnd = random.Random(seed)
+        rope = random_rope(rnd, ["a", "b", "ab", "x", " ", "\n"])
+        text = rope.join()
+        cfg = {"pattern": pattern, "replacement": r"[\g<0>]"}
+        if length is not None:
+            cfg["max-match-length"] = length
+        sub = Substituter.from_config(cfg)
+
+        n = rope.substitute(sub)
+
+        assert sub.subn(text) == (rope.join(), n)
+
+    def test_untouched_segments(self):
+        """
+        Segments that are far enough from all matches aren't copied.
+        """
+        segments = ["x" * 100, "see #1 here", "y" * 100]
+        rope = Rope(segments.copy())
+
+        rope.substitute(
+            Substituter.from_config(
+                {
+                    "pattern": r"#(\d)",
+                    "replacement": r"[#\1]",
+                    "max-match-length": 2,
+                }
+            )
+        )
+
+        assert ["x" * 100, "see [#1] here", "y" * 100] == rope.segments
+        assert segments[0] is rope.segments[0]
+        assert segments[2] is rope.segments[2]
+
+
+class TestBuildText:
+    @pytest.mark.parametrize("seed", range(30))
+    def test_same_as_joined(self, seed):
+        """
+        Building from a rope gives the same result as substituting and
+        replacing the placeholders in the joined text.
+        """
+        rnd = random.Random(seed)
+        rope = random_rope(
+            rnd, ["a", "b", " ", "$HFPR_", "VERSION", "PACKAGE_NAME", "$"]
+        )
+        subs = [
+            Substituter.from_config({"pattern": "ab", "replacement": "b"}),
+            Substituter.from_config(
+                {
+                    "pattern": r"\ba",
+                    "replacement": "A",
+                    "max-match-length": 1,
+                }
+            ),
+            Substituter.from_config({"pattern": r"b+", "replacement": "B"}),
+        ]
+        name = rnd.choice(["pkg", "$HFPR_", ""])
+
+        text = rope.join()
+        for sub in subs:
+            text = sub.substitute(text)
+        text = text.replace("$HFPR_PACKAGE_NAME", name).replace(
+            "$HFPR_VERSION", "1.0"
+        )
+
+        assert text == build_text(
+            [TextFragment(seg) for seg in rope.segments], subs, name, "1.0"
+        )
@@ -0,0 +1,256 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+"""
+Guard against accidentally quadratic behavior and needless copies of the
+whole text.
+
+Each case is run on two inputs, one of them eight times bigger than the
+other.  Peak memory is measured using tracemalloc and bounded by a multiple
+of the input size.
+
+With --timing, run times are compared, too: linear code takes about eight
+times as long on the bigger one, quadratic code 64 times.  Wall-clock
+ratios are unreliable on busy machines, so that's opt-in.
+"""
+
+from __future__ import annotations
+
+import time
+import tracemalloc
+
+import pytest
+
+from hatch_fancy_pypi_readme import _builder, _fragments
+from hatch_fancy_pypi_readme._builder import (
+    build_text,
+    compile_text,
+    write_text,
+)
+from hatch_fancy_pypi_readme._fragments import FileFragment, TextFragment
+from hatch_fancy_pypi_readme._substitutions import Substituter
+
+
+pytestmark = pytest.mark.slow
+
+GROWTH = 8
+MAX_TIME_RATIO = 24
+
+LINE = "lorem ipsum #123 dolor @sit amet\n"
+
+SUBSTITUTIONS = [
+    # Fused into one pass.
+    {"pattern": r"#(\d+)", "replacement": r"[#\1](https://x/\1)"},
+    {"pattern": r"@(\w+)", "replacement": r"[@\1](https://y/\1)"},
+    # Not fusable because of the lookbehind.
+    {"pattern": r"(?<=\s)dolor\b", "replacement": "DOLOR"},
+    # Plain string replacement.
+    {"pattern": "ipsum", "replacement": "IPSUM"},
+]
+
+
+def make_text(size):
+    return (
+        "HEAD\n<!-- start -->\n"
+        + LINE * (size // len(LINE))
+        + "<!-- end -->\nFOOT\n"
+    )
+
+
+def best_time(f):
+    """
+    Return the best time out of several runs of *f*.
+    """
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def peak_memory(f):
+    """
+    Return the peak memory of a run of *f*.
+    """
+    tracemalloc.start()
+    try:
+        f()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+@pytest.fixture(name="timing")
+def _timing(request):
+    return request.config.getoption("--timing")
+
+
+def assert_scales(make_case, size, max_memory_ratio, *, timing):
+    """
+    Run the callable returned by *make_case* for *size* and for GROWTH times
+    *size* and check that peak memory is at most *max_memory_ratio* times the
+    input size.  If *timing* is true, also check that time grows linearly.
+    """
+    small, big = make_case(size), make_case(size * GROWTH)
+
+    assert peak_memory(small) < max_memory_ratio * size
+    assert peak_memory(big) < max_memory_ratio * size * GROWTH
+    if timing:
+        assert best_time(big) / best_time(small) < MAX_TIME_RATIO
+
+
+@pytest.fixture(name="file_case")
+def _file_case(tmp_path):
+    def file_case(cfg):
+        def make_case(size):
+            path = tmp_path / f"{size}.md"
+            path.write_text(make_text(size), encoding="utf-8")
+
+            return lambda: FileFragment.from_config({"path": str(path), **cfg})
+
+        return make_case
+
+    return file_case
+
+
+MARKERS = {"start-after": "<!-- start -->\n", "end-before": "<!-- end -->"}
+
+
+class TestFileFragment:
+    def test_markers_read(self, file_case, monkeypatch, timing):
+        """
+        Extraction between markers from files that are read in full is linear
+        and copies the text only a few times.
+        """
+        monkeypatch.setattr(_fragments, "MMAP_THRESHOLD", 2**62)
+
+        assert_scales(
+            file_case(MARKERS), 2**16, max_memory_ratio=4, timing=timing
+        )
+
+    def test_markers_mapped(self, file_case, monkeypatch, timing):
+        """
+        Extraction between markers from memory-mapped files is linear and
+        needs memory only for the slice.
+        """
+        monkeypatch.setattr(_fragments, "MMAP_THRESHOLD", 0)
+
+        assert_scales(
+            file_case(MARKERS), 2**18, max_memory_ratio=3, timing=timing
+        )
+
+    def test_pattern(self, file_case, timing):
+        """
+        Extraction using a pattern is linear and copies the text only a few
+        times.
+        """
+        assert_scales(
+            file_case({"pattern": r"<!-- start -->\n(.*)<!-- end -->"}),
+            2**16,
+            max_memory_ratio=3,
+            timing=timing,
+        )
+
+
+class TestBuildText:
+    def test_substitution_chain(self, timing):
+        """
+        Applying a chain of substitutions is linear and peak memory is bounded
+        by a multiple of the input size.
+
+        The bound is comparatively high because the replacements make the
+        text more than twice as long and re.sub collects all pieces before
+        joining them.
+        """
+        subs = [Substituter.from_config(cfg) for cfg in SUBSTITUTIONS]
+
+        def make_case(size):
+            frags = [TextFragment(make_text(size))]
+
+            return lambda: build_text(frags, subs, "pkg", "1.0")
+
+        assert_scales(make_case, 2**15, max_memory_ratio=16, timing=timing)
+
+    def test_fragments_copied_once(self):
+        """
+        Fragments are concatenated only once, and substitutions and
+        placeholders copy only the fragments they affect.
+        """
+        subs = [
+            Substituter.from_config(
+                {"pattern": "#12", "replacement": "[#12]"}
+            ),
+            Substituter.from_config(
+                {
+                    "pattern": r"\bsee\b",
+                    "replacement": "SEE",
+                    "max-match-length": 5,
+                }
+            ),
+        ]
+        frags = [TextFragment("lorem ipsum\n" * 2**10) for _ in range(32)]
+        frags[3] = TextFragment("$HFPR_PACKAGE_NAME $HFPR_VERSION, see #12.\n")
+        size = sum(len(f.render()) for f in frags)
+
+        peak = peak_memory(lambda: build_text(frags, subs, "pkg", "1.0"))
+
+        assert peak < 1.1 * size
+
+    def test_compile_copies_nothing(self):
+        """
+        Compiling keeps fragments that contain neither matches nor
+        placeholders as they are.
+        """
+        frags = [TextFragment(make_text(2**14)) for _ in range(32)]
+        frags[3] = TextFragment("$HFPR_VERSION\n")
+        size = sum(len(f.render()) for f in frags)
+
+        peak = peak_memory(lambda: compile_text(frags, []))
+
+        assert peak < 0.1 * size
+
+
+class NullWriter:
+    def write(self, s):
+        pass
+
+    def writelines(self, lines):
+        for _ in lines:
+            pass
+
+
+class TestWriteText:
+    def test_streaming_substitutions(self, monkeypatch, timing):
+        """
+        Substitutions with a maximum match length are applied to the text as
+        it's written in linear time and constant memory.
+        """
+        subs = [
+            Substituter.from_config(
+                {**cfg, "pattern": pattern, "max-match-length": length}
+            )
+            for cfg, pattern, length in zip(
+                SUBSTITUTIONS,
+                [r"#(\d{1,6})", r"@(\w{1,10})", r"(?<=\s)dolor\b", "ipsum"],
+                [7, 11, 7, 5],
+            )
+        ]
+
+        def make_case(size):
+            frags = [TextFragment(make_text(size))]
+
+            return lambda: write_text(frags, subs, NullWriter(), "pkg", "1.0")
+
+        monkeypatch.setattr(_builder, "STREAM_CHUNK_SIZE", 4096)
+        # Big enough for a few chunks.
+        size = 2**14
+        small, big = make_case(size), make_case(size * GROWTH)
+
+        assert peak_memory(big) < 1.5 * peak_memory(small)
+        if timing:
+            assert best_time(big) / best_time(small) < MAX_TIME_RATIO
@@ -4,9 +4,23 @@
 
 from __future__ import annotations
 
+import random
+import re
+
 import pytest
 
-from hatch_fancy_pypi_readme._substitutions import Substituter
+from hatch_fancy_pypi_readme._builder import build_text
+from hatch_fancy_pypi_readme._fragments import TextFragment
+from hatch_fancy_pypi_readme._substitutions import (
+    Substituter,
+    find_literals,
+    fuse,
+    prefilter,
+)
+from hatch_fancy_pypi_readme.exceptions import (
+    CatastrophicBacktrackingWarning,
+    ConfigurationError,
+)
 
 
 VALID = {"pattern": "f(o)o", "replacement": r"bar\g<1>bar"}
@@ -77,3 +91,354 @@ class TestSubstituter:
                 "ignore-case": True,
             }
         ).substitute(text)
+
+
+def sub(pattern, replacement, **kw):
+    return Substituter.from_config(
+        {"pattern": pattern, "replacement": replacement, **kw}
+    )
+
+
+ISSUES = sub(r"#(\d+)", r"[#\1](https://github.com/x/y/issues/\1)")
+USERS = sub(r"( +)@([\w\-]+)", r"\1[@\2](https://github.com/\2)")
+CALLOUTS = sub(
+    r"\[!(NOTE|TIP|IMPORTANT|WARNING|CAUTION)\]",
+    r"**\1**:",
+    **{"ignore-case": True},
+)
+
+
+class TestFuse:
+    def test_independent(self):
+        """
+        Independent substitutions are fused into one.
+        """
+        (fused,) = fuse([ISSUES, USERS])
+
+        assert [ISSUES, USERS] == fused.substituters
+        assert (
+            "Fixed [#42](https://github.com/x/y/issues/42). Thanks "
+            "[@hynek](https://github.com/hynek)!"
+            == fused.substitute("Fixed #42. Thanks @hynek!")
+        )
+
+    def test_dependent(self):
+        """
+        If a later substitution can match the output of an earlier one, they
+        are not fused.
+        """
+        a_to_b = sub("a", "b")
+        b_to_c = sub("b", "c")
+
+        assert [a_to_b, b_to_c] == fuse([a_to_b, b_to_c])
+        assert "ccc" == build_text([TextFragment("abc")], [a_to_b, b_to_c])
+
+    def test_overlapping(self):
+        """
+        If matches can overlap, substitutions are not fused.
+        """
+        digits = sub(r"\d+", "D")
+
+        assert [ISSUES, digits] == fuse([ISSUES, digits])
+
+    def test_joined(self):
+        """
+        If an earlier substitution can remove text and thereby join matches
+        of a later one, they are not fused.
+        """
+        remove = sub("x", "")
+        ab = sub("ab", "!")
+
+        assert [remove, ab] == fuse([remove, ab])
+        assert "!" == build_text([TextFragment("axb")], [remove, ab])
+
+    def test_runs(self):
+        """
+        Only runs of independent substitutions are fused, order is kept.
+        """
+        a_to_b = sub("a", "b")
+
+        fused, rest = fuse([ISSUES, USERS, a_to_b])
+
+        assert [ISSUES, USERS] == fused.substituters
+        assert a_to_b is rest
+
+    def test_group_name_clash(self):
+        """
+        If the patterns can't be combined, the substitutions are kept.
+        """
+        a = sub("(?P<x>#)", "1")
+        b = sub("(?P<x>@)", "2")
+
+        assert [a, b] == fuse([a, b])
+
+    def test_ignore_case_scoped(self):
+        """
+        Ignore-case only applies to the branches that asked for it.
+        """
+        a = sub("a", "1", **{"ignore-case": True})
+        b = sub("b", "2")
+
+        (fused,) = fuse([a, b])
+
+        assert "11 2B" == fused.substitute("aA bB")
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_equivalent(self, seed):
+        """
+        Fused substitutions give the same result as sequential ones.
+        """
+        rnd = random.Random(seed)
+        subs = [
+            ISSUES,
+            USERS,
+            CALLOUTS,
+            sub(r"`([^`]+)`_", r"``\1``"),
+            sub(r"\$\$", "$"),
+            sub(r"%(\w+)%", r"<\1>"),
+            sub("x", ""),
+            sub("_a", "!"),
+        ]
+        rnd.shuffle(subs)
+        text = "".join(
+            rnd.choice(
+                [
+                    *("#1", "#", "23", " ", "@", "me", "-", "[!note]"),
+                    *("[!TIP]", "`", "x", "_", "$", "%", "a%", "\n"),
+                ]
+            )
+            for _ in range(500)
+        )
+
+        expected = text
+        for s in subs:
+            expected = s.substitute(expected)
+
+        got = text
+        for s in fuse(subs):
+            got = s.substitute(got)
+
+        assert expected == got
+
+
+class TestLiteralSubstitution:
+    def test_str_replace(self):
+        """
+        Pure-literal patterns are replaced without using the regex engine.
+        """
+        s = sub(r"\$\$", r"$ (\g<0>)")
+
+        assert "a $ ($$) b $ ($$)" == s.substitute("a $$ b $$")
+
+    def test_subn(self):
+        """
+        subn counts replacements of pure literals, too.
+        """
+        assert ("a € b €", 2) == sub(r"\$\$", "€").subn("a $$ b $$")
+
+    def test_ignore_case_letters(self):
+        """
+        Literals with letters that ignore case still use regexes.
+        """
+        s = sub("foo", "bar", **{"ignore-case": True})
+
+        assert "bar bar" == s.substitute("foo FOO")
+
+
+class TestPrefilter:
+    def test_drops_absent(self):
+        """
+        Substitutions whose literals are missing are dropped.
+        """
+        assert [ISSUES] == prefilter([ISSUES, USERS], "#42")
+
+    def test_keeps_without_literal(self):
+        """
+        Substitutions without a required literal are always kept.
+        """
+        digits = sub(r"\d+", "D")
+
+        assert [digits] == prefilter([digits], "no numbers here")
+
+    def test_produced_by_earlier(self):
+        """
+        If an earlier substitution can produce the literal, the later one is
+        kept.
+        """
+        hash_it = sub("no", "#1")
+
+        assert [hash_it, ISSUES] == prefilter([hash_it, ISSUES], "no")
+        assert "[#1](https://github.com/x/y/issues/1)" == build_text(
+            [TextFragment("no")], [hash_it, ISSUES]
+        )
+
+    def test_joined_by_earlier(self):
+        """
+        If an earlier substitution can remove text and thereby join the
+        literal, the later one is kept.
+        """
+        remove = sub("x", "")
+        ab = sub("ab", "!")
+
+        assert [remove, ab] == prefilter([remove, ab], "axb")
+
+    def test_earlier_dropped(self):
+        """
+        Dropped substitutions can't produce anything.
+        """
+        hash_it = sub("yes", "#1")
+
+        assert [] == prefilter([hash_it, ISSUES], "no")
+
+
+class TestFindLiterals:
+    @pytest.mark.parametrize(
+        ("text", "expected"),
+        [
+            ("", set()),
+            ("abc", {"ab", "bc", "a"}),
+            ("xxbcxx", {"bc"}),
+            ("ab", {"ab", "a"}),
+            ("xa", {"a"}),
+        ],
+    )
+    def test_overlapping(self, text, expected):
+        """
+        Overlapping and nested literals are found.
+        """
+        assert expected == find_literals(text, {"ab", "bc", "a", "zz"})
+
+    def test_no_regex(self, monkeypatch):
+        """
+        Hundreds of literals are found without compiling any patterns, so a
+        cold start is as fast as a warm one.
+        """
+        compiled = []
+        compile_ = re.compile
+
+        def counting_compile(*args, **kw):
+            compiled.append(args[0])
+            return compile_(*args, **kw)
+
+        monkeypatch.setattr(re, "compile", counting_compile)
+        literals = {f"P{i}X" for i in range(300)}
+        text = " ".join(f"P{i}X" for i in range(0, 300, 2))
+
+        assert {f"P{i}X" for i in range(0, 300, 2)} == find_literals(
+            text, literals
+        )
+        assert [] == compiled
+
+
+class TestRegexTimeout:
+    def test_ok(self):
+        """
+        Substitutions with a timeout give the same results, but aren't fused.
+        """
+        sub = Substituter.from_config(VALID, timeout=5)
+
+        assert "xxx barobar yyy" == sub.substitute("xxx foo yyy")
+        assert ("barobar", 1) == sub.subn("foo")
+        assert None is sub.fusion_info
+
+    def test_exceeded(self):
+        """
+        Substitutions that exceed the timeout are reported by pattern.
+        """
+        sub = Substituter.from_config(
+            {"pattern": r"(a+)+$", "replacement": ""}, timeout=0.2
+        )
+
+        with pytest.raises(ConfigurationError) as ei:
+            sub.substitute("a" * 40 + "b")
+
+        assert [
+            "Substitution '(a+)+$' exceeded the regex-timeout of 0.2 seconds."
+        ] == ei.value.errors
+
+    def test_warns_without_timeout(self):
+        """
+        Patterns that are prone to catastrophic backtracking cause a warning
+        unless there's a timeout.
+        """
+        cfg = {"pattern": r"(a+)+$", "replacement": ""}
+
+        with pytest.warns(CatastrophicBacktrackingWarning):
+            Substituter.from_config(cfg)
+
+    @pytest.mark.filterwarnings("error")
+    def test_no_warning_with_timeout(self):
+        """
+        Setting a timeout acknowledges the risk.
+        """
+        Substituter.from_config(
+            {"pattern": r"(a+)+$", "replacement": ""}, timeout=1
+        )
+
+
+STREAM_CASES = [
+    ("ab", 2, "X"),
+    ("a{1,3}", 3, r"<\g<0>>"),
+    ("(?<=a)b", 2, "B"),
+    (r"\bab\b", 4, "W"),
+    ("^a", 1, "S"),
+    ("a$", 2, "E"),
+    ("x?", 1, "-"),
+    ("a|ab", 2, r"[\g<0>]"),
+    (r"(a)(b)?", 2, r"<\1\2>"),
+    ("(?m)^a", 2, "M"),
+    ("(?m)b$", 2, "N"),
+    ("a(?=b)", 2, "L"),
+]
+
+
+class TestSubstituteStream:
+    @pytest.mark.parametrize("seed", range(50))
+    def test_same_as_substitute(self, seed):
+        """
+        Substituting in a stream of chunks has the same result as
+        substituting in their concatenation, no matter where the chunks are
+        split -- including anchors, lookarounds, and empty matches.
+        """
+        rnd = random.Random(seed)
+        pat, length, repl = rnd.choice(STREAM_CASES)
+        text = "".join(rnd.choice("abx\n ") for _ in range(rnd.randrange(60)))
+        cuts = sorted(
+            rnd.sample(
+                range(len(text) + 1), rnd.randrange(min(8, len(text) + 1))
+            )
+        )
+        chunks = [text[i:j] for i, j in zip([0, *cuts], [*cuts, len(text)])]
+        sub = Substituter.from_config(
+            {"pattern": pat, "replacement": repl, "max-match-length": length}
+        )
+
+        assert sub.substitute(text) == "".join(sub.substitute_stream(chunks))
+
+    def test_streamable(self):
+        """
+        Only substitutions with a maximum match length and without a regex
+        timeout can be streamed.
+        """
+        cfg = {"pattern": "a", "replacement": "b"}
+
+        assert [False, True, False] == [
+            Substituter.from_config(cfg).streamable,
+            Substituter.from_config({**cfg, "max-match-length": 1}).streamable,
+            Substituter.from_config(
+                {**cfg, "max-match-length": 1}, timeout=1
+            ).streamable,
+        ]
+
+    @pytest.mark.parametrize("length", [0, -1, True, 1.5, "4"])
+    def test_invalid_max_match_length(self, length):
+        """
+        max-match-length must be a positive integer.
+        """
+        with pytest.raises(ConfigurationError) as ei:
+            Substituter.from_config(cow_valid(**{"max-match-length": length}))
+
+        assert [
+            f"Value {length!r} for 'max-match-length' is not a positive "
+            "integer."
+        ] == ei.value.errors
@@ -0,0 +1,80 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import re
+
+import pytest
+
+from hatch_fancy_pypi_readme._timeout import (
+    check_backtracking,
+    run_with_timeout,
+    search_groups,
+    subn,
+)
+from hatch_fancy_pypi_readme.exceptions import CatastrophicBacktrackingWarning
+
+
+pytestmark = pytest.mark.slow
+
+# Takes ages to fail on the trailing "b".
+EVIL = re.compile(r"(a+)+$")
+EVIL_TEXT = "a" * 40 + "b"
+
+
+class TestRunWithTimeout:
+    def test_no_timeout(self):
+        """
+        Without a timeout, the function runs in-process.
+        """
+        assert (("o",), ("x",)) == (
+            run_with_timeout(None, search_groups, re.compile("f(o)"), "foo"),
+            run_with_timeout(None, lambda: ("x",)),
+        )
+
+    def test_worker(self):
+        """
+        With a timeout, the function runs in the worker and its result is
+        returned.
+        """
+        assert ("bar bar", 2) == run_with_timeout(
+            5, subn, re.compile("foo"), "bar", "foo foo"
+        )
+
+    def test_exception(self):
+        """
+        Exceptions in the worker are raised in the caller.
+        """
+        with pytest.raises(re.error):
+            run_with_timeout(5, subn, re.compile("(x)"), r"\2", "x")
+
+    def test_timeout(self):
+        """
+        Functions that take too long raise TimeoutError and the worker is
+        replaced.
+        """
+        with pytest.raises(TimeoutError):
+            run_with_timeout(0.2, search_groups, EVIL, EVIL_TEXT)
+
+        assert None is run_with_timeout(5, search_groups, EVIL, "b")
+
+
+class TestCheckBacktracking:
+    def test_warns(self):
+        """
+        Patterns with nested quantifiers cause a warning that names them.
+        """
+        with pytest.warns(
+            CatastrophicBacktrackingWarning,
+            match=r"^Substitution pattern '\(a\+\)\+\$' contains nested",
+        ):
+            check_backtracking(EVIL, "Substitution pattern")
+
+    @pytest.mark.filterwarnings("error")
+    def test_harmless(self):
+        """
+        Harmless patterns don't cause warnings.
+        """
+        check_backtracking(re.compile(r"#(\d+)"), "Substitution pattern")
@@ -0,0 +1,157 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from hatch_fancy_pypi_readme import _trace
+from hatch_fancy_pypi_readme._builder import build_text
+from hatch_fancy_pypi_readme._config import load_and_validate_config
+
+
+@pytest.fixture(name="spans")
+def _spans():
+    spans = []
+    _trace.add_observer(spans.append)
+
+    yield spans
+
+    _trace.remove_observer(spans.append)
+
+
+CHANGELOG = "# Changelog\n\n<!-- cut -->\n\nFixed #1 and #2.\n"
+
+
+@pytest.fixture(name="config")
+def _config(tmp_path):
+    path = tmp_path / "CHANGELOG.md"
+    path.write_text(CHANGELOG)
+
+    return {
+        "content-type": "text/markdown",
+        "fragments": [
+            {"text": "# Hi\n\n"},
+            {"path": str(path), "start-after": "<!-- cut -->\n\n"},
+        ],
+        "substitutions": [
+            {"pattern": r"#(\d+)", "replacement": r"[#\1](https://x/\1)"},
+            {"pattern": "Fixed", "replacement": "FIXED"},
+            {"pattern": r"(?<= )and\b", "replacement": "&"},
+            {"pattern": "ZZZ", "replacement": "never"},
+        ],
+    }
+
+
+class TestSpan:
+    def test_disabled(self, monkeypatch):
+        """
+        Without observers, spans only yield their attributes.
+        """
+        monkeypatch.delenv("HFPR_TRACE", raising=False)
+
+        with _trace.span("foo", a=1) as attrs:
+            _trace.add("b", 2)
+
+        assert {"a": 1} == attrs
+        assert not _trace.enabled()
+
+    def test_observer(self, spans):
+        """
+        Observers receive finished spans with attributes added by the body and
+        the code it calls.
+        """
+        with _trace.span("outer", a=1) as attrs:
+            attrs["b"] = 2
+            with _trace.span("inner"):
+                _trace.add("n", 3)
+                _trace.add("n", 4)
+            _trace.add("n", 5)
+
+        assert [
+            ("inner", {"n": 7}),
+            ("outer", {"a": 1, "b": 2, "n": 5}),
+        ] == [(s.name, s.attributes) for s in spans]
+        assert all(s.duration >= 0 for s in spans)
+
+    def test_error(self, spans):
+        """
+        If the body raises, the span is emitted with the error type.
+        """
+        with pytest.raises(ValueError, match="boom"), _trace.span("foo"):
+            raise ValueError("boom")  # noqa: EM101
+
+        assert {"error": "ValueError"} == spans[0].attributes
+
+
+class TestPipeline:
+    def test_spans(self, spans, config):
+        """
+        Loading and building report spans for the configuration, each fragment,
+        and each substitution pass.
+        """
+        cfg = load_and_validate_config(config)
+        text = build_text(cfg.fragments, cfg.substitutions)
+
+        by_name = {}
+        for s in spans:
+            by_name.setdefault(s.name, []).append(s.attributes)
+
+        text_frag, file_frag = by_name["fragment"]
+
+        assert {"type": "text", "bytes_kept": 6} == text_frag
+        assert {
+            "type": "path",
+            "path": config["fragments"][1]["path"],
+            "bytes_read": len(CHANGELOG),
+            "bytes_kept": len("Fixed #1 and #2.\n"),
+        } == file_frag
+        assert {
+            "fragments": 2,
+            "substitutions": 4,
+            "files_read": 1,
+        } == by_name["config"][0]
+        assert {"substitutions": 4, "kept": 3} == by_name["prefilter"][0]
+        assert [
+            {"patterns": [r"#(\d+)", "Fixed"], "matches": 3},
+            {"patterns": [r"(?<= )and\b"], "matches": 1},
+        ] == by_name["substitution"]
+        assert "# Hi\n\nFIXED [#1](https://x/1) & [#2](https://x/2).\n" == text
+        assert {"chars_in": 23, "chars_out": len(text)} == by_name["build"][0]
+
+    def test_fragment_error(self, spans, tmp_path):
+        """
+        Fragments that fail to load are reported as errors.
+        """
+        with pytest.raises(Exception, match="not found"):
+            load_and_validate_config(
+                {
+                    "content-type": "text/markdown",
+                    "fragments": [{"path": str(tmp_path / "nope")}],
+                }
+            )
+
+        assert "ConfigurationError" == spans[0].attributes["error"]
+        assert ("fragment", "config") == tuple(s.name for s in spans)
+
+
+class TestJSONLines:
+    def test_env(self, config, tmp_path, monkeypatch):
+        """
+        If HFPR_TRACE is set, spans are appended to that file as JSON lines.
+        """
+        trace = tmp_path / "trace.jsonl"
+        monkeypatch.setenv("HFPR_TRACE", str(trace))
+
+        load_and_validate_config(config)
+        load_and_validate_config(config)
+
+        lines = [json.loads(line) for line in trace.read_text().splitlines()]
+
+        assert ["fragment", "fragment", "config"] * 2 == [
+            line["name"] for line in lines
+        ]
+        assert {"name", "started", "duration", "pid", "type"} <= set(lines[0])
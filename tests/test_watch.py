@@ -0,0 +1,197 @@
+# SPDX-FileCopyrightText: 2022 Hynek Schlawack <hs@ox.cx>
+#
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+
+import itertools
+
+import pytest
+
+from hatch_fancy_pypi_readme._cli import CLIError
+from hatch_fancy_pypi_readme._watch import Watcher, watch
+
+
+PYPROJECT = """\
+[project]
+dynamic = ["readme"]
+
+[tool.hatch.metadata.hooks.fancy-pypi-readme]
+content-type = "text/markdown"
+fragments = [
+  {{ path = "{a}" }},
+  {{ path = "{b}" }},
+]
+"""
+
+
+@pytest.fixture(name="watcher")
+def _watcher(tmp_path):
+    a = tmp_path / "a.md"
+    a.write_text("A\n")
+    b = tmp_path / "b.md"
+    b.write_text("B\n")
+    pyproject = tmp_path / "pyproject.toml"
+    pyproject.write_text(PYPROJECT.format(a=a.as_posix(), b=b.as_posix()))
+
+    return Watcher(pyproject, tmp_path / "hatch.toml")
+
+
+class TestWatcher:
+    def test_first(self, watcher):
+        """
+        Everything has changed when checking for the first time.
+        """
+        assert watcher.changed()
+        assert "A\nB\n" == watcher.render()
+        assert not watcher.changed()
+
+    def test_only_changed_files_are_read(self, watcher, tmp_path):
+        """
+        After a fragment file changes, only that file is read again.
+        """
+        watcher.changed()
+        watcher.render()
+
+        (tmp_path / "b.md").write_text("BB\n")
+
+        assert watcher.changed()
+        assert "A\nBB\n" == watcher.render()
+        assert len(["a.md", "b.md", "b.md"]) == watcher.files.misses
+        assert not watcher.changed()
+
+    def test_config_change(self, watcher, tmp_path):
+        """
+        Changes to the configuration are picked up.
+        """
+        watcher.changed()
+        watcher.render()
+
+        watcher.pyproject_path.write_text(
+            PYPROJECT.format(
+                a=(tmp_path / "b.md").as_posix(),
+                b=(tmp_path / "a.md").as_posix(),
+            )
+        )
+
+        assert watcher.changed()
+        assert "B\nA\n" == watcher.render()
+
+    def test_hatch_toml_appears(self, watcher, tmp_path):
+        """
+        Creating a hatch.toml is a change.
+        """
+        watcher.changed()
+        watcher.render()
+
+        (tmp_path / "hatch.toml").write_text("")
+
+        assert watcher.changed()
+
+    def test_missing_fragment_file(self, watcher, tmp_path):
+        """
+        Missing fragment files are errors and are watched, such that creating
+        them fixes the error.
+        """
+        watcher.changed()
+        (tmp_path / "b.md").unlink()
+
+        with pytest.raises(CLIError, match=r"Fragment file .* not found"):
+            watcher.render()
+
+        (tmp_path / "b.md").write_text("B!\n")
+
+        assert watcher.changed()
+        assert "A\nB!\n" == watcher.render()
+
+    def test_glob(self, tmp_path):
+        """
+        Files that are added to the directory of a glob fragment are picked
+        up.
+        """
+        d = tmp_path / "changelog.d"
+        d.mkdir()
+        (d / "1.md").write_text("1\n")
+        pyproject = tmp_path / "pyproject.toml"
+        pyproject.write_text(
+            PYPROJECT.replace(
+                '{{ path = "{a}" }},\n  {{ path = "{b}" }},',
+                f'{{ glob = "{d.as_posix()}/*.md" }},',
+            )
+        )
+        watcher = Watcher(pyproject, None)
+        watcher.changed()
+
+        assert "1\n" == watcher.render()
+        assert not watcher.changed()
+
+        (d / "2.md").write_text("2\n")
+
+        assert watcher.changed()
+        assert "1\n2\n" == watcher.render()
+
+    def test_broken_toml(self, watcher):
+        """
+        Unparsable TOML raises a CLIError.
+        """
+        watcher.pyproject_path.write_text("[project")
+
+        with pytest.raises(CLIError, match="is not valid TOML"):
+            watcher.render()
+
+    def test_missing_pyproject(self, watcher):
+        """
+        Unreadable pyproject.toml raises a CLIError.
+        """
+        watcher.pyproject_path.unlink()
+
+        with pytest.raises(CLIError, match="Can't read"):
+            watcher.render()
+
+
+class TestWatch:
+    def test_renders_on_change(self, watcher, tmp_path, capsys):
+        """
+        The readme is rendered into the target file on the first pass and
+        whenever something changes.  Errors are reported and don't stop the
+        loop.
+        """
+        out = tmp_path / "README.out"
+        outputs = []
+        steps = iter(
+            [
+                lambda: None,
+                lambda: outputs.append(out.read_text()),
+                lambda: (tmp_path / "a.md").write_text("AA\n"),
+                lambda: outputs.append(out.read_text()),
+                lambda: watcher.pyproject_path.write_text("[project"),
+                lambda: (tmp_path / "b.md").write_text("BB\n"),
+            ]
+        )
+
+        def should_stop():
+            step = next(steps, None)
+            if step is None:
+                return True
+            step()
+            return False
+
+        watch(watcher, str(out), interval=0, should_stop=should_stop)
+
+        assert ["A\nB\n\n", "AA\nB\n\n"] == outputs
+        assert "AA\nB\n\n" == out.read_text()
+
+        err = capsys.readouterr().err
+
+        assert len(outputs) == err.count("Rendered in")
+        assert "is not valid TOML" in err
+
+    def test_stdout(self, watcher, capsys):
+        """
+        Without a target file, the readme is printed to standard out.
+        """
+        counter = itertools.count()
+
+        watch(watcher, None, interval=0, should_stop=lambda: next(counter) > 1)
+
+        assert "A\nB\n\n" == capsys.readouterr().out
@@ -23,3 +23,10 @@ def run(*args, check=True):
 
 def append(file, text):
     file.write_text(file.read_text() + text)
+
+
+def boom(*_args, **_kw):
+    """
+    Stand-in for functions that must not be called.
+    """
+    raise AssertionError